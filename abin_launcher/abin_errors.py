@@ -8,6 +8,7 @@
 ################################################################################################################################################
 
 import os
+import sys
 
 # =================================================================== #
 # =================================================================== #
@@ -141,4 +142,31 @@ def check_keys(keys:list,dicts,context:str):
     # If dicts is neither a dictionary nor a list, raise an exception
 
     else:
-      raise ValueError ("The type of the 'dicts' argument with which the check_keys function has been called is neither a dictionary nor a list.")
\ No newline at end of file
+      raise ValueError ("The type of the 'dicts' argument with which the check_keys function has been called is neither a dictionary nor a list.")
+def import_path(fullpath:str):
+    """ 
+    Imports a file with full path specification. Allows one to import from anywhere, something __import__ does not do. Taken from https://stackoverflow.com/questions/72852/how-to-do-relative-imports-in-python
+
+    This is used to import the subscripts shared with CONTROL LAUNCHER, which are placed in its directory.
+
+    Parameters
+    ----------
+    fullpath : str
+        Full path towards the file you want to import
+
+    Returns
+    -------
+    module
+        The loaded file
+    """
+
+    # Split the path and filename (and remove extension of the filename)
+    path, filename = os.path.split(fullpath)
+    filename = os.path.splitext(filename)[0]
+
+    # Add path to sys.path in order to be able to load the module, then remove it
+    sys.path.insert(0, path)
+    module = __import__(filename)
+    del sys.path[0]
+
+    return module
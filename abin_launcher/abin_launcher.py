@@ -16,20 +16,28 @@ import glob
 import os
 import re
 import shutil
-import sys
 from collections import OrderedDict
 from inspect import getsourcefile
 
 import jinja2  # Only needed in the renderer subscript, it is loaded here to check if your python installation does support jinja2
-import yaml
 
 # Subscripts (files that end with .py and must be placed in the same directory as this script)
 
 import abin_errors
 import geom_scan
+import periodic_table
 import renderer
+import scale_recommender
 import scaling_fcts
 
+# Subscripts shared with CONTROL LAUNCHER, imported from its directory
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(getsourcefile(lambda:0))))),"control_launcher")
+
+job_logging = abin_errors.import_path(os.path.join(control_dir,"job_logging.py"))
+job_submission = abin_errors.import_path(os.path.join(control_dir,"job_submission.py"))
+yaml_loader = abin_errors.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
 # =================================================================== #
 # =================================================================== #
 #                       COMMAND LINE ARGUMENTS                        #
@@ -56,6 +64,11 @@ optional.add_argument('--max_mol', type=int, help="Maximum number of geometry fi
 optional.add_argument('--max_cf', type=int, help="Maximum number of configuration files that will be succesfully processed, limiting the number of jobs that will then be launched.")
 optional.add_argument("-km","--keep_mol",action="store_true",help="Do not archive the geometry files after they have been processed and leave them where they are.")
 optional.add_argument("-kc","--keep_cf",action="store_true",help="Do not archive the configuration files after they have been processed and leave them where they are.")
+optional.add_argument("-pt","--precomp_tpl",action="store_true",help="Use precompiled versions of the Jinja templates, stored in a 'compiled_templates' directory next to this script. The templates are compiled again whenever one of them has been modified.")
+optional.add_argument("-lj","--log_json", type=str, help="Path to a file where the main events of the execution (geometry files treated or skipped, jobs created and submitted, etc.) will be appended in the JSON Lines format, to be read by other programs.")
+optional.add_argument("-bs","--bench_store", type=str, help="Path to the SQLite database file of the benchmark store (see benchmark.py). If given, the walltime and the memory of each job will be recommended based on the previous jobs of the same profile on the same cluster, without exceeding those of its job scale.")
+optional.add_argument("-sq","--safety_quantile", type=float, default=0.95, help="Fraction of the previous jobs that would have fitted in the recommended walltime and memory, when using the -bs / --bench_store argument. Default is 0.95.")
+optional.add_argument("-jr","--job_registry", type=str, help="Path to the SQLite database file of the job registry (see job_submission.py), created if it does not exist yet. If given, each submitted job will be recorded in it along with its job ID, its geometry, its profile, its configuration and its job scale.")
 
 # =================================================================== #
 # =================================================================== #
@@ -75,9 +88,9 @@ def main():
   # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
   try:
 
-    # Save a reference to the original standard output as it will be modified later on (see https://stackabuse.com/writing-to-a-file-with-pythons-print-function/ for reference)
+    # Replace the standard output by a dispatcher, sending the output of the print calls either to the console or to the log of the job being currently treated (see job_logging.py for details)
 
-    original_stdout = sys.stdout
+    job_logging.install()
 
     # Get the size of the terminal in order to have a prettier console output, if you need something more robust, go check http://granitosaurus.rocks/getting-terminal-size.html
 
@@ -137,6 +150,15 @@ def main():
     
     keep_mol = args.keep_mol                 # Flag for keeping the geometry files where they are
     keep_cf = args.keep_cf                   # Flag for keeping the configuration files where they are
+
+    precomp_tpl = args.precomp_tpl           # Flag for using precompiled Jinja templates
+
+    log_json = args.log_json                 # File where the events of the execution will be written in the JSON Lines format
+
+    bench_store = args.bench_store           # Benchmark store used to recommend the walltime and the memory of the jobs
+    safety_quantile = args.safety_quantile   # Fraction of the previous jobs that would have fitted in the recommended resources
+
+    job_registry = args.job_registry         # Job registry where the submitted jobs will be recorded
     
     # Format of the molecule files
 
@@ -153,16 +175,49 @@ def main():
 
     print ("{:<40} {:<100}".format('\nCodes directory:',code_dir))
 
+    # ========================================================= #
+    # Stream of events                                          #
+    # ========================================================= #
+
+    if log_json:
+      job_logging.open_events(log_json)
+      job_logging.event("start", script="abin_launcher", cluster=cluster_name, profile=profile, dry_run=dry_run)
+
+    # ========================================================= #
+    # Job registry                                              #
+    # ========================================================= #
+
+    # Each submitted job will be recorded in the job registry along with the job ID given by the job scheduler (see job_submission.py for details)
+
+    registry = None
+
+    if job_registry and not dry_run:
+      abin_errors.check_abspath(os.path.dirname(os.path.abspath(job_registry)),"Directory of the job registry (command line argument -jr / --job_registry)","directory")
+      job_registry = os.path.abspath(job_registry)
+      registry = job_submission.connect(job_registry)
+      print ("{:<40} {:<100}".format('\nJob registry:',job_registry))
+
+    # ========================================================= #
+    # Precompile the Jinja templates                            #
+    # ========================================================= #
+
+    # The templates of the "templates" directory are compiled into Python modules stored in the "compiled_templates" directory (only if they have not been compiled yet or have been modified since then)
+
+    if precomp_tpl:
+      compiled_dir = os.path.join(code_dir,"compiled_templates")
+      renderer.precompile_templates(os.path.join(code_dir,"templates"), compiled_dir)
+      print ("{:<40} {:<100}".format('\nCompiled templates directory:',compiled_dir))
+
     # ========================================================= #
     # Load Mendeleev's periodic table                           #
     # ========================================================= #
 
     # Loading AlexGustafsson's Mendeleev Table (found at https://github.com/AlexGustafsson/molecular-data) which will be used notably by the scaling process.
+    # The table is indexed by element symbol and stored in a binary file (.mendeleev.yml.pickle) the first time, so that the YAML file is only parsed again when it has been modified (see periodic_table.py for details).
 
     mendeleev_file = abin_errors.check_abspath(os.path.join(code_dir,"mendeleev.yml"),"Mendeleev periodic table YAML file","file")
     print ("{:<141}".format("\nLoading AlexGustafsson's Mendeleev Table ..."), end="")
-    with open(mendeleev_file, 'r') as periodic_table:
-      mendeleev = yaml.load(periodic_table, Loader=yaml.FullLoader)
+    mendeleev = periodic_table.load(mendeleev_file)
     print('%12s' % "[ DONE ]")
 
     # ========================================================= #
@@ -173,8 +228,7 @@ def main():
 
     clusters_file = abin_errors.check_abspath(os.path.join(code_dir,"clusters.yml"),"YAML clusters configuration file","file")
     print ("{:<141}".format('\nLoading the clusters configuration file ...'), end="")
-    with open(clusters_file, 'r') as f_clusters:
-      clusters_cfg = yaml.load(f_clusters, Loader=yaml.FullLoader)
+    clusters_cfg = yaml_loader.load(clusters_file)
     print('%12s' % "[ DONE ]")
 
     # Check the name of the cluster
@@ -287,6 +341,19 @@ def main():
     if max_cf != None and max_cf <= 0:
       raise abin_errors.AbinError ("ERROR: The specified max_cf value (%s) must be a non-zero positive integer" % max_cf)
 
+    # Load the previous jobs of this profile from the benchmark store, if any (see scale_recommender.py for details)
+
+    recommender = None
+
+    if bench_store:
+      bench_store = abin_errors.check_abspath(bench_store,"Command line argument -bs / --bench_store","file")
+      print ("{:<141}".format('\nLoading the previous jobs from the benchmark store ...'), end="")
+      recommender = scale_recommender.ScaleRecommender(bench_store, cluster_name, profile, scaling_fct, safety_quantile)
+      print('%12s' % "[ DONE ]")
+      print ("{:<40} {:<100}".format('\nBenchmark store:',bench_store))
+      print ("{:<40} {:<100}".format('\nPrevious jobs for that profile:',recommender.count()))
+      print ("{:<40} {:<100}".format('\nSafety quantile:',safety_quantile))
+
     # Check geometry file(s)
     # ======================
 
@@ -377,12 +444,42 @@ def main():
       print("\nThe dry run option has been enabled: the job files and directories will be created but the jobs will not be submitted to the job scheduler.")
     else:
       job_count = 0   # Launched jobs counter, this number will be shown on the console screen at the end of the execution
+      deferred_count = 0   # Deferred jobs counter (jobs added to the backlog of the submission governor)
+
+    # Submission governor
+    # ===================
+
+    # If submission limits have been defined for this cluster, the jobs that would exceed them are added to a backlog file in the output directory instead of being submitted, and will be submitted by a later execution (see job_submission.py for details)
+
+    governor = None
+
+    if not dry_run and clusters_cfg[cluster_name].get("submit_limits"):
+
+      governor = job_submission.Governor(os.path.join(out_dir,job_submission.BACKLOG_FILENAME), clusters_cfg[cluster_name]["submit_limits"])
+      print ("{:<40} {:<100}".format('\nSubmission backlog:',governor.backlog_path))
+      print ("{:<40} {:<100}".format('\nJobs in the queue:',governor.snapshot()[""]))
+
+      # Submit the jobs left in the backlog by the previous executions first, as long as the limits allow it
+
+      submitted, error = governor.drain(submit_command)
+
+      for entry in submitted:
+        job_logging.event("job_submitted", job_dir=entry["job_dir"], job_id=entry["job_id"], from_backlog=True)
+
+      job_count += len(submitted)
+      print ("{:<40} {:<100}".format('\nJobs submitted from the backlog:',len(submitted)))
+      print ("{:<40} {:<100}".format('\nJobs left in the backlog:',len(governor.backlog())))
+
+      if error:
+        print("\nWARNING: The submission of the jobs of the backlog has been interrupted, the remaining ones will be submitted by a later execution.")
+        print(error)
+        print(error.output.strip())
 
   # ========================================================= #
   # Exception handling for the preparation step               #
   # ========================================================= #
 
-  except abin_errors.AbinError as error:
+  except (abin_errors.AbinError, job_submission.SubmissionError) as error:
     print("")
     print(error)
     exit(-1)
@@ -425,14 +522,13 @@ def main():
       print(console_message.center(len(console_message)+10))
       print(''.center(len(console_message)+11, '*'))
 
-      # Create an output log file containing all the information about the geometry file treatment
+      # Create an output log containing all the information about the geometry file treatment
 
-      mol_log_name = mol_name + ".log"
-      mol_log = open(os.path.join(out_dir,mol_log_name), 'w', encoding='utf-8')
+      mol_log = job_logging.JobLog()
 
-      # Redirect standard output to the mol_log file (see https://stackabuse.com/writing-to-a-file-with-pythons-print-function/ for reference)
+      # Send the output of the print calls to the mol_log (it is kept in memory and will serve as the basis for the log file of each job)
 
-      sys.stdout = mol_log
+      job_logging.log_to(mol_log)
       
       print ("{:<49} {:<100}".format('Cluster name:',cluster_name))      
       print ("{:<50} {:<100}".format('\nProfile:',profile))
@@ -475,8 +571,8 @@ def main():
         raise abin_errors.AbinError ('ERROR: The "chemical_formula" value in the file_data dictionary returned by the %s scanning function is not a list.' % scan_fct)  
 
       for atom in file_data['chemical_formula'].keys():
-        # Scan mendeleev looking for the atom symbol. If there is no match, return None thus raise an exception (see https://stackoverflow.com/questions/8653516/python-list-of-dictionaries-search for more details)
-        if not next((element for element in mendeleev if element["symbol"] == atom), None):
+        # Look for the atom symbol in mendeleev. If there is no match, raise an exception
+        if not mendeleev.element(atom):
           raise abin_errors.AbinError ("ERROR: Element %s is not defined in AlexGustafsson's Mendeleev Table YAML file (mendeleev.yml)" % atom)
 
       # Check the atomic coordinates
@@ -563,6 +659,17 @@ def main():
       job_mem_per_cpu = jobscale['mem_per_cpu']
       delay_command = jobscale.get("delay_command", '')
 
+      # Replace the walltime and the memory of the job scale by those recommended from the previous jobs, if possible
+
+      if recommender:
+        recommendation, reason = recommender.recommend(scale_index, job_cores, job_walltime, job_mem_per_cpu)
+        if recommendation:
+          print("\nRecommendation based on %s previous job(s) (safety quantile: %s): walltime %s instead of %s, %s MB per CPU instead of %s." % (recommendation['samples'], safety_quantile, recommendation['time'], job_walltime, recommendation['mem_per_cpu'], job_mem_per_cpu))
+          job_walltime = recommendation['time']
+          job_mem_per_cpu = recommendation['mem_per_cpu']
+        else:
+          print("\nNo recommendation for this job: %s. The values of the job scale will be used." % reason)
+
       print("")
       print(''.center(50, '-'))
       print("{:<20} {:<30}".format("Scale index: ", scale_index))
@@ -582,8 +689,9 @@ def main():
       # End of logging for the geometry file                      #
       # ========================================================= #
   
-      sys.stdout = original_stdout                       # Reset the standard output to its original value
-      mol_log.close()
+      job_logging.log_to(None)                           # Send the output of the print calls back to the console
+
+      job_logging.event("mol_done", geometry=mol_filepath)
 
     # ========================================================= #
     # Exception handling for the geometry files                 #
@@ -592,10 +700,10 @@ def main():
     # In case of an error specific to ABIN LAUNCHER, skip the geometry file (and do not archive it)
 
     except abin_errors.AbinError as error:
-      sys.stdout = original_stdout                       # Reset the standard output to its original value
+      job_logging.log_to(None)                           # Send the output of the print calls back to the console
       print(error)
-      print("Skipping %s molecule" % mol_name)
-      os.remove(os.path.join(out_dir,mol_log_name))      # Remove the log file since there was a problem
+      print("Skipping %s molecule" % mol_name)           # No log file is written since there was a problem
+      job_logging.event("mol_skipped", geometry=mol_filepath, reason=str(error))
       keep_cf = True                                     # Flag to notify that a problem has occurred with this geometry and to not archive the configuration files
       continue
 
@@ -628,15 +736,14 @@ def main():
         config_name = str(os.path.splitext(config_filename)[0])
         print("{:<80}".format("\nTreating '%s' geometry with '%s' configuration ..." % (mol_name, config_name)), end="")
         
-        # Create an output log file for each geometry - config combination, using the mol_log file as a basis
+        # Create an output log for each geometry - config combination, using the mol_log as a basis
 
         log_name = mol_name + "_" + config_name + ".log"
-        shutil.copy(os.path.join(out_dir,mol_log_name),os.path.join(out_dir,log_name))
-        log = open(os.path.join(out_dir,log_name), 'a', encoding='utf-8')
+        log = job_logging.JobLog(initial_value=mol_log.getvalue())
 
-        # Redirect standard output to the log file (see https://stackabuse.com/writing-to-a-file-with-pythons-print-function/ for reference)
+        # Send the output of the print calls to the log (it is kept in memory and only written on the disk once the job has been treated)
 
-        sys.stdout = log
+        job_logging.log_to(log)
         
         # Check if a directory already exists for that geometry - config combination
 
@@ -662,8 +769,7 @@ def main():
         # Load config file
 
         print ("{:<51}".format('\nLoading %s file ...' % config_filename), end="")
-        with open(config_filepath, 'r') as f_config:
-          config = yaml.load(f_config, Loader=yaml.FullLoader)
+        config = yaml_loader.load(config_filepath)
         print("[ DONE ]")
 
         #######################################################################
@@ -772,46 +878,77 @@ def main():
         print(section_title.center(len(section_title)+10))
         print(''.center(len(section_title)+10, '*'))
 
+        # Columns of the job registry for this job (see job_submission.py)
+
+        job_info = {"Cluster": cluster_name, "Launcher": "abin_launcher", "Molecule": mol_name, "Profile": profile, "Config": config_name, "Scale": jobscale["label"], "Job directory": job_dir, "Script": rendered_script}
+
+        # Add the job to the backlog if it would exceed the submission limits of the cluster
+
+        if not dry_run and governor and not governor.allows(job_partition):
+
+          governor.defer({"job_dir": job_dir, "script": rendered_script, "delay_command": delay_command, "partition": job_partition, "log_file": os.path.join(job_dir,log_name), "registry": job_registry if registry else None, "job": job_info})
+          deferred_count += 1
+
+          print("\nThe submission limits of the %s cluster have been reached, this job has been added to the backlog and will be submitted by a later execution." % cluster_name)
+          job_logging.console('%12s' % "[ DEFERRED ]")
+          job_logging.event("job_deferred", job_dir=job_dir, backlog=governor.backlog_path)
+
         # Launch the job
-        
-        if not dry_run:
+
+        elif not dry_run:
 
           print("{:<51}".format("\nLaunching the job ..."), end="")
-          os.chdir(job_dir)
 
           # Define the launch command
 
           launch_command = submit_command + " " + delay_command + " " + rendered_script
 
-          # Execute the command and get the command status
-
-          retcode = os.system(launch_command)
+          # Execute the command from the job directory and get the job ID given by the job scheduler
           
           # If something went wrong when submitting the job, do not raise an exception and just quit the execution. It is likely a problem linked to the cluster.
 
-          if retcode != 0 :
-            sys.stdout = original_stdout                             # Reset the standard output to its original value
+          try:
+            job_id, submit_output = job_submission.submit(submit_command, rendered_script, job_dir, delay_command)
+          except job_submission.SubmissionError as error:
+            print("\n" + error.output.strip())
+            job_logging.log_to(None)                                 # Send the output of the print calls back to the console
+            log.save(os.path.join(job_dir,log_name))
+            print("\n%s" % error)
+            print(error.output.strip())
             print("Job submit encountered an issue")
             print("Aborting ...")
+            job_logging.event("submit_failed", job_dir=job_dir, retcode=error.returncode)
+            job_logging.close_events()
             exit(5)
         
           job_count += 1
 
           print("[ DONE ]")
+          print("{:<50} {:<20}".format("\nJob ID: ", (job_id or "unknown (%s)" % submit_output.strip())))
+
+          if governor:
+            governor.count(job_partition)
+
+          # Record the job in the job registry
+
+          if registry and job_id:
+            job_submission.record(registry, dict(job_info, **{"Job ID": job_id}))
+
+          job_logging.event("job_submitted", job_dir=job_dir, command=launch_command, job_id=job_id)
         
         else:
 
           print("\nThe dry run option has been enabled, this job will not be submitted to the job scheduler.")
-          sys.stdout = original_stdout                            # Reset the standard output to its original value
-          print('%12s' % "[ DONE ]")
+          job_logging.console('%12s' % "[ DONE ]")
 
         # ================================================================== #
         # End of logging for that particular geometry - config combination   #
         # ================================================================== #
 
-        sys.stdout = original_stdout                            # Reset the standard output to its original value
-        log.close()                                             # End of logging for the config file
-        shutil.move(os.path.join(out_dir,log_name), job_dir)    # Archive the log file in the job subdirectory
+        job_logging.log_to(None)                                # Send the output of the print calls back to the console
+        log.save(os.path.join(job_dir,log_name))                # Write the log file directly in the job subdirectory
+
+        job_logging.event("job_created", geometry=mol_filepath, config=config_filepath, job_dir=job_dir)
 
         # If a maximum number of configuration files has been given, increase the configuration counter and check if we have reached the max
 
@@ -828,10 +965,10 @@ def main():
       # In case of an error specific to the configuration file, skip it (and do not archive it)
 
       except abin_errors.AbinError as error:
-        sys.stdout = original_stdout                            # Reset the standard output to its original value
+        job_logging.log_to(None)                                # Send the output of the print calls back to the console
         print(error)
-        print("Skipping configuration '%s'" % config_name)
-        os.remove(os.path.join(out_dir,log_name))               # Remove the log file since there was a problem
+        print("Skipping configuration '%s'" % config_name)     # No log file is written since there was a problem
+        job_logging.event("config_skipped", geometry=mol_filepath, config=config_filepath, reason=str(error))
         problem_cf.append(config_filepath)                      # Add the path to this configuration file to the list as to not archive it
         keep_mol = True                                         # Flag to notify that a problem has occurred and to not archive the geometry file
         continue        
@@ -840,8 +977,6 @@ def main():
     # Archiving the geometry file                               #
     # ========================================================= #
 
-    os.remove(os.path.join(out_dir,mol_log_name))               # Remove the geometry log file since we've finished treating this molecule
-
     # Archive the geometry file if keep_mol has not been set and there was no problem
 
     if not keep_mol:
@@ -890,8 +1025,16 @@ def main():
       print("One job has been succesfully launched.")
     elif job_count > 1:
       print("%s jobs have been succesfully launched." % job_count)
-    else:
+    elif not deferred_count:
       print("WARNING: No job could be launched.")
+    if deferred_count:
+      print("%s job(s) have been added to the backlog (%s) and will be submitted by a later execution." % (deferred_count, governor.backlog_path))
+
+  if registry:
+    registry.close()
+
+  job_logging.event("end", jobs_launched=(None if dry_run else job_count), jobs_deferred=(None if dry_run else deferred_count), skipped_configs=problem_cf)
+  job_logging.close_events()
 
   print("")
   print("".center(columns,"*"))
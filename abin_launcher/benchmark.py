@@ -5,6 +5,7 @@
 ##                                                                                                                                            ##
 ##                                    Use it in conjunction with the jinja template benchmark.jinja as it                                     ##
 ##                                  will complete the lines from the CSV file created by that jinja template                                  ##
+##         The results are kept in a benchmark store (see benchmark_store.py), the final CSV file being only an export of that store          ##
 ################################################################################################################################################
 
 import argparse
@@ -15,6 +16,7 @@ import shutil
 import subprocess
 
 import abin_errors
+import benchmark_store
 
 # =================================================================== #
 # =================================================================== #
@@ -27,33 +29,77 @@ import abin_errors
 # ========================================================= #
 
 # All the values are obtained through the use of the sacct command, see https://slurm.schedmd.com/sacct.html for more information. The docstrings of these functions are issued from the SLURM sacct documentation.
+# Each function can either query sacct for its own job or take the value from the record of that job, as obtained through the get_sacct_records function (one sacct call for many jobs at once).
 
-def get_CPUTime(jobID:int) -> str:
+# Fields needed by the functions below, in the order they are asked to sacct in bulk mode (JobIDRaw is used to identify the jobs, since it does not depend on job arrays)
+
+SACCT_FIELDS = ["JobIDRaw", "Reserved", "Elapsed", "Timelimit", "MaxRSS", "ReqCPUS", "ReqMem", "TotalCPU", "CPUTime"]
+
+def get_sacct_records(jobIDs:list, chunk_size:int=500) -> dict:
+
+  """ Queries sacct for many jobs at once, with one call per chunk of job IDs, and returns a dictionary associating each job ID with its record. A record is the list of the lines given by sacct for that job (the job allocation first, then the job steps), each line being a dictionary associating each field of SACCT_FIELDS with its value.
+  The job IDs of a chunk for which the sacct call failed are associated with None, while the job IDs unknown to sacct are simply absent from the dictionary. """
+
+  records = {}
+
+  for start in range(0, len(jobIDs), chunk_size):
+
+    chunk = jobIDs[start:start+chunk_size]
+
+    try:
+      output = subprocess.run(["sacct", "-j", ",".join(chunk), "--parsable2", "--noheader", "--format=" + ",".join(SACCT_FIELDS)], stdout=subprocess.PIPE, check=True).stdout.decode('utf-8')
+    except (OSError, subprocess.CalledProcessError) as error:
+      print("WARNING: The bulk sacct call failed for %s job(s), they will be queried one by one (%s)" % (len(chunk),error))
+      records.update({jobID: None for jobID in chunk})
+      continue
+
+    # Sort the lines by job ID (the job steps, such as 1234.batch, belong to the 1234 job)
+
+    for line in output.splitlines():
+      values = line.split("|")
+      if len(values) != len(SACCT_FIELDS):
+        continue
+      fields = dict(zip(SACCT_FIELDS, values))
+      records.setdefault(fields["JobIDRaw"].split(".")[0], []).append(fields)
+
+  return records
+
+
+def get_CPUTime(jobID:int, record:list=None) -> str:
 
   """ Time used (Elapsed time * CPU count) by a job or step in HH:MM:SS format. """
 
+  if record is not None:
+    return record[0]["CPUTime"]
+
   CPU_time = str(subprocess.check_output("sacct -j {} --format=CPUTime%20 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
 
   return str(CPU_time)
 
 
-def get_Elapsed(jobID:int) -> str:
+def get_Elapsed(jobID:int, record:list=None) -> str:
 
   """ The jobs elapsed time. The format of this fields output is as follows: [DD-[HH:]]MM:SS """
 
+  if record is not None:
+    return record[0]["Elapsed"]
+
   elapsed = str(subprocess.check_output("sacct -j {} --format=Elapsed%20 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
 
   return str(elapsed)
 
 
-def get_MaxRSS(jobID:int) -> int:
+def get_MaxRSS(jobID:int, record:list=None) -> int:
 
   """ Maximum resident set size of all tasks in job. (Note: expressed in KB, converted in MB) """
 
   # Get all maxRSS values from all job steps
 
-  maxRSS_raw = str(subprocess.check_output("sacct -j {} --format=MaxRSS%12 --noheader".format(jobID), shell=True).decode('utf-8'))
-  maxRSS_lines = maxRSS_raw.splitlines()
+  if record is not None:
+    maxRSS_lines = [line["MaxRSS"] for line in record]
+  else:
+    maxRSS_raw = str(subprocess.check_output("sacct -j {} --format=MaxRSS%12 --noheader".format(jobID), shell=True).decode('utf-8'))
+    maxRSS_lines = maxRSS_raw.splitlines()
 
   # Get rid of whitespaces 
 
@@ -63,7 +109,7 @@ def get_MaxRSS(jobID:int) -> int:
 
   for line in maxRSS_list:
     if line[-1].lower() != 'k' and line[-1].lower() != 'm' and line[-1] != '0':
-      raise ValueError ("One of the values returned by 'sacct -j {} --format=MaxRSS%12 --noheader' is of unknown units".format(jobID))
+      raise ValueError ("One of the MaxRSS values returned by sacct for job {} is of unknown units".format(jobID))
 
   # Get rid of the k / K or m / M at the end of the numbers (and convert KB to MB while we're at it)
 
@@ -76,48 +122,63 @@ def get_MaxRSS(jobID:int) -> int:
   return maxRSS_m
 
 
-def get_ReqCPUs(jobID:int) -> int:
+def get_ReqCPUs(jobID:int, record:list=None) -> int:
 
   """ Number of requested CPUs. """
 
+  if record is not None:
+    return int(record[0]["ReqCPUS"])
+
   req_cpus = str(subprocess.check_output("sacct -j {} --format=ReqCPUs --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
 
   return int(req_cpus)
 
 
-def get_ReqMem(jobID:int) -> int:
+def get_ReqMem(jobID:int, record:list=None) -> int:
 
   """ Minimum required memory for the job, in MB. A 'c' at the end of number represents Memory Per CPU, a 'n' represents Memory Per Node. Note: This value is only from the job allocation, not the step. """
 
-  req_mem = str(subprocess.check_output("sacct -j {} --format=ReqMem%10 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
+  if record is not None:
+    req_mem = record[0]["ReqMem"]
+  else:
+    req_mem = str(subprocess.check_output("sacct -j {} --format=ReqMem%10 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
   req_mem = req_mem.rstrip('Mc')
 
   return int(req_mem)
 
 
-def get_Reserved(jobID:int) -> str:
+def get_Reserved(jobID:int, record:list=None) -> str:
 
   """ How much wall clock time was used as reserved time for this job. This is derived from how long a job was waiting from eligible time to when it actually started. Format is the same as Elapsed. """
 
+  if record is not None:
+    return record[0]["Reserved"]
+
   reserved = str(subprocess.check_output("sacct -j {} --format=Reserved%20 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
 
   return str(reserved)
 
 
-def get_Timelimit(jobID:int) -> str:
+def get_Timelimit(jobID:int, record:list=None) -> str:
 
   """ What the timelimit was for the job. Format is the same as Elapsed. """
 
+  if record is not None:
+    return record[0]["Timelimit"]
+
   time_limit = str(subprocess.check_output("sacct -j {} --format=Timelimit%20 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
 
   return str(time_limit)
 
 
-def get_TotCPU(jobID:int) -> str:
+def get_TotCPU(jobID:int, record:list=None) -> str:
 
   """ The sum of the SystemCPU and UserCPU time used by the job or job step. The total CPU time of the job may exceed the job's elapsed time for jobs that include multiple job steps. Format is the same as Elapsed.
   Note: TotalCPU provides a measure of the task's parent process and does not include CPU time of child processes. """
 
+  if record is not None:
+    return record[0]["TotalCPU"]
+
   totCPU = str(subprocess.check_output("sacct -j {} --format=TotalCPU%20 --noheader | head -n1 | tr -d [:space:]".format(jobID), shell=True).decode('utf-8'))
 
   return str(totCPU)
@@ -152,11 +213,13 @@ parser = argparse.ArgumentParser(add_help=False, description="Use it in conjunct
 
 required = parser.add_argument_group('Required arguments')
 required.add_argument("-t", "--tmp", type=str, help="Path towards the temporary CSV file that contains the lines you want to enrich.", required=True)
-required.add_argument("-f", "--final", type=str, help="Path towards the final CSV file that will contain the enriched lines.", required=True)
+required.add_argument("-f", "--final", type=str, help="Path towards the final CSV file, which will be rewritten with all the enriched lines of the benchmark store.", required=True)
 required.add_argument("-p", "--prob", type=str, help="Path towards a separate CSV file that will contain the problematic lines.", required=True)
 
 optional = parser.add_argument_group('Optional arguments')
 optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument("-db", "--database", type=str, help="Path towards the SQLite database file of the benchmark store, where all the enriched lines are kept (one line per job ID). By default, it is the path of the final CSV file with the .db extension. If the store does not exist yet, it will be created and filled with the content of the final CSV file.")
+optional.add_argument("-c", "--chunk_size", type=int, default=500, help="Number of jobs whose values are fetched with a single sacct call (bulk mode). Set it to 0 to query sacct separately for each job and each value, as was done before.")
 
 # =================================================================== #
 # =================================================================== #
@@ -202,6 +265,8 @@ def main():
   csv_tmp = args.tmp                      # CSV file that needs to be processed (likely created by benchmark.jinja)
   csv_final = args.final                  # Path towards the enriched, final CSV file that will be created, with completed lines
   csv_prob = args.prob                    # Path towards a separate, "problematic" CSV file that will contain the problematic lines that couldn't be correctly processed
+  chunk_size = args.chunk_size            # Number of jobs queried at once through sacct (0 to query each job separately)
+  db_path = args.database if args.database else os.path.splitext(csv_final)[0] + ".db"   # SQLite database file of the benchmark store
 
   # ========================================================= #
   # Initialize some variables                                 #
@@ -233,6 +298,26 @@ def main():
     print("    Detected CSV dialect in tmp file: {}".format(dialect))
     print("    Detected CSV header in tmp file : {}".format(csv_tmp_header))
 
+  # ========================================================= #
+  # Open the benchmark store                                  #
+  # ========================================================= #
+
+  print("\nOpening the benchmark store {} ...".format(db_path), end='')
+  store = benchmark_store.connect(db_path)
+  print("{:>12}".format("[DONE]"))
+
+  # If the store has just been created, fill it with the content of the final CSV file so that the previous results are not lost
+
+  if benchmark_store.count(store) == 0 and os.path.isfile(csv_final) and os.path.getsize(csv_final) > 0:
+    print("\nImporting the previous results from {} ...".format(csv_final), end='')
+    nb_imported = benchmark_store.import_csv(store, csv_final)
+    print("{:>12}".format("[DONE]"))
+    print("    {} line(s) imported".format(nb_imported))
+
+  # Get the status of the jobs already present in the store (the jobs whose values have already been fetched will not be processed again)
+
+  statuses = benchmark_store.get_statuses(store, [str(line['Job ID']) for line in tmp_list if str(line['Job ID']) != ""])
+
   # =================================================================== #
   # =================================================================== #
   #                          GETTING THE VALUES                         #
@@ -247,6 +332,14 @@ def main():
   print(section_title.center(len(section_title)+10))
   print(''.center(len(section_title)+10, '*'))
 
+  # Fetch the values of all the jobs at once (bulk mode), rather than calling sacct several times for each line
+
+  if chunk_size > 0:
+    jobIDs = list(dict.fromkeys(str(line['Job ID']) for line in tmp_list if str(line['Job ID']) != "" and statuses.get(str(line['Job ID'])) != "done"))
+    print("\nQuerying sacct for {} job(s), by chunks of {} ...".format(len(jobIDs),chunk_size), end='')
+    records = get_sacct_records(jobIDs, chunk_size)
+    print("{:>12}".format("[DONE]"))
+
   print("\nProcessing lines ...")
 
   for line in tmp_list:
@@ -270,22 +363,35 @@ def main():
         print("No JobID found. Skipping line... \n")
         continue
       print("{:>20}: {:<}".format("Job ID",jobID))
+
+      if statuses.get(jobID) == "done":
+        print("This job is already in the benchmark store. Skipping line... \n")
+        continue
       
       print(''.center(60, '-'))
 
+      # Get the record of this job if the values have been fetched in bulk mode (None means that this job needs to be queried on its own)
+
+      record = None
+
+      if chunk_size > 0:
+        if jobID not in records:
+          raise ValueError ("No accounting information has been found by sacct for job {}".format(jobID))
+        record = records[jobID]
+
       # ========================================================= #
       # Time information                                          #
       # ========================================================= #
 
-      reserved = get_Reserved(jobID)
+      reserved = get_Reserved(jobID, record)
       print("{:>20}: {:<}".format("Reserved",reserved))
       new_line['Reserved'] = reserved
 
-      elapsed = get_Elapsed(jobID)
+      elapsed = get_Elapsed(jobID, record)
       print("{:>20}: {:<}".format("Elapsed",elapsed))
       new_line['Elapsed'] = elapsed
 
-      walltime = get_Timelimit(jobID)
+      walltime = get_Timelimit(jobID, record)
       print("{:>20}: {:<}".format("Walltime",walltime))
 
       # Compute time efficiency
@@ -304,12 +410,12 @@ def main():
       # Memory information                                        #
       # ========================================================= #
 
-      maxRSS = get_MaxRSS(jobID)
+      maxRSS = get_MaxRSS(jobID, record)
       print("{:>20}: {:<} MB".format("MaxRSS",maxRSS))
       new_line['Max RSS (MB)'] = maxRSS
 
-      nb_cpus = get_ReqCPUs(jobID)
-      mem_per_cpu = get_ReqMem(jobID)
+      nb_cpus = get_ReqCPUs(jobID, record)
+      mem_per_cpu = get_ReqMem(jobID, record)
       tot_mem = nb_cpus * mem_per_cpu
       print("{:>20}: {:<} MB ({} MB for each of {} CPUs)".format("Total MEM",tot_mem,mem_per_cpu,nb_cpus))
 
@@ -326,11 +432,11 @@ def main():
       # CPU Information                                           #
       # ========================================================= #
 
-      totCPU = get_TotCPU(jobID)
+      totCPU = get_TotCPU(jobID, record)
       print("{:>20}: {:<}".format("TotalCPU",totCPU))
       new_line['Total CPU'] = totCPU
 
-      wallCPU = get_CPUTime(jobID)
+      wallCPU = get_CPUTime(jobID, record)
       print("{:>20}: {:<}".format("Wall CPU",wallCPU))
       new_line['Wall CPU'] = wallCPU
 
@@ -369,10 +475,10 @@ def main():
   # =================================================================== #
 
   # ========================================================= #
-  # Add information to final CSV file                         #
+  # Store the new information and export the final CSV file   #
   # ========================================================= #
 
-  section_title = "2. Writing new information to final CSV file"
+  section_title = "2. Storing new information and exporting the final CSV file"
 
   print("")
   print("")
@@ -381,35 +487,27 @@ def main():
   print(''.center(len(section_title)+10, '*'))
   print("")
 
-  if final_list == []:
+  if final_list == [] and errors_list != []:
     print("ERROR: None of the lines were processed correctly.")
-  else:
 
-    # Define the final CSV header
-
-    csv_final_header = csv_tmp_header + ["Reserved", "Elapsed", "Time Efficiency", "Max RSS (MB)", "RAM Efficiency", "Total CPU", "Wall CPU", "CPU Efficiency"]
-    print("Used dialect in the final CSV file: {}".format(dialect))
-    print("Header used in final CSV file: {}".format(csv_final_header))
-
-    # Define if we have to write the header or not (only write it if the file does not exist or is empty)
+  # Store the processed and problematic lines (if a job ID is already present in the store, its line is updated rather than duplicated)
 
-    write_header = True
-    if (os.path.exists(csv_final) and os.path.isfile(csv_final)):
-      with open(csv_final, 'r') as f:
-        write_header = (not f.readline()) # If the file is empty, write_header = True. Otherwise, write_header = False
+  print("Storing the new lines in the benchmark store {} ...".format(db_path), end='')
+  benchmark_store.upsert(store, final_list, "done")
+  benchmark_store.upsert(store, errors_list, "problem")
+  print("{:>12}".format("[DONE]"))
 
-    # Open the final CSV file in 'Append' mode and add processed lines (+ write header if required)
+  # The final CSV file is only an export of the store, it is entirely rewritten each time
 
-    print("\nWriting newly processed lines to the final file {} ...".format(csv_final), end='')
+  csv_final_header = [column for column in benchmark_store.get_columns(store) if not column.startswith("_")]
+  print("\nHeader used in final CSV file: {}".format(csv_final_header))
 
-    with open(csv_final, 'a', newline='') as final_f:
-      csv_writer = csv.DictWriter(final_f, fieldnames=csv_final_header, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-      if write_header:
-        csv_writer.writeheader()
-      for line in final_list:
-        csv_writer.writerow(line)
+  print("\nExporting the benchmark store to the final file {} ...".format(csv_final), end='')
+  nb_exported = benchmark_store.export_csv(store, csv_final)
+  print("{:>12}".format("[DONE]"))
+  print("    {} line(s) in the final file".format(nb_exported))
 
-    print("{:>12}".format("[DONE]"))
+  store.close()
 
   # ========================================================= #
   # Add problematic lines to a separate CSV file              #
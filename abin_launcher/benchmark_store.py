@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+################################################################################################################################################
+##                                                              Benchmark store                                                               ##
+##                                                                                                                                            ##
+##             This script contains the functions used to store the benchmarking results of ABIN LAUNCHER in an SQLite database,              ##
+##                             where each job is identified by its job ID, and to export them in the CSV format.                              ##
+################################################################################################################################################
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+
+import abin_errors
+
+# Functions common to the SQLite databases of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+sqlite_common = abin_errors.import_path(os.path.join(control_dir,"sqlite_common.py"))
+
+# The store contains a single table, whose columns are the columns of the benchmarking CSV files (created on the fly and in the same order, so that the content of the CSV files can be customized).
+# The job ID column is unique, which is what allows the lines to be updated rather than duplicated.
+# The columns whose name starts with an underscore are only used internally and are never exported.
+
+TABLE = "jobs"
+KEY = "Job ID"
+STATUS = "_status"
+
+# Columns used to filter the jobs, an index is created for each of them to speed up the queries
+
+INDEXED_COLUMNS = ["Profile", "Cluster", "Jobscale", "Scale Index"]
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _add_columns(connection:sqlite3.Connection, names:list):
+    """Adds the missing columns to the table, and creates the index of the new columns that need one. This must be called inside a transaction."""
+
+    columns = get_columns(connection)
+
+    for name in names:
+      if name in columns:
+        continue
+      connection.execute("ALTER TABLE %s ADD COLUMN %s TEXT" % (TABLE, sqlite_common.quote(name)))
+      columns.append(name)
+      if name == KEY:
+        connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS %s ON %s (%s)" % (sqlite_common.quote("idx_" + name), TABLE, sqlite_common.quote(name)))
+      elif name in INDEXED_COLUMNS:
+        connection.execute("CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (sqlite_common.quote("idx_" + name), TABLE, sqlite_common.quote(name)))
+
+#######################################################################
+
+def _where(filters:dict=None, status:str=None):
+    """Builds the WHERE clause (and its parameters) selecting the jobs whose columns have the given values and, if given, the given status."""
+
+    if status is not None:
+      filters = dict(filters or {}, **{STATUS: status})
+
+    return sqlite_common.where(filters)
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def connect(db_path:str, timeout:float=120.0) -> sqlite3.Connection:
+    """Opens the benchmark store (and creates it if it does not exist yet).
+
+    Parameters
+    ----------
+    db_path : str
+        Path towards the SQLite database file.
+    timeout : float, optional
+        How many seconds to wait for the other processes writing in the store to release their lock, by default 120.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        Connection to the store, in autocommit mode (the changes are grouped with the transaction function).
+    """
+
+    connection = sqlite_common.connect(db_path, timeout)
+
+    with sqlite_common.transaction(connection):
+      connection.execute("CREATE TABLE IF NOT EXISTS %s (%s TEXT)" % (TABLE, sqlite_common.quote(STATUS)))
+
+    return connection
+
+#######################################################################
+
+def get_columns(connection:sqlite3.Connection) -> list:
+    """Returns the names of the columns of the store, in the order in which they have been created."""
+
+    return [row["name"] for row in connection.execute("PRAGMA table_info(%s)" % TABLE)]
+
+#######################################################################
+
+def upsert(connection:sqlite3.Connection, lines:list, status:str=None):
+    """Inserts lines into the store or, for the job IDs already present, updates them. Only the columns present in the lines are updated, so that updating a job with a line from the temporary CSV file does not erase the values already fetched for it. Storing the same lines several times thus gives the same result as storing them once.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the store, as returned by the connect function.
+    lines : list
+        Lines to store, each of them being a dictionary associating the name of the columns with their value (as given by csv.DictReader). The lines without a job ID are ignored.
+    status : str, optional
+        Status of the jobs (e.g. "done" or "problem"), by default the status is not modified.
+    """
+
+    # Convert all the values to strings, so that they are exported exactly as they have been stored
+
+    all_values = []
+
+    for line in lines:
+      if not line.get(KEY):
+        continue
+      values = {column: ("" if value is None else str(value)) for column, value in line.items() if column is not None}
+      if status is not None:
+        values[STATUS] = status
+      all_values.append(values)
+
+    with sqlite_common.transaction(connection):
+
+      _add_columns(connection, list(dict.fromkeys(column for values in all_values for column in values)))
+
+      for values in all_values:
+
+        columns = list(values)
+        updates = ", ".join("%s = excluded.%s" % (sqlite_common.quote(column), sqlite_common.quote(column)) for column in columns if column != KEY)
+
+        connection.execute("INSERT INTO %s (%s) VALUES (%s) ON CONFLICT(%s) DO UPDATE SET %s" % (TABLE, ", ".join(sqlite_common.quote(column) for column in columns), ", ".join("?" for column in columns), sqlite_common.quote(KEY), updates), [values[column] for column in columns])
+
+#######################################################################
+
+def get_statuses(connection:sqlite3.Connection, job_ids:list) -> dict:
+    """Returns a dictionary associating each of the given job IDs with its status in the store (the job IDs absent from the store are absent from the dictionary)."""
+
+    statuses = {}
+
+    if KEY not in get_columns(connection):
+      return statuses
+
+    # Query the job IDs by chunks, since the number of parameters of an SQL statement is limited
+
+    for start in range(0, len(job_ids), 500):
+      chunk = [str(job_id) for job_id in job_ids[start:start+500]]
+      for row in connection.execute("SELECT %s, %s FROM %s WHERE %s IN (%s)" % (sqlite_common.quote(KEY), sqlite_common.quote(STATUS), TABLE, sqlite_common.quote(KEY), ", ".join("?" for job_id in chunk)), chunk):
+        statuses[row[0]] = row[1]
+
+    return statuses
+
+#######################################################################
+
+def query(connection:sqlite3.Connection, filters:dict=None, status:str=None) -> list:
+    """Fetches the jobs matching some criteria from the store.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the store, as returned by the connect function.
+    filters : dict, optional
+        Dictionary associating the name of some columns with the value they must have (e.g. {"Profile": "orca", "Cluster": "lyra"}).
+    status : str, optional
+        Status that the jobs must have (e.g. "done").
+
+    Returns
+    -------
+    lines : list
+        The matching jobs, in the order in which they were first stored, each of them being a dictionary associating the name of the columns with their value (internal columns included).
+    """
+
+    columns = get_columns(connection)
+
+    unknown = [column for column in (filters or {}) if column not in columns]
+    if unknown:
+      return []
+
+    clause, params = _where(filters, status)
+    lines = [dict(row) for row in connection.execute("SELECT * FROM %s%s ORDER BY rowid" % (TABLE, clause), params)]
+
+    return lines
+
+#######################################################################
+
+def count(connection:sqlite3.Connection, filters:dict=None, status:str=None) -> int:
+    """Returns the number of jobs matching some criteria in the store (see the query function for the meaning of the arguments)."""
+
+    if any(column not in get_columns(connection) for column in (filters or {})):
+      return 0
+
+    clause, params = _where(filters, status)
+
+    return connection.execute("SELECT COUNT(*) FROM %s%s" % (TABLE, clause), params).fetchone()[0]
+
+#######################################################################
+
+def import_csv(connection:sqlite3.Connection, csv_path:str, status:str="done") -> int:
+    """Stores the content of a benchmarking CSV file (e.g. a final CSV file written before the store existed). Returns the number of imported lines."""
+
+    with open(csv_path, 'r', newline='') as csv_file:
+      lines = list(csv.DictReader(csv_file, delimiter=';'))
+
+    upsert(connection, lines, status)
+
+    return len(lines)
+
+#######################################################################
+
+def export_csv(connection:sqlite3.Connection, csv_path:str, filters:dict=None, status:str="done") -> int:
+    """Writes the jobs matching some criteria in a CSV file, which is entirely rewritten (the internal columns are not exported). The file is replaced in a single operation, so that it can be read at any time. Returns the number of exported lines.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the store, as returned by the connect function.
+    csv_path : str
+        Path towards the CSV file.
+    filters : dict, optional
+        Dictionary associating the name of some columns with the value they must have.
+    status : str, optional
+        Status that the jobs must have, by default "done".
+    """
+
+    header = [column for column in get_columns(connection) if not column.startswith("_")]
+    lines = query(connection, filters, status)
+
+    tmp_path = "%s.%s.tmp" % (csv_path, os.getpid())
+
+    with open(tmp_path, 'w', newline='') as csv_file:
+      csv_writer = csv.DictWriter(csv_file, fieldnames=header, delimiter=';', quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
+      csv_writer.writeheader()
+      for line in lines:
+        csv_writer.writerow({column: ("" if value is None else value) for column, value in line.items()})
+
+    os.replace(tmp_path, csv_path)
+
+    return len(lines)
+
+# =================================================================== #
+# =================================================================== #
+#                        Command line arguments                       #
+# =================================================================== #
+# =================================================================== #
+
+# Executing this script allows to consult the store, for example to export the results of a particular profile
+
+parser = argparse.ArgumentParser(add_help=False, description="Exports the jobs of the benchmark store created by benchmark.py in the CSV format, possibly filtered by profile, cluster, job scale or scale index.")
+
+required = parser.add_argument_group('Required arguments')
+required.add_argument("-db", "--database", type=str, help="Path towards the SQLite database file of the benchmark store.", required=True)
+
+optional = parser.add_argument_group('Optional arguments')
+optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument("-e", "--export", type=str, help="Path towards the CSV file where the jobs will be exported. By default, they are printed on the screen.")
+optional.add_argument("--profile", type=str, help="Only export the jobs of this profile.")
+optional.add_argument("--cluster", type=str, help="Only export the jobs that ran on this cluster.")
+optional.add_argument("--jobscale", type=str, help="Only export the jobs of this job scale.")
+optional.add_argument("--scale_index", type=str, help="Only export the jobs with this scale index.")
+optional.add_argument("--status", type=str, default="done", help="Only export the jobs with this status ('done' for the jobs whose values have been fetched, 'problem' for the problematic ones), by default 'done'.")
+
+# =================================================================== #
+# =================================================================== #
+#                            MAIN FUNCTION                            #
+# =================================================================== #
+# =================================================================== #
+
+def main():
+
+  args = parser.parse_args()
+
+  if not os.path.isfile(args.database):
+    print("ERROR: There is no benchmark store at %s" % args.database)
+    exit(-1)
+
+  connection = connect(args.database)
+
+  filters = {column: value for column, value in [("Profile", args.profile), ("Cluster", args.cluster), ("Jobscale", args.jobscale), ("Scale Index", args.scale_index)] if value is not None}
+
+  if args.export:
+    count = export_csv(connection, args.export, filters, args.status)
+    print("%s job(s) exported to %s" % (count, args.export))
+
+  else:
+    header = [column for column in get_columns(connection) if not column.startswith("_")]
+    csv_writer = csv.DictWriter(sys.stdout, fieldnames=header, delimiter=';', quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
+    csv_writer.writeheader()
+    for line in query(connection, filters, args.status):
+      csv_writer.writerow({column: ("" if value is None else value) for column, value in line.items()})
+
+  connection.close()
+
+# If this script is executed through the command line, call the main function (see https://realpython.com/python-main-function/ for details)
+
+if __name__ == "__main__":
+  main()
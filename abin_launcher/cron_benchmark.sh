@@ -54,16 +54,19 @@ if [ ! -f "${WATCH_FILE}" ]; then
 
 else
 
-  # Archive the temporary file
+  # Archive the temporary file (while holding its lock, so that no job is adding a line to it at the same time, see benchmark.jinja)
 
   filename="$(basename -- ${WATCH_FILE})"
   mkdir -p ${archive}
-  mv ${WATCH_FILE} ${archive}/${filename%.*}_${timestamp}.csv
+  (
+    flock -w 60 9
+    mv ${WATCH_FILE} ${archive}/${filename%.*}_${timestamp}.csv
+  ) 9>${WATCH_FILE}.lock
 
   # Execute benchmark.py
 
   mkdir -p ${bench_logs}
-  python ${path_script}/benchmark.py --tmp ${archive}/${filename%.*}_${timestamp}.csv --final ${benchmark_path}/${prefix}_final.csv --prob ${benchmark_path}/${prefix}_prob.csv > ${bench_logs}/${prefix}_${timestamp}.log
+  python ${path_script}/benchmark.py --tmp ${archive}/${filename%.*}_${timestamp}.csv --final ${benchmark_path}/${prefix}_final.csv --database ${benchmark_path}/${prefix}.db --prob ${benchmark_path}/${prefix}_prob.csv > ${bench_logs}/${prefix}_${timestamp}.log
 
   echo -e "$(date +"%Y-%m-%d %T")\tINFO - Processed new lines in ${WATCH_FILE}"
 
@@ -0,0 +1,85 @@
+################################################################################################################################################
+##                                                               Periodic table                                                               ##
+##                                                                                                                                            ##
+##            This script contains the functions used to load AlexGustafsson's Mendeleev Table (mendeleev.yml) for ABIN LAUNCHER,             ##
+##            indexed by element symbol and cached in a binary file so that the YAML file is only parsed again when it is modified            ##
+################################################################################################################################################
+
+import os
+
+import abin_errors
+
+# YAML loader shared by all the scripts of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+yaml_loader = abin_errors.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
+# =================================================================== #
+# =================================================================== #
+#                          CLASS DEFINITION                           #
+# =================================================================== #
+# =================================================================== #
+
+class PeriodicTable(list):
+    """Content of AlexGustafsson's Mendeleev Table YAML file, i.e. the list of the elements, each of them being a dictionary (with the "symbol", "number", "electronConfiguration", etc. keys). It can be used exactly as that list, so that the scaling and rendering functions do not need to know about this class, but the elements can also be directly fetched by their symbol.
+
+    Attributes
+    ----------
+    symbols : dict
+        Dictionary associating the symbol of each element with its dictionary.
+    """
+
+    def __init__(self, elements:list=()):
+        super().__init__(elements)
+        self.symbols = {element['symbol']: element for element in self}
+
+    def element(self, symbol:str):
+        """Returns the dictionary of the element with the given symbol, or None if there is no such element."""
+
+        return self.symbols.get(symbol)
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def get_element(mendeleev:list, symbol:str):
+    """Returns the dictionary of the element with the given symbol, or None if there is no such element. The table is scanned if it is a plain list (e.g. loaded directly from the YAML file) rather than a ``PeriodicTable`` object.
+
+    Parameters
+    ----------
+    mendeleev : list
+        Content of AlexGustafsson's Mendeleev Table YAML file, as returned by the load function or by the YAML loader.
+    symbol : str
+        The atom symbol of the element.
+
+    Returns
+    -------
+    element : dict or None
+        The dictionary of the element, or None if there is no element with that symbol in the table.
+    """
+
+    if isinstance(mendeleev, PeriodicTable):
+      return mendeleev.element(symbol)
+
+    return next((element for element in mendeleev if element['symbol'] == symbol), None)
+
+#######################################################################
+
+def load(yaml_file:str) -> PeriodicTable:
+    """Loads AlexGustafsson's Mendeleev Table. The content of the YAML file is kept in a binary cache file (see yaml_loader.py), so that the YAML file is only parsed again when it has been modified.
+
+    Parameters
+    ----------
+    yaml_file : str
+        Path towards the YAML file of the table.
+
+    Returns
+    -------
+    mendeleev : PeriodicTable
+        The content of the YAML file, indexed by element symbol.
+    """
+
+    return PeriodicTable(yaml_loader.load(yaml_file, binary_cache=True))
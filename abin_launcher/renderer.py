@@ -6,15 +6,77 @@
 ################################################################################################################################################
 
 import os
+import shutil
 
-import yaml
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import ChoiceLoader, Environment, FileSystemLoader, ModuleLoader
 
 import abin_errors
 
+# YAML loader shared by all the scripts of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+yaml_loader = abin_errors.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
+
+# Jinja environments (one for each templates directory) and compiled templates, kept for the whole execution so that each template is only loaded and compiled once
+# Each template is stored along with the modification time of its file, so that a template that has been modified since it was loaded is compiled again
+
+_jinja_envs = {}
+_templates_cache = {}
+
+# Templates directories for which precompiled templates are used, along with the directory containing the compiled templates and the time of the compilation
+
+_precompiled_dirs = {}
+
+def _get_jinja_env(templates_dir:str):
+    """Returns the Jinja environment associated with a templates directory, creating it if needed."""
+
+    env = _jinja_envs.get(templates_dir)
+
+    if env is None:
+      env = Environment(loader=FileSystemLoader(templates_dir))
+      _jinja_envs[templates_dir] = env
+
+    return env
+
+#######################################################################
+
+def precompile_templates(templates_dir:str, compiled_dir:str):
+    """Compiles all the Jinja templates of a directory into Python modules and makes the jinja_render function use those modules for that directory, which avoids having to parse and compile the templates each time the script is executed. The templates are only compiled again if one of them has been modified since the last compilation.
+
+    Parameters
+    ----------
+    templates_dir : str
+        The path towards the directory where the Jinja templates are located.
+    compiled_dir : str
+        The path towards the directory where the compiled templates will be stored. It will be created if needed and its content will be replaced each time the templates need to be compiled again.
+    """
+
+    stamp_file = os.path.join(compiled_dir, "compilation.stamp")
+
+    source_env = Environment(loader=FileSystemLoader(templates_dir))
+    last_modified = max((os.path.getmtime(os.path.join(templates_dir, template_file)) for template_file in source_env.list_templates()), default=0)
+
+    # Compile the templates if they have not been compiled yet or if one of them has been modified since then (the stamp file is written last, marking the compilation as complete)
+
+    if not os.path.isfile(stamp_file) or os.path.getmtime(stamp_file) < last_modified:
+      shutil.rmtree(compiled_dir, ignore_errors=True)
+      source_env.compile_templates(compiled_dir, zip=None)
+      open(stamp_file, 'w').close()
+
+    # Templates that could not be compiled (or that have been added since then) are still loaded from their file
+
+    _jinja_envs[templates_dir] = Environment(loader=ChoiceLoader([ModuleLoader(compiled_dir), FileSystemLoader(templates_dir)]))
+    _precompiled_dirs[templates_dir] = (compiled_dir, os.path.getmtime(stamp_file))
+
+    for cache_key in [cache_key for cache_key in _templates_cache if cache_key[0] == templates_dir]:
+      del _templates_cache[cache_key]
+
+#######################################################################
 
 def jinja_render(templates_dir:str, template_file:str, render_vars:dict):
-    """Renders a file based on its Jinja template.
+    """Renders a file based on its Jinja template. The compiled template is kept in memory and reused as long as its file is not modified.
 
     Parameters
     ----------
@@ -30,10 +92,23 @@ def jinja_render(templates_dir:str, template_file:str, render_vars:dict):
     output_text : str
         Content of the rendered file.
     """
-   
-    file_loader = FileSystemLoader(templates_dir)
-    env = Environment(loader=file_loader)
-    template = env.get_template(template_file)
+
+    last_modified = os.path.getmtime(os.path.join(templates_dir, template_file))
+
+    # A precompiled template which has been modified since its compilation means the templates need to be compiled again
+
+    if templates_dir in _precompiled_dirs and last_modified > _precompiled_dirs[templates_dir][1]:
+      precompile_templates(templates_dir, _precompiled_dirs[templates_dir][0])
+
+    cache_key = (templates_dir, template_file)
+    cached = _templates_cache.get(cache_key)
+
+    if cached is not None and cached[0] == last_modified:
+      template = cached[1]
+    else:
+      template = _get_jinja_env(templates_dir).get_template(template_file)
+      _templates_cache[cache_key] = (last_modified, template)
+
     output_text = template.render(render_vars)
     
     return output_text
@@ -395,8 +470,7 @@ def chains_gaussian_render(mendeleev:dict, clusters_cfg:dict, config:dict, file_
       chains_config_file = abin_errors.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
   
       print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-      with open(chains_config_file, 'r') as chains:
-        chains_config = yaml.load(chains, Loader=yaml.FullLoader)
+      chains_config = yaml_loader.load(chains_config_file)
       print('%12s' % "[ DONE ]")
 
     print("{:<80}".format("\nRendering the jinja template for the gaussian job script ..."), end="")
@@ -665,8 +739,7 @@ def chains_gaussian_cation_render(mendeleev:dict, clusters_cfg:dict, config:dict
     chains_config_file = abin_errors.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
 
     print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-    with open(chains_config_file, 'r') as chains:
-      chains_config = yaml.load(chains, Loader=yaml.FullLoader)
+    chains_config = yaml_loader.load(chains_config_file)
     print('%12s' % "[ DONE ]")
 
     print("{:<80}".format("\nRendering the jinja template for the gaussian job script ..."), end="")
@@ -916,8 +989,7 @@ def chains_qchem_render(mendeleev:dict, clusters_cfg:dict, config:dict, file_dat
       chains_config_file = abin_errors.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
   
       print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-      with open(chains_config_file, 'r') as chains:
-        chains_config = yaml.load(chains, Loader=yaml.FullLoader)
+      chains_config = yaml_loader.load(chains_config_file)
       print('%12s' % "[ DONE ]")
 
     print("{:<80}".format("\nRendering the jinja template for the qchem job script ..."), end="")
@@ -1186,8 +1258,7 @@ def chains_orca_render(mendeleev:dict, clusters_cfg:dict, config:dict, file_data
       chains_config_file = abin_errors.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
   
       print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-      with open(chains_config_file, 'r') as chains:
-        chains_config = yaml.load(chains, Loader=yaml.FullLoader)
+      chains_config = yaml_loader.load(chains_config_file)
       print('%12s' % "[ DONE ]")
 
     print("{:<80}".format("\nRendering the jinja template for the orca job script ..."), end="")
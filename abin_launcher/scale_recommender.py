@@ -0,0 +1,202 @@
+################################################################################################################################################
+##                                                           Job scale recommender                                                            ##
+##                                                                                                                                            ##
+##               This script contains the functions used to recommend the walltime and the memory of the jobs of ABIN LAUNCHER,               ##
+##              based on the results of the previous jobs kept in the benchmark store (see benchmark.py and benchmark_store.py)               ##
+################################################################################################################################################
+
+import math
+
+import abin_errors
+import benchmark_store
+from benchmark import slurm_time_to_seconds
+
+# Lower bounds of the recommendations, so that very small jobs still get enough time to load their modules and copy their files, and enough memory to start the program
+
+MIN_WALLTIME = 10 * 60          # in seconds
+MIN_MEM_PER_CPU = 100           # in MB
+
+# Default minimum number of benchmarked jobs needed before making any recommendation
+
+MIN_SAMPLES = 10
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _seconds_to_slurm_time(seconds:int) -> str:
+    """Converts a number of seconds into the D-HH:MM:SS format used for the job scales in the clusters configuration file."""
+
+    days, seconds = divmod(int(seconds), 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+
+    return "%d-%02d:%02d:%02d" % (days, hours, minutes, seconds)
+
+#######################################################################
+
+def _quantile(values:list, quantile:float) -> float:
+    """Computes the quantile of a list of values, with a linear interpolation between the closest ranks (same as the default method of numpy.quantile)."""
+
+    values = sorted(values)
+    position = quantile * (len(values) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+#######################################################################
+
+def _fit(samples:list, quantile:float):
+    """Fits a power law y = a * x^b on a list of (x, y) samples, by a least squares fit of log(y) against log(x). The intercept is then shifted by the given quantile of the residuals, so that this fraction of the samples lies below the fitted curve.
+
+    Returns
+    -------
+    intercept : float
+        Shifted intercept of the fit in log space, i.e. log(a).
+    slope : float
+        Slope of the fit in log space, i.e. the exponent b (0 if all the samples have the same x, in which case the fit simply gives the quantile of the y values).
+    """
+
+    log_x = [math.log(x) for x, y in samples]
+    log_y = [math.log(y) for x, y in samples]
+
+    mean_x = sum(log_x) / len(log_x)
+    mean_y = sum(log_y) / len(log_y)
+
+    var_x = sum((lx - mean_x) ** 2 for lx in log_x)
+
+    # The exponent is not allowed to be negative: a bigger molecule never needs less resources
+
+    slope = max(0.0, sum((lx - mean_x) * (ly - mean_y) for lx, ly in zip(log_x, log_y)) / var_x) if var_x > 0 else 0.0
+    intercept = mean_y - slope * mean_x
+
+    residuals = [ly - (intercept + slope * lx) for lx, ly in zip(log_x, log_y)]
+
+    return intercept + _quantile(residuals, quantile), slope
+
+# =================================================================== #
+# =================================================================== #
+#                          CLASS DEFINITION                           #
+# =================================================================== #
+# =================================================================== #
+
+class ScaleRecommender:
+    """Recommends the walltime and the memory of a job from the walltime and the memory (Max RSS) used by the previous jobs of the same profile on the same cluster, as stored in the benchmark store. For each number of cores, both quantities are fitted against the scale index by a power law, shifted so that a given fraction (the safety quantile) of the previous jobs would have fitted in the recommended resources.
+
+    The recommendations never exceed the resources of the job scale selected by ABIN LAUNCHER, which stays the upper bound. No recommendation is made if there are not enough previous jobs with the same number of cores, or if the scale index of the job is larger than those of the previous jobs (no extrapolation).
+
+    Attributes
+    ----------
+    quantile : float
+        Fraction of the previous jobs that would have fitted in the recommended resources.
+    min_samples : int
+        Minimum number of previous jobs needed to make a recommendation.
+    samples : dict
+        Dictionary associating each number of cores with the list of (scale index, elapsed seconds, Max RSS in MB) of the previous jobs.
+    """
+
+    def __init__(self, db_path:str, cluster_name:str, profile:str, scaling_fct:str, quantile:float=0.95, min_samples:int=MIN_SAMPLES):
+        """Loads the previous jobs of this profile on this cluster from the benchmark store.
+
+        Parameters
+        ----------
+        db_path : str
+            Path towards the SQLite database file of the benchmark store.
+        cluster_name : str
+            Name of the cluster, as defined in the clusters configuration file.
+        profile : str
+            Name of the profile, as defined in the clusters configuration file.
+        scaling_fct : str
+            Name of the scaling function of the profile (the scale indices given by different scaling functions cannot be compared).
+        quantile : float, optional
+            Fraction of the previous jobs that would have fitted in the recommended resources, by default 0.95.
+        min_samples : int, optional
+            Minimum number of previous jobs needed to make a recommendation, by default MIN_SAMPLES.
+        """
+
+        if not 0 < quantile <= 1:
+          raise abin_errors.AbinError ("ERROR: The safety quantile must be greater than 0 and lower than or equal to 1 (%s was given)." % quantile)
+
+        self.quantile = quantile
+        self.min_samples = max(2, min_samples)
+        self.samples = {}
+        self._fits = {}
+
+        connection = benchmark_store.connect(db_path)
+        lines = benchmark_store.query(connection, {"Cluster": cluster_name, "Profile": profile, "Scaling Function": scaling_fct}, "done")
+        connection.close()
+
+        # Lines with missing or unreadable values (e.g. jobs that were cancelled before their end) are simply ignored
+
+        for line in lines:
+          try:
+            cores = int(line["Cores"])
+            scale_index = float(line["Scale Index"])
+            elapsed = slurm_time_to_seconds(line["Elapsed"])
+            max_rss = float(line["Max RSS (MB)"])
+          except (KeyError, TypeError, ValueError):
+            continue
+          if scale_index <= 0:
+            continue
+          self.samples.setdefault(cores, []).append((scale_index, max(elapsed, 1), max(max_rss, 1)))
+
+    #######################################################################
+
+    def count(self) -> int:
+        """Returns the total number of previous jobs that can be used for the recommendations."""
+
+        return sum(len(samples) for samples in self.samples.values())
+
+    #######################################################################
+
+    def recommend(self, scale_index:float, cores:int, max_walltime:str, max_mem_per_cpu:int):
+        """Recommends the walltime and the memory of a job.
+
+        Parameters
+        ----------
+        scale_index : float
+            Scale index of the job, as given by the scaling function.
+        cores : int
+            Number of cores of the job.
+        max_walltime : str
+            Walltime of the selected job scale, in the D-HH:MM:SS format.
+        max_mem_per_cpu : int
+            Memory per CPU of the selected job scale, in MB.
+
+        Returns
+        -------
+        recommendation : dict or None
+            Dictionary containing the recommended walltime ("time", in the D-HH:MM:SS format), the recommended memory per CPU ("mem_per_cpu", in MB) and the number of previous jobs it is based on ("samples"), or None if no recommendation can be made.
+        reason : str
+            Explanation of why no recommendation could be made, or an empty string.
+        """
+
+        samples = self.samples.get(int(cores), [])
+
+        if len(samples) < self.min_samples:
+          return None, "only %s previous job(s) with %s cores in the benchmark store (%s needed)" % (len(samples), cores, self.min_samples)
+
+        if scale_index <= 0 or scale_index > max(sample[0] for sample in samples):
+          return None, "the scale index (%s) is outside the range of the previous jobs with %s cores" % (scale_index, cores)
+
+        # The fits only depend on the number of cores, they are computed once for all the jobs
+
+        if cores not in self._fits:
+          self._fits[cores] = (_fit([(x, time) for x, time, rss in samples], self.quantile), _fit([(x, rss) for x, time, rss in samples], self.quantile))
+
+        (time_intercept, time_slope), (rss_intercept, rss_slope) = self._fits[cores]
+
+        walltime = math.exp(time_intercept + time_slope * math.log(scale_index))
+        max_rss = math.exp(rss_intercept + rss_slope * math.log(scale_index))
+
+        # Round the walltime up to the minute and the memory up to 10 MB, within the bounds
+
+        walltime = min(max(math.ceil(walltime / 60) * 60, MIN_WALLTIME), slurm_time_to_seconds(str(max_walltime)))
+        mem_per_cpu = min(max(math.ceil(max_rss / int(cores) / 10) * 10, MIN_MEM_PER_CPU), int(max_mem_per_cpu))
+
+        recommendation = {"time": _seconds_to_slurm_time(walltime), "mem_per_cpu": mem_per_cpu, "samples": len(samples)}
+
+        return recommendation, ""
@@ -6,6 +6,7 @@
 ################################################################################################################################################
 
 import abin_errors
+import periodic_table
 import re
 
 def total_nb_elec(mendeleev:dict,file_data:dict):
@@ -54,11 +55,12 @@ def total_nb_elec(mendeleev:dict,file_data:dict):
 
         nb_elec = 0
 
-        # Scan the mendeleev table and get the atomic number of our atom
+        # Look for our atom in the mendeleev table and get its atomic number
 
-        for element in mendeleev:
-          if (element['symbol'] == symbol):
-            nb_elec = element['number']
+        element = periodic_table.get_element(mendeleev, symbol)
+
+        if element:
+          nb_elec = element['number']
         
         if nb_elec == 0:
           raise abin_errors.AbinError ("ERROR: There is no atomic number defined for %s in AlexGustafsson's Mendeleev Table YAML file (mendeleev.yml)" % symbol)
@@ -166,20 +168,21 @@ def valence_nb_elec(mendeleev:dict,file_data:dict):
 
         nb_val_elec = 0
 
-        # Scan the mendeleev table and get the electronic configuration of our atom
-
-        for element in mendeleev:
-          if (element['symbol'] == symbol):
-            el_con = element['electronConfiguration']
-            if type(el_con) == int:
-              # For H and He, the number of valence electrons is directly given
-              nb_val_elec = el_con
-            else:
-              # For other atoms, we need to extract that number from the electronic configuration given in the form "[Aa] XyZ MnO"
-              split_el_con = re.split(r'\.|\s+',el_con) # Split the electronic configuration with either point or space delimiters
-              del split_el_con[0]                       # Remove the [ ] part of the electron configuration
-              for term in split_el_con:
-                nb_val_elec += int(term[2:])
+        # Look for our atom in the mendeleev table and get its electronic configuration
+
+        element = periodic_table.get_element(mendeleev, symbol)
+
+        if element:
+          el_con = element['electronConfiguration']
+          if type(el_con) == int:
+            # For H and He, the number of valence electrons is directly given
+            nb_val_elec = el_con
+          else:
+            # For other atoms, we need to extract that number from the electronic configuration given in the form "[Aa] XyZ MnO"
+            split_el_con = re.split(r'\.|\s+',el_con) # Split the electronic configuration with either point or space delimiters
+            del split_el_con[0]                       # Remove the [ ] part of the electron configuration
+            for term in split_el_con:
+              nb_val_elec += int(term[2:])
         
         if nb_val_elec == 0:
           raise abin_errors.AbinError ("ERROR: There is no electronic configuration defined for %s in AlexGustafsson's Mendeleev Table YAML file (mendeleev.yml)" % symbol)
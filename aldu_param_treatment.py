@@ -10,12 +10,12 @@
 ########################################################################################################################################################
 
 import argparse
-import csv
 import os
-import re
 import shutil
-from statistics import mean
-from math import log10
+
+import numpy as np
+
+import pcp_scanner
 
 # =================================================================== #
 # =================================================================== #
@@ -116,6 +116,7 @@ required.add_argument('-o', '--out_dir', type=str, help="Path to the directory w
 
 optional = parser.add_argument_group('Optional arguments')
 optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument("-t","--threads", type=int, default=4, help="Number of threads used to read the result files of the jobs, by default 4.")
 
 # =================================================================== #
 # =================================================================== #
@@ -156,6 +157,10 @@ def main():
     results_dir = args.results_dir           # Path to the directory containing the results of the alpha-duration parameters search
     out_dir = args.out_dir                   # Path to the directory where the compiled results and the best parameters combo files will be stored
 
+    # Optional arguments
+
+    threads = args.threads                   # Number of threads used to read the result files of the jobs
+
     # ========================================================= #
     # Check arguments                                           #
     # ========================================================= #
@@ -168,6 +173,11 @@ def main():
     out_dir = check_abspath(out_dir,"Command line argument -o / --out_dir","directory")
     print ("{:<40} {:<100}".format('\nOutput directory:',out_dir))
 
+    # Check the number of threads
+
+    if threads < 1:
+      raise AD_Error ("ERROR: The number of threads (-t / --threads) must be at least 1.")
+
   # ========================================================= #
   # Exception handling for the preparation step               #
   # ========================================================= #
@@ -187,85 +197,11 @@ def main():
 
     print ("{:<40}".format('\nCompiling the results ...'), end="")
 
-    # Initialize the compiled results list of dictionaries
-
-    comp_results = []
-
-    # Look for directories in the results directory (see https://stackoverflow.com/questions/800197/how-to-get-all-of-the-immediate-subdirectories-in-python for reference).
-
-    dir_list_all = [dir.name for dir in os.scandir(results_dir) if dir.is_dir()]
-
-    # Only keep the 'xxx_alphaXXX_durXXX'-type directories
-
-    dir_list = []
-
-    for dirname in dir_list_all:
- 
-      # Define the 'xxx_alphaXXX_durXXX' regex and apply it to the dirname
-
-      pattern = re.compile(r"^\d+_alpha(?P<alpha>\d+(\.\d+)?)_dur(?P<duration>\d+(\.\d+)?)$")
-      matching_dir = pattern.match(dirname)
-
-      # If it matches the regex, collect the data
-
-      if matching_dir is not None:
-
-        dir_list.append(dirname)
-
-        alpha = float(matching_dir.group("alpha"))
-        duration = float(matching_dir.group("duration"))
-
-        # Prepare to store information specific to this calculation
-
-        data = {
-            "Directory" : dirname,
-            "Alpha" : alpha,
-            "Duration (ps)" : duration
-        }
-
-        # Iterate over all the PCP directories
+    # Gather the results of all the 'xxx_alphaXXX_durXXX'-type directories into a table, with one line per directory (see pcp_scanner.py for details)
 
-        pcp_dirs = [dir.name for dir in os.scandir(os.path.join(results_dir, dirname)) if dir.is_dir() and (dir.name).startswith("PCP_")]
-        orientations = [] # List of all possible orientations
+    comp_results = pcp_scanner.scan_results(results_dir, r"^\d+_alpha(?P<alpha>\d+(\.\d+)?)_dur(?P<duration>\d+(\.\d+)?)$", dir_fields={"Alpha": "alpha", "Duration (ps)": "duration"}, threads=threads)
 
-        for pcp_dir in pcp_dirs:
-
-          pcp_file_path = os.path.join(results_dir, dirname, pcp_dir, "obj.res")
-          orientation = pcp_dir.partition("PCP_")[2]
-
-          with open(pcp_file_path, 'r') as pcp_f:
-            file_content = pcp_f.read()
-
-          # Define the expression patterns for the lines of the iterations file
-          # For example "      0     1  1sec |Proba_moy  0.693654D-04 |Fidelity(U)  0.912611D-01 |Chp  0.531396D-04 -0.531399D-04 |Aire -0.202724D-03 |Fluence  0.119552D-03 |Recou(i)  0.693654D-04 |Tr_dist(i) -0.384547D-15 |Tr(rho)(i)  0.100000D+01 |Tr(rho^2)(i)  0.983481D+00 |Projector  0.100000D+01"
-          rx_pcp_line = re.compile(r"^\s+\d+\s+\d+\s+\d+(?:sec|min)\s\|Proba_moy\s+\d\.\d+D[+-]\d+\s\|Fidelity\(U\)\s+(?P<fidelity>\d\.\d+D[+-]\d+)\s\|Chp\s+\d\.\d+D[+-]\d+\s+-?\d\.\d+D[+-]\d+\s\|Aire\s+-?\d\.\d+D[+-]\d+\s\|Fluence\s+(?P<fluence>\d\.\d+D[+-]\d+)\s\|Recou\(i\)\s+(?P<overlap>\d\.\d+D[+-]\d+)\s\|Tr_dist\(i\)\s+-?\d\.\d+D[+-]\d+\s\|Tr\(rho\)\(i\)\s+\d\.\d+D[+-]\d+\s\|Tr\(rho\^2\)\(i\)\s+\d\.\d+D[+-]\d+\s\|Projector\s+(?P<projector>\d\.\d+D[+-]\d+)")
-
-          # Get the values
-
-          line_data = rx_pcp_line.match(file_content)
-          if line_data is not None:
-            for key in ['projector','overlap','fidelity','fluence']:
-
-              raw_value = line_data.group(key)
-              value = float(re.compile(r'(\d*\.\d*)[dD]([-+]?\d+)').sub(r'\1E\2', raw_value)) # Replace the possible d/D from Fortran double precision float format with an "E", understandable by Python)
-              if key != 'fluence':
-                value = min (value, 1)
-              
-              data_key = orientation + "_" + key.capitalize() if key != 'fluence' else key.capitalize()
-              data.update({
-                data_key : value
-              })
-            
-            orientations.append(orientation) # Will be reused later
-
-          else:
-            raise AD_Error ("ERROR: Unable to get the values from the file %s" % pcp_file_path) 
-
-        # Store information specific to this calculation
-
-        comp_results.append(data)
-
-    if dir_list == []:
+    if comp_results.size == 0:
       raise AD_Error ("ERROR: Can't find any 'xxx_alphaXXX_durXXX' directory in %s" % results_dir)
 
     print("[ DONE ]")
@@ -274,7 +210,7 @@ def main():
   # Exception handling for the results compilation            #
   # ========================================================= #
 
-  except AD_Error as error:
+  except (AD_Error, pcp_scanner.ScanError) as error:
     print("")
     print(error)
     exit(-1)
@@ -287,58 +223,39 @@ def main():
 
   print ("{:<40}".format('\nIdentifying best parameters combo ...'), end="")
 
-  # Identify the best orientation
+  # Identify the best orientation (the one with the highest mean projector)
 
-  highest_mean = -float('inf')
-  for orientation in orientations:
-    proj_mean = mean([data[orientation + "_Projector"] for data in comp_results])
-    if proj_mean > highest_mean:
-      highest_mean = proj_mean
-      best_ori = orientation
+  best_ori = max(pcp_scanner.get_orientations(comp_results), key=lambda orientation: np.mean(comp_results[orientation + "_Projector"]))
 
   # Get min/max for each value
 
-  alpha_min = min([data['Alpha'] for data in comp_results])
-  alpha_max = max([data['Alpha'] for data in comp_results])
-
-  dur_min = min([data['Duration (ps)'] for data in comp_results])
-  dur_max = max([data['Duration (ps)'] for data in comp_results])
-
-  proj_min = min([data[best_ori + "_Projector"] for data in comp_results])
-  proj_max = max([data[best_ori + "_Projector"] for data in comp_results])
+  projectors = comp_results[best_ori + "_Projector"]
+  fluences = comp_results["Fluence"]
 
-  flu_min = min([data["Fluence"] for data in comp_results])
-  flu_max = max([data["Fluence"] for data in comp_results])
+  proj_min, proj_max = projectors.min(), projectors.max()
+  flu_min, flu_max = fluences.min(), fluences.max()
 
-  # Compare the results by computing an efficiency score
+  # Compare the results by computing an efficiency score (a null range gives NaN scores or infinite ratios, which are handled like in scalar arithmetic)
 
-  max_eff = -float('inf')
+  with np.errstate(divide='ignore', invalid='ignore'):
 
-  for result in comp_results:
-
-    proj_norm = (result[best_ori + "_Projector"] - proj_min) / (proj_max - proj_min)
-    flu_norm = (result["Fluence"] - flu_min) / (flu_max - flu_min)
+    proj_norm = (projectors - proj_min) / (proj_max - proj_min)
+    flu_norm = (fluences - flu_min) / (flu_max - flu_min)
 
     if (proj_max - proj_min) / proj_min < 0.1:
-      eff_score = - flu_norm
+      efficiency = - flu_norm
     elif (flu_max - flu_min) / flu_min < 0.1:
-      eff_score = proj_norm
+      efficiency = proj_norm
     else:
-      eff_score = proj_norm - flu_norm
+      efficiency = proj_norm - flu_norm
 
-    result['Efficiency'] = eff_score
+  # Specify who is the best pulse
 
-    if eff_score > max_eff:
-      best_result = result
-      max_eff = eff_score
+  best_index = int(np.nanargmax(efficiency))
+  best_result = comp_results[best_index]
 
-  # Add a key specifying who is the best pulse
-
-  for result in comp_results:
-    if result == best_result:
-      result['Best'] = True
-    else:
-      result['Best'] = False
+  best = np.zeros(comp_results.size, dtype=bool)
+  best[best_index] = True
 
   print("[ DONE ]")
 
@@ -361,16 +278,7 @@ def main():
 
   print ("{:<40}".format('\nCreating CSV file ...'), end="")
 
-  csv_header = [key for key in comp_results[0].keys() if key != 'Directory']
-
-  with open(os.path.join(out_dir,'aldu_comp_results.csv'), 'w', newline='', encoding='utf-8') as csvfile:
-
-    csv_writer = csv.DictWriter(csvfile, fieldnames=csv_header, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-    csv_writer.writeheader()
-
-    for data in comp_results:
-      del data['Directory']
-      csv_writer.writerow(data)  
+  pcp_scanner.write_csv(comp_results, os.path.join(out_dir,'aldu_comp_results.csv'), extra_columns={"Efficiency": efficiency, "Best": best})
 
   print("[ DONE ]")
 
@@ -11,25 +11,34 @@
 ########################################################################################################################################################
 
 import argparse
+import concurrent.futures
 import fnmatch
+import glob
 import os
 import re
 import shutil
 import sys
+import traceback
 from collections import OrderedDict
 from inspect import getsourcefile
 
 import jinja2  # Only needed in the renderer subscript, it is loaded here to check if your python installation does support jinja2
 import numpy as np
-import yaml
 from scipy import constants
 
 # Subscripts (files that end with .py and must be placed in the same directory as this script)
 
 import control_common
 import control_renderer
+import job_logging
+import job_submission
+import matrix_io
 import modelling_fcts
+import object_store
+import run_resources
+import system_cache
 import transition_fcts
+import yaml_loader
 
 # =================================================================== #
 # =================================================================== #
@@ -42,7 +51,9 @@ import transition_fcts
 parser = argparse.ArgumentParser(add_help=False, description="This script prepares the input files needed to run the QOCT-GRAD program by extracting information from a given source file and launches the corresponding jobs on the cluster.")
 
 required = parser.add_argument_group('Required arguments')
-required.add_argument("-s","--source", type=str, help="Path to the source file containing all the necessary information that needs to be processed.", required=True)
+source_group = required.add_mutually_exclusive_group(required=True)
+source_group.add_argument("-s","--source", type=str, help="Path to the source file containing all the necessary information that needs to be processed.")
+source_group.add_argument("-ss","--sources", type=str, help="Batch mode: path to either a directory containing multiple source files or a glob pattern matching them (e.g. 'path/*.out', between quotes), as an alternative to -s / --source. All the source files are then processed in a single execution.")
 required.add_argument('-cf', '--config', type=str, help="Path to either a YAML configuration file or a directory containing multiple YAML configuration files, extension must be .yml or .yaml.", required=True)
 required.add_argument('-cl', '--cluster_name', type=str, help="Name of the cluster where this script is running, as defined in the YAML clusters configuration file.", required=True)
 required.add_argument("-p","--profile", type=str, help="Name of the profile you wish to run jobs with, as defined in the YAML clusters configuration file.", required=True)
@@ -54,6 +65,162 @@ optional.add_argument("-ow","--overwrite",action="store_true",help="If a data di
 optional.add_argument("-d","--dry_run",action="store_true",help="Do not launch the jobs, just create the files and directories.")
 optional.add_argument("-as","--arch_src",action="store_true",help="Archive the source file after it has been processed.")
 optional.add_argument("-ac","--arch_cf",action="store_true",help="Archive the configuration files after they have been processed.")
+optional.add_argument("-j","--jobs", type=int, default=1, help="Number of processes used to model the systems and determine the transitions of the source files in parallel (only useful in batch mode, see -ss / --sources). The rendering of the templates and the submission of the jobs are still done one by one, in order.")
+optional.add_argument("-pt","--precomp_tpl",action="store_true",help="Use precompiled versions of the Jinja templates, stored in a 'compiled_templates' directory next to this script. The templates are compiled again whenever one of them has been modified.")
+optional.add_argument("-lt","--light_logs",action="store_true",help="Do not write the detailed tables (lists of values, matrices, etc.) in the log files. Those tables are then not even built, which saves time for large systems.")
+optional.add_argument("-mf","--matrix_format", type=str, choices=matrix_io.FORMATS, default="text", help="Format of the matrix files (density matrices, transition dipole moments and conversion matrix): 'text' (by default), 'compact' (text, where identity and diagonal matrices are written in a compact form), 'npy' (NumPy binary format) or 'fortran' (Fortran unformatted file). Only the 'text' format can be read by the standard versions of QOCT-GRAD, see matrix_io.py for details.")
+optional.add_argument("-ns","--no_store",action="store_true",help="Write all the files of the job directories and copy the source file as regular files. By default, each distinct file content is only stored once per profile directory (in its '%s' directory) and hard-linked into the job directories, while the source file is cloned (reflink) or hard-linked into the data directory, see object_store.py for details." % object_store.STORE_DIRNAME)
+optional.add_argument("-lj","--log_json", type=str, help="Path to a file where the main events of the execution (source files treated or skipped, jobs created and submitted, etc.) will be appended in the JSON Lines format, to be read by other programs.")
+optional.add_argument("-jr","--job_registry", type=str, help="Path to the SQLite database file of the job registry (see job_submission.py), created if it does not exist yet. If given, each submitted job will be recorded in it along with its job ID, its source file, its profile, its transition, its configuration and its job scale.")
+
+# =================================================================== #
+# =================================================================== #
+#                   SYSTEM MODELLING AND TRANSITIONS                  #
+# =================================================================== #
+# =================================================================== #
+
+def model_source(source:str, modelling_fct:str, transition_fct:str, system_cache_dir:str=None, system_cache_size:float=None):
+    """Models the system described in a source file and determines the transitions of the control procedure for that system. Everything that is printed along the way is captured instead of being shown, so that this function can also be executed in a separate process (see the -j / --jobs command line argument). The captured text is then written into the log file of the source file by the main process.
+
+    Parameters
+    ----------
+    source : str
+        Path towards the source file.
+    modelling_fct : str
+        Name of the modelling function (defined in modelling_fcts.py).
+    transition_fct : str
+        Name of the transition function (defined in transition_fcts.py).
+    system_cache_dir : str, optional
+        Path towards the system cache directory, if the system cache is used.
+    system_cache_size : float, optional
+        Maximum size of the system cache, in MB.
+
+    Returns
+    -------
+    system : dict
+        The system dictionary returned by the modelling function.
+    transitions_list : list
+        The transitions list returned by the transition function.
+    log : str
+        Everything that has been printed while modelling the system and determining the transitions.
+
+    Raises
+    ------
+    ControlError
+        If the system dictionary or the transitions list is not valid. For this exception (as for any unexpected one), what has been printed before the error is attached to the exception as its "log" attribute.
+    """
+
+    source_filename = os.path.basename(source)
+
+    try:
+
+      with job_logging.capture() as log:
+
+        # =================================================================== #
+        # =================================================================== #
+        #                           SYSTEM MODELLING                          #
+        # =================================================================== #
+        # =================================================================== #
+
+        section_title = "1. System modelling"
+
+        print("")
+        print(''.center(len(section_title)+10, '*'))
+        print(section_title.center(len(section_title)+10))
+        print(''.center(len(section_title)+10, '*'))
+
+        # ========================================================= #
+        # Load the source file                                      #
+        # ========================================================= #
+
+        print ("{:<50}".format('\nLoading %s file ... ' % source_filename), end="")
+        with open(source, 'r') as source_file:
+          source_content = source_file.read().splitlines()
+        print("[ DONE ]")
+
+        # Cleaning up the source file from surrounding spaces and blank lines
+
+        source_content = list(map(str.strip, source_content))   # Remove leading & trailing blank/spaces
+        source_content = list(filter(None, source_content))     # Remove blank lines/no char
+
+        # ========================================================= #
+        # Modelling function                                        #
+        # ========================================================= #
+
+        print ("{:<50} {:<100}".format('\nModelling function:',modelling_fct))
+
+        # Call the modelling function (defined in modelling_fcts.py, see the documentation for more information), or load its result from the cache if this source file has already been modelled
+
+        if system_cache_dir:
+          system = system_cache.cached_modelling(getattr(modelling_fcts, modelling_fct), source_content, system_cache_dir, system_cache_size)
+        else:
+          system = eval("modelling_fcts." + modelling_fct)(source_content)
+
+        # Check the system dictionary
+
+        if not isinstance(system, dict):
+          raise control_common.ControlError ('ERROR: The "system" variable returned by the %s modelling function is not a dictionary.' % modelling_fct)
+
+        required_keys = ["states_list", "momdip_mtx"]
+        control_common.check_keys(required_keys,system,"The 'system' dictionary returned by the %s modelling function." % modelling_fct)
+
+        # Check the states list
+
+        if not isinstance(system["states_list"], list):
+          raise control_common.ControlError ('ERROR: The "states_list" value in the system dictionary returned by the %s modelling function is not a list.' % modelling_fct)
+
+        required_keys = ["number", "label", "energy"]
+        control_common.check_keys(required_keys,system["states_list"],"The 'states_list' list of the 'system' dictionary returned by the %s modelling function." % modelling_fct)
+
+        control_common.is_consecutive([state['number'] for state in system['states_list']],"State numbers from the modelling function")
+
+        # Check the dipole moments matrices
+
+        if not isinstance(system["momdip_mtx"], dict):
+          raise control_common.ControlError ('ERROR: The "momdip_mtx" value in the system dictionary returned by the %s modelling function is not a dictionary.' % modelling_fct)
+
+        for momdip_key in system["momdip_mtx"]:
+          if not isinstance(system["momdip_mtx"][momdip_key], (list, np.ndarray)):
+            raise control_common.ControlError ('ERROR: The "%s" value in the "momdip_mtx" dictionary returned by the %s modelling function is neither a list nor a NumPy array.' % (momdip_key, modelling_fct))
+
+        print("\nThe system has been succesfully modelled.")
+
+        # =================================================================== #
+        # =================================================================== #
+        #                             TRANSITIONS                             #
+        # =================================================================== #
+        # =================================================================== #
+
+        section_title = "2. Determining the transitions"
+
+        print("")
+        print(''.center(len(section_title)+10, '*'))
+        print(section_title.center(len(section_title)+10))
+        print(''.center(len(section_title)+10, '*'))
+
+        # ========================================================= #
+        # Transition function                                       #
+        # ========================================================= #
+
+        print ("{:<50} {:<100}".format('\nTransition function:',transition_fct))
+
+        # Call the transition function (defined in transition_fcts.py, see the documentation for more information)
+
+        transitions_list = eval("transition_fcts." + transition_fct)(system)
+
+        # Check the transitions list
+
+        if not isinstance(transitions_list, list):
+          raise control_common.ControlError ('ERROR: The transitions_list returned by the %s transition function is not a list.' % transition_fct)
+
+        required_keys = ["label","init_file","init_content","target_file","target_content","momdip_key"]
+        control_common.check_keys(required_keys,transitions_list,"Transitions list returned by the %s transition function" % transition_fct)
+
+    except Exception as error:
+      error.log = log.getvalue()
+      raise
+
+    return system, transitions_list, log.getvalue()
 
 # =================================================================== #
 # =================================================================== #
@@ -77,9 +244,9 @@ def main():
 
     special_numbers = {1:"st", 2:"nd", 3:"rd"}
 
-    # Save a reference to the original standard output as it will be modified later on (see https://stackabuse.com/writing-to-a-file-with-pythons-print-function/ for reference)
+    # Replace the standard output by a dispatcher, sending the output of the print calls either to the console or to the log of the job being currently treated (see job_logging.py for details)
 
-    original_stdout = sys.stdout
+    job_logging.install()
 
     # Get the size of the terminal in order to have a prettier output, if you need something more robust, go check http://granitosaurus.rocks/getting-terminal-size.html
 
@@ -102,6 +269,7 @@ def main():
     # Required arguments
 
     source = args.source                     # Source file containing all the necessary information
+    sources = args.sources                   # Directory or glob pattern for the source files (batch mode)
     config_inp = args.config                 # YAML configuration file or directory containing the YAML configuration files
 
     cluster_name = args.cluster_name         # Name of the cluster where this script is running, as defined in the clusters configuration YAML file
@@ -116,6 +284,41 @@ def main():
     arch_src = args.arch_src                 # Flag for archiving the source file after it has been processed
     arch_cf = args.arch_cf                   # Flag for archiving the configuration files after they have been processed
 
+    precomp_tpl = args.precomp_tpl           # Flag for using precompiled Jinja templates
+
+    jobs = args.jobs                         # Number of processes used for modelling the systems
+
+    matrix_format = args.matrix_format       # Format of the matrix files
+    no_store = args.no_store                 # Flag for not using the object store of the profile directories
+
+    light_logs = args.light_logs             # Flag for not writing the detailed tables in the log files
+    log_json = args.log_json                 # File where the events of the execution will be written in the JSON Lines format
+    job_registry = args.job_registry         # Job registry where the submitted jobs will be recorded
+
+    # ========================================================= #
+    # Logging options                                           #
+    # ========================================================= #
+
+    job_logging.show_tables(not light_logs)
+
+    if log_json:
+      job_logging.open_events(log_json)
+      job_logging.event("start", script="control_launcher", cluster=cluster_name, profile=profile, dry_run=dry_run)
+
+    # ========================================================= #
+    # Job registry                                              #
+    # ========================================================= #
+
+    # Each submitted job will be recorded in the job registry along with the job ID given by the job scheduler (see job_submission.py for details)
+
+    registry = None
+
+    if job_registry and not dry_run:
+      control_common.check_abspath(os.path.dirname(os.path.abspath(job_registry)),"Directory of the job registry (command line argument -jr / --job_registry)","directory")
+      job_registry = os.path.abspath(job_registry)
+      registry = job_submission.connect(job_registry)
+      print ("{:<40} {:<100}".format('\nJob registry:',job_registry))
+
     # ========================================================= #
     # Define codes directory                                    #
     # ========================================================= #
@@ -126,6 +329,17 @@ def main():
 
     print ("{:<40} {:<100}".format('\nCodes directory:',code_dir))
 
+    # ========================================================= #
+    # Precompile the Jinja templates                            #
+    # ========================================================= #
+
+    # The templates of the "templates" directory are compiled into Python modules stored in the "compiled_templates" directory (only if they have not been compiled yet or have been modified since then)
+
+    if precomp_tpl:
+      compiled_dir = os.path.join(code_dir,"compiled_templates")
+      control_renderer.precompile_templates(os.path.join(code_dir,"templates"), compiled_dir)
+      print ("{:<40} {:<100}".format('\nCompiled templates directory:',compiled_dir))
+
     # ========================================================= #
     # Check and load the YAML clusters configuration file       #
     # ========================================================= #
@@ -134,8 +348,7 @@ def main():
 
     clusters_file = control_common.check_abspath(os.path.join(code_dir,"clusters.yml"),"YAML clusters configuration file","file")
     print ("{:<80}".format('\nLoading the clusters configuration file "clusters.yml" ...'), end="")
-    with open(clusters_file, 'r', encoding='utf-8') as f_clusters:
-      clusters_cfg = yaml.load(f_clusters, Loader=yaml.FullLoader)
+    clusters_cfg = yaml_loader.load(clusters_file)
     print('%12s' % "[ DONE ]")
 
     # Check the name of the cluster
@@ -195,6 +408,31 @@ def main():
 
     print ("{:<40} {:<100}".format('\nRendering function for that profile:',render_fct))
 
+    # ========================================================= #
+    # Shared resources                                          #
+    # ========================================================= #
+
+    # Resources needed by the rendering functions (CHAINS configuration file, ionization potentials, pulse shapers, geometry of the molecule), loaded only once and then shared by all the transition-configuration combinations
+
+    resources = run_resources.RunResources(os.path.dirname(code_dir))
+
+    # ========================================================= #
+    # Check the system cache                                    #
+    # ========================================================= #
+
+    # The cache directory is defined in the CHAINS configuration file, if that file or the system_cache_dir key do not exist, the cache is not used
+
+    system_cache_dir = None
+    system_cache_size = None
+    chains_config_file = os.path.join(os.path.dirname(code_dir),"configs","chains_config.yml")
+
+    if os.path.isfile(chains_config_file):
+      chains_config = resources.chains_config
+      system_cache_dir = chains_config.get("system_cache_dir")
+      system_cache_size = chains_config.get("system_cache_size", 2000)
+
+    print ("{:<40} {:<100}".format('\nSystem cache directory:',(system_cache_dir or "not specified")))
+
     # ========================================================= #
     # Establishing the different job scales                     #
     # ========================================================= #
@@ -242,17 +480,38 @@ def main():
     out_dir = control_common.check_abspath(out_dir,"Command line argument -o / --out_dir","directory")
     print ("{:<40} {:<100}".format('\nJobs main directory:',out_dir))
 
-    # Check source file
-    # =================
+    # Check source file(s)
+    # ====================
 
-    # Check the existence of the source file, then get its name and the name of the directory where it is located
+    batch_mode = sources is not None
 
-    source = control_common.check_abspath(source,"Command line argument -s / --source","file")
-    print ("{:<40} {:<100}".format('\nSource file:',source))
+    # In batch mode, look for every file in the given directory or matching the given glob pattern (hidden files and directories are ignored)
 
-    source_path = os.path.dirname(source)
-    source_filename = os.path.basename(source)
-    source_name = str(source_filename.split('.')[0]) # Getting rid of the format extension to get the name of the source
+    if batch_mode:
+
+      if os.path.isdir(sources):
+        print("{:<40} {:<100}".format("\nLooking for source files in", sources + " ..."), end="")
+        sources_list = [os.path.join(sources,filename) for filename in os.listdir(sources) if not filename.startswith('.')]
+      else:
+        print("{:<40} {:<100}".format("\nLooking for source files matching", sources + " ..."), end="")
+        sources_list = glob.glob(sources)
+
+      sources_list = sorted(control_common.check_abspath(path,"Command line argument -ss / --sources") for path in sources_list if os.path.isfile(path))
+
+      if sources_list == []:
+        raise control_common.ControlError ("ERROR: Can't find any source file in %s" % sources)
+
+      print('%12s' % "[ DONE ]")
+      print ("{:<40} {:<100}".format('\nNumber of source files:',len(sources_list)))
+
+    # Otherwise, just check the existence of the source file
+
+    else:
+
+      source = control_common.check_abspath(source,"Command line argument -s / --source","file")
+      print ("{:<40} {:<100}".format('\nSource file:',source))
+
+      sources_list = [source]
 
     # Check config file(s)
     # ====================
@@ -294,6 +553,12 @@ def main():
       config_inp_file = os.path.basename(config_inp)
       config_inp_list = [config_inp_file]
 
+    # Check the number of processes
+    # =============================
+
+    if jobs < 1:
+      raise control_common.ControlError ("ERROR: The number of processes given by the -j / --jobs command line argument must be at least 1.")
+
     # Check dry run option
     # ====================
 
@@ -301,662 +566,704 @@ def main():
       print("\nThe dry run option has been enabled: the job files and directories will be created but the jobs will not be submitted to the job scheduler.")
     else:
       job_count = 0   # Launched jobs counter, this number will be shown on the console screen at the end of the execution
+      deferred_count = 0   # Deferred jobs counter (jobs added to the backlog of the submission governor)
 
-  # ========================================================= #
-  # Exception handling for the preparation step               #
-  # ========================================================= #
+    # Submission governor
+    # ===================
 
-  except control_common.ControlError as error:
-    print("")
-    print(error)
-    exit(-1)
+    # If submission limits have been defined for this cluster, the jobs that would exceed them are added to a backlog file in the output directory instead of being submitted, and will be submitted by a later execution (see job_submission.py for details)
 
-  # =================================================================== #
-  # =================================================================== #
-  #                        SOURCE FILE TREATMENT                        #
-  # =================================================================== #
-  # =================================================================== #
+    governor = None
 
-  # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
-  try:
+    if not dry_run and clusters_cfg[cluster_name].get("submit_limits"):
 
-    console_message = "Start of the source file treatment"
-    print("")
-    print(''.center(len(console_message)+11, '*'))
-    print(console_message.center(len(console_message)+10))
-    print(''.center(len(console_message)+11, '*'))
+      governor = job_submission.Governor(os.path.join(out_dir,job_submission.BACKLOG_FILENAME), clusters_cfg[cluster_name]["submit_limits"])
+      print ("{:<40} {:<100}".format('\nSubmission backlog:',governor.backlog_path))
+      print ("{:<40} {:<100}".format('\nJobs in the queue:',governor.snapshot()[""]))
 
-    # Create an output log file that will contain all the information about the source file treatment (system modelling and determining transitions)
+      # Submit the jobs left in the backlog by the previous executions first, as long as the limits allow it
 
-    data_log_name = source_name + ".log"
-    data_log = open(os.path.join(out_dir,data_log_name), 'w', encoding='utf-8')
+      submitted, error = governor.drain(submit_command)
 
-    # Redirect standard output to the data_log file (see https://stackabuse.com/writing-to-a-file-with-pythons-print-function/ for reference)
+      for entry in submitted:
+        job_logging.event("job_submitted", job_dir=entry["job_dir"], job_id=entry["job_id"], from_backlog=True)
 
-    sys.stdout = data_log
-    
-    print ("{:<49} {:<100}".format('Cluster name:',cluster_name))      
-    print ("{:<50} {:<100}".format('\nProfile:',profile))
+      job_count += len(submitted)
+      print ("{:<40} {:<100}".format('\nJobs submitted from the backlog:',len(submitted)))
+      print ("{:<40} {:<100}".format('\nJobs left in the backlog:',len(governor.backlog())))
 
-    # =================================================================== #
-    # =================================================================== #
-    #                           SYSTEM MODELLING                          #
-    # =================================================================== #
-    # =================================================================== #
+      if error:
+        print("\nWARNING: The submission of the jobs of the backlog has been interrupted, the remaining ones will be submitted by a later execution.")
+        print(error)
+        print(error.output.strip())
 
-    section_title = "1. System modelling"
+  # ========================================================= #
+  # Exception handling for the preparation step               #
+  # ========================================================= #
 
+  except (control_common.ControlError, job_submission.SubmissionError) as error:
     print("")
-    print(''.center(len(section_title)+10, '*'))
-    print(section_title.center(len(section_title)+10))
-    print(''.center(len(section_title)+10, '*'))
+    print(error)
+    exit(-1)
 
-    # Console screen notification (we need to temporarily switch the standard outputs to show this message on screen and not in the log file)
+  problem_cf = []     # Empty list that will contain the names of the configuration files for which a problem has occurred (those configuration files will not be archived even if arch_cf was set)
+  problem_src = []    # Empty list that will contain the names of the source files that could not be processed (batch mode only)
 
-    sys.stdout = original_stdout                                 
-    print ("{:<80}".format('\nModelling the system ...'), end="")
-    sys.stdout = data_log  
 
-    # ========================================================= #
-    # Load the source file                                      #
-    # ========================================================= #
+  # If multiple processes have been requested, model the systems and determine the transitions of the source files in parallel (the results are then collected in order, see the model_source function)
 
-    print ("{:<50}".format('\nLoading %s file ... ' % source_filename), end="")
-    with open(source, 'r') as source_file:
-      source_content = source_file.read().splitlines()
-    print("[ DONE ]")
+  executor = None
 
-    # Cleaning up the source file from surrounding spaces and blank lines
-
-    source_content = list(map(str.strip, source_content))   # Remove leading & trailing blank/spaces
-    source_content = list(filter(None, source_content))     # Remove blank lines/no char
-
-    # ========================================================= #
-    # Modelling function                                        #
-    # ========================================================= #
+  if jobs > 1 and len(sources_list) > 1:
+    sys.stdout.flush()      # Otherwise the worker processes might print again what has not been written yet
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    futures = {}
+    next_source = 0         # Index of the next source file to give to the worker processes
 
-    print ("{:<50} {:<100}".format('\nModelling function:',modelling_fct))
+  for source in sources_list:
 
-    # Call the modelling function (defined in modelling_fcts.py, see the documentation for more information)
+    # Only keep about twice as many source files as there are worker processes in progress, the next ones being given to the workers as the results are collected. Since rendering and submitting the jobs is slower than modelling the systems, the results waiting to be collected would otherwise pile up in memory.
 
-    system = eval("modelling_fcts." + modelling_fct)(source_content)
+    if executor:
+      while next_source < len(sources_list) and len(futures) < 2 * jobs:
+        futures[sources_list[next_source]] = executor.submit(model_source, sources_list[next_source], modelling_fct, transition_fct, system_cache_dir, system_cache_size)
+        next_source += 1
 
-    # Check the system dictionary
+    # Get the name of the source file and the name of the directory where it is located
 
-    if not isinstance(system, dict):
-      raise control_common.ControlError ('ERROR: The "system" variable returned by the %s modelling function is not a dictionary.' % modelling_fct) 
+    source_path = os.path.dirname(source)
+    source_filename = os.path.basename(source)
+    source_name = str(source_filename.split('.')[0]) # Getting rid of the format extension to get the name of the source
 
-    required_keys = ["states_list", "momdip_mtx"]
-    control_common.check_keys(required_keys,system,"The 'system' dictionary returned by the %s modelling function." % modelling_fct)
+    arch_src = args.arch_src                 # Redefine arch_src to its original value (this flag will be defined to False if there is a problem with one of the configuration files, as to not archive the source file)
 
-    # Check the states list
+    # =================================================================== #
+    # =================================================================== #
+    #                        SOURCE FILE TREATMENT                        #
+    # =================================================================== #
+    # =================================================================== #
 
-    if not isinstance(system["states_list"], list):
-      raise control_common.ControlError ('ERROR: The "states_list" value in the system dictionary returned by the %s modelling function is not a list.' % modelling_fct)
+    # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
+    try:
 
-    required_keys = ["number", "label", "energy"]
-    control_common.check_keys(required_keys,system["states_list"],"The 'states_list' list of the 'system' dictionary returned by the %s modelling function." % modelling_fct)
+      console_message = "Start of the source file treatment"
+      print("")
+      print(''.center(len(console_message)+11, '*'))
+      print(console_message.center(len(console_message)+10))
+      print(''.center(len(console_message)+11, '*'))
 
-    control_common.is_consecutive([state['number'] for state in system['states_list']],"State numbers from the modelling function")
+      if batch_mode:
+        print ("{:<40} {:<100}".format('\nSource file:',source))
 
-    # Check the dipole moments matrices
+      job_logging.event("source_start", source=source)
 
-    if not isinstance(system["momdip_mtx"], dict):
-      raise control_common.ControlError ('ERROR: The "momdip_mtx" value in the system dictionary returned by the %s modelling function is not a dictionary.' % modelling_fct)
+      # Create an output log file that will contain all the information about the source file treatment (system modelling and determining transitions)
 
-    for momdip_key in system["momdip_mtx"]:
-      if not isinstance(system["momdip_mtx"][momdip_key], (list, np.ndarray)):
-        raise control_common.ControlError ('ERROR: The "%s" value in the "momdip_mtx" dictionary returned by the %s modelling function is neither a list nor a NumPy array.' % (momdip_key, modelling_fct))
+      data_log_name = source_name + ".log"
+      data_log = job_logging.JobLog(os.path.join(out_dir,data_log_name))
 
-    print("\nThe system has been succesfully modelled.")
+      # Send the output of the print calls to the data_log (it is kept in memory and only written on the disk once the source file has been treated)
 
-    # Console screen notification (we need to temporarily switch the standard outputs to show this message on screen and not in the log file)
+      job_logging.log_to(data_log)
     
-    sys.stdout = original_stdout                                 
-    print('%12s' % "[ DONE ]")
-    sys.stdout = data_log 
+      print ("{:<49} {:<100}".format('Cluster name:',cluster_name))      
+      print ("{:<50} {:<100}".format('\nProfile:',profile))
 
-    # =================================================================== #
-    # =================================================================== #
-    #                             TRANSITIONS                             #
-    # =================================================================== #
-    # =================================================================== #
-
-    section_title = "2. Determining the transitions"
-
-    print("")
-    print(''.center(len(section_title)+10, '*'))
-    print(section_title.center(len(section_title)+10))
-    print(''.center(len(section_title)+10, '*'))
+      # =================================================================== #
+      # =================================================================== #
+      #                  SYSTEM MODELLING AND TRANSITIONS                   #
+      # =================================================================== #
+      # =================================================================== #
 
-    # Console screen notification (we need to temporarily switch the standard outputs to show this message on screen and not in the log file)
+      # Console screen notification
 
-    sys.stdout = original_stdout                                 
-    print ("{:<80}".format('\nDetermining the transitions ...'), end="")
-    sys.stdout = data_log  
+      job_logging.console("{:<80}".format('\nModelling the system and determining the transitions ...'), end="")
 
-    # ========================================================= #
-    # Transition function                                       #
-    # ========================================================= #
+      # Get the system and the transitions from the worker processes if they have been started (see the -j / --jobs command line argument), otherwise compute them right away
 
-    print ("{:<50} {:<100}".format('\nTransition function:',transition_fct))
-
-    # Call the transition function (defined in transition_fcts.py, see the documentation for more information)
+      try:
+        if executor:
+          system, transitions_list, model_log = futures.pop(source).result()
+        else:
+          system, transitions_list, model_log = model_source(source, modelling_fct, transition_fct, system_cache_dir, system_cache_size)
+      except Exception as error:
+        data_log.write(getattr(error, 'log', ''))         # Keep what has been printed before the error
+        raise
 
-    transitions_list = eval("transition_fcts." + transition_fct)(system)
+      job_logging.console('%12s' % "[ DONE ]")
 
-    # Check the transitions list
+      print(model_log, end="")
 
-    if not isinstance(transitions_list, list):
-      raise control_common.ControlError ('ERROR: The transitions_list returned by the %s transition function is not a list.' % transition_fct) 
+      # The content of the source file is only read again from the disk if a rendering function needs it (see system_cache.py)
 
-    required_keys = ["label","init_file","init_content","target_file","target_content","momdip_key"]
-    control_common.check_keys(required_keys,transitions_list,"Transitions list returned by the %s transition function" % transition_fct)
- 
-    # Console screen notification (we need to temporarily switch the standard outputs to show this message on screen and not in the log file)
-    
-    sys.stdout = original_stdout                                 
-    print('%12s' % "[ DONE ]")
-    sys.stdout = data_log    
+      source_content = system_cache.SourceLines(source)
 
-    # =================================================================== #
-    # =================================================================== #
-    #                         DATA FILES CREATION                         #
-    # =================================================================== #
-    # =================================================================== #
+      # =================================================================== #
+      # =================================================================== #
+      #                         DATA FILES CREATION                         #
+      # =================================================================== #
+      # =================================================================== #
 
-    section_title = "2bis. Creating the data files"
+      section_title = "2bis. Creating the data files"
 
-    print("")
-    print(''.center(len(section_title)+10, '*'))
-    print(section_title.center(len(section_title)+10))
-    print(''.center(len(section_title)+10, '*'))
+      print("")
+      print(''.center(len(section_title)+10, '*'))
+      print(section_title.center(len(section_title)+10))
+      print(''.center(len(section_title)+10, '*'))
 
-    # Console screen notification (we need to temporarily switch the standard outputs to show this message on screen and not in the log file)
+      # Console screen notification
 
-    sys.stdout = original_stdout                                 
-    print ("{:<80}".format('\nCreating the data files ...'), end="")
-    sys.stdout = data_log    
+      job_logging.console("{:<80}".format('\nCreating the data files ...'), end="")
 
-    # ========================================================= #
-    # Creating the molecule directory                           #
-    # ========================================================= #
+      # ========================================================= #
+      # Creating the molecule directory                           #
+      # ========================================================= #
 
-    mol_dir = os.path.join(out_dir,source_name)
+      mol_dir = os.path.join(out_dir,source_name)
 
-    os.makedirs(mol_dir,exist_ok=True)
+      os.makedirs(mol_dir,exist_ok=True)
 
-    print ("{:<20} {:<100}".format('\nMolecule directory:',mol_dir))
+      print ("{:<20} {:<100}".format('\nMolecule directory:',mol_dir))
 
-    # ========================================================= #
-    # Creating the profile subdirectory                         #
-    # ========================================================= #
+      # ========================================================= #
+      # Creating the profile subdirectory                         #
+      # ========================================================= #
 
-    pro_dir = os.path.join(mol_dir,profile)
+      pro_dir = os.path.join(mol_dir,profile)
 
-    os.makedirs(pro_dir,exist_ok=True)
+      os.makedirs(pro_dir,exist_ok=True)
 
-    print ("{:<20} {:<100}".format('\nProfile subdirectory:',pro_dir))
+      print ("{:<20} {:<100}".format('\nProfile subdirectory:',pro_dir))
 
-    # ========================================================= #
-    # Creating the data subdirectory                            #
-    # ========================================================= #
+      # ========================================================= #
+      # Creating the data subdirectory                            #
+      # ========================================================= #
 
-    data_dir = os.path.join(pro_dir,"data")
+      data_dir = os.path.join(pro_dir,"data")
 
-    if os.path.exists(data_dir) and not overwrite:
-      raise control_common.ControlError ("ERROR: A data directory for the %s source file already exists in %s !" % (source_name, pro_dir))
+      if os.path.exists(data_dir) and not overwrite:
+        raise control_common.ControlError ("ERROR: A data directory for the %s source file already exists in %s !" % (source_name, pro_dir))
     
-    os.makedirs(data_dir,exist_ok=True)
+      os.makedirs(data_dir,exist_ok=True)
 
-    print ("{:<20} {:<100}".format('\nData directory:',data_dir))
+      print ("{:<20} {:<100}".format('\nData directory:',data_dir))
 
-    # ========================================================= #
-    # Creating the system data files                            #
-    # ========================================================= #
+      # ========================================================= #
+      # Creating the system data files                            #
+      # ========================================================= #
 
-    # Energies
+      # Energies
 
-    energies_file = "energies"
-    with open(os.path.join(data_dir,energies_file), "w") as f:
-      for state in system['states_list']:
-        print("{:1.10e}".format(state['energy']), file = f)
-    print("    ├── The energies file ('%s') has been created into the directory" % energies_file)
+      energies_file = "energies"
+      with open(os.path.join(data_dir,energies_file), "w") as f:
+        for state in system['states_list']:
+          print("{:1.10e}".format(state['energy']), file = f)
+      print("    ├── The energies file ('%s') has been created into the directory" % energies_file)
 
-    # Dipole moments matrices
+      # Dipole moments matrices
 
-    for momdip_key in system['momdip_mtx']:
+      for momdip_key in system['momdip_mtx']:
 
-      momdip_mtx_file = 'momdip_mtx_' + momdip_key
-      np.savetxt(os.path.join(data_dir,momdip_mtx_file),system['momdip_mtx'][momdip_key],fmt='% 18.10e')
-      print("    ├── The transition dipole moment matrix file corresponding to the '%s' key ('%s') has been created into the directory" % (momdip_key, momdip_mtx_file))
+        momdip_mtx_file = 'momdip_mtx_' + momdip_key
+        matrix_io.write(os.path.join(data_dir,momdip_mtx_file),system['momdip_mtx'][momdip_key],matrix_format)
+        print("    ├── The transition dipole moment matrix file corresponding to the '%s' key ('%s') has been created into the directory" % (momdip_key, momdip_mtx_file))
 
-    # Conversion matrix from zero order states to eigenstates (if it has been provided in the modelling function, otherwise it will just be a unitary matrix)
+      # Conversion matrix from zero order states to eigenstates (if it has been provided in the modelling function, otherwise it will just be a unitary matrix)
 
-    if 'conv_mtx' in system.keys():
+      if 'conv_mtx' in system.keys():
 
-      conv_mtx_file = 'conv_mtx'
-      np.savetxt(os.path.join(data_dir,conv_mtx_file),system['conv_mtx'],fmt='% 18.10e')
-      print("    ├── The conversion matrix file ('%s') has been created into the directory" % conv_mtx_file)
+        conv_mtx_file = 'conv_mtx'
+        matrix_io.write(os.path.join(data_dir,conv_mtx_file),system['conv_mtx'],matrix_format)
+        print("    ├── The conversion matrix file ('%s') has been created into the directory" % conv_mtx_file)
 
-    else:
+      else:
 
-      conv_mtx_file = 'conv_mtx'
-      conv_mtx = np.zeros((len(system['states_list']), len(system['states_list'])), dtype=float)
-      np.fill_diagonal(conv_mtx, 1.0)
-      np.savetxt(os.path.join(data_dir,conv_mtx_file),conv_mtx,fmt='% 18.10e')
-      print("    ├── A matrix of ones ('%s') has been created into the directory, acting as a conversion matrix" % conv_mtx_file)
+        conv_mtx_file = 'conv_mtx'
+        matrix_io.write_identity(os.path.join(data_dir,conv_mtx_file),len(system['states_list']),matrix_format)
+        print("    ├── A matrix of ones ('%s') has been created into the directory, acting as a conversion matrix" % conv_mtx_file)
 
-    # ========================================================= #
-    # Creating the transition files                             #
-    # ========================================================= #
+      # ========================================================= #
+      # Creating the transition files                             #
+      # ========================================================= #
 
-    for transition in transitions_list:
+      for transition in transitions_list:
 
-      init_filename = transition["init_file"] + "1"
-      if not os.path.exists(os.path.join(data_dir, init_filename)):
-        with open(os.path.join(data_dir, init_filename), "w") as f:
-          for line in transition["init_content"]:
-            for val in line:
-              print('( {0.real:.10e} , {0.imag:.10e} )'.format(val), end = " ", file = f)
-            print('', file = f)
-        print("    ├── The %s initial states file has been created into the directory" % init_filename)
+        init_filename = transition["init_file"] + "1"
+        if not os.path.exists(os.path.join(data_dir, init_filename)):
+          matrix_io.write(os.path.join(data_dir, init_filename), transition["init_content"], matrix_format)
+          print("    ├── The %s initial states file has been created into the directory" % init_filename)
       
-      target_filename = transition["target_file"] + "1"
-      if not os.path.exists(os.path.join(data_dir, target_filename)):
-        with open(os.path.join(data_dir, target_filename), "w") as f:
-          for line in transition["target_content"]:
-            for val in line:
-              print('( {0.real:.10e} , {0.imag:.10e} )'.format(val), end = " ", file = f)
-            print('', file = f)
-        print("    ├── The %s target states file has been created into the directory" % target_filename)
+        target_filename = transition["target_file"] + "1"
+        if not os.path.exists(os.path.join(data_dir, target_filename)):
+          matrix_io.write(os.path.join(data_dir, target_filename), transition["target_content"], matrix_format)
+          print("    ├── The %s target states file has been created into the directory" % target_filename)
     
-      if 'projector' in transition.keys():
-        projector_filename = 'projector_' + transition["target_file"] + "1"
-        if not os.path.exists(os.path.join(data_dir, projector_filename)):
-          with open(os.path.join(data_dir, projector_filename), "w") as f:
-            for line in transition["projector"]:
-              for val in line:
-                print('( {0.real:.10e} , {0.imag:.10e} )'.format(val), end = " ", file = f)
-              print('', file = f)
-          print("    ├── The projector for the %s target states file ('%s') has been created into the directory" % (target_filename,projector_filename))
+        if 'projector' in transition.keys():
+          projector_filename = 'projector_' + transition["target_file"] + "1"
+          if not os.path.exists(os.path.join(data_dir, projector_filename)):
+            matrix_io.write(os.path.join(data_dir, projector_filename), transition["projector"], matrix_format)
+            print("    ├── The projector for the %s target states file ('%s') has been created into the directory" % (target_filename,projector_filename))
 
-    # ========================================================= #
-    # Other files                                               #
-    # ========================================================= #
+      # ========================================================= #
+      # Other files                                               #
+      # ========================================================= #
 
-    # Copying the source file into the data subdirectory
+      # Copying the source file into the data subdirectory (without duplicating its data if possible)
     
-    shutil.copy(os.path.join(source_path,source_filename), data_dir)
-    print("    └── The source file (%s) has been successfully copied into the directory." % source_filename)
+      if no_store:
+        shutil.copy(os.path.join(source_path,source_filename), data_dir)
+        print("    └── The source file (%s) has been successfully copied into the directory." % source_filename)
+      else:
+        clone_method = object_store.clone(os.path.join(source_path,source_filename), data_dir)
+        print("    └── The source file (%s) has been successfully copied into the directory (%s)." % (source_filename, clone_method))
 
-    # Console screen notification (we need to temporarily switch the standard outputs to show this message on screen and not in the log file)
-    
-    sys.stdout = original_stdout                                 
-    print('%12s' % "[ DONE ]")
-    sys.stdout = data_log    
+      # Console screen notification
 
-    # =================================================================== #
-    # =================================================================== #
-    #                             Job Scaling                             #
-    # =================================================================== #
-    # =================================================================== #
+      job_logging.console('%12s' % "[ DONE ]")
 
-    section_title = "3. Job scaling"
+      # =================================================================== #
+      # =================================================================== #
+      #                             Job Scaling                             #
+      # =================================================================== #
+      # =================================================================== #
 
-    print("")
-    print(''.center(len(section_title)+10, '*'))
-    print(section_title.center(len(section_title)+10))
-    print(''.center(len(section_title)+10, '*'))
+      section_title = "3. Job scaling"
 
-    sys.stdout = original_stdout                                 
-    print ("{:<80}".format('\nDetermining the job scale ...'), end="")
-    sys.stdout = data_log  
+      print("")
+      print(''.center(len(section_title)+10, '*'))
+      print(section_title.center(len(section_title)+10))
+      print(''.center(len(section_title)+10, '*'))
 
-    subsection_title = "A. Available job scales"
+      job_logging.console("{:<80}".format('\nDetermining the job scale ...'), end="")
 
-    print("")
-    print("")
-    print(subsection_title)
-    print(''.center(len(subsection_title), '='))
+      subsection_title = "A. Available job scales"
 
-    print("")
-    print(''.center(136, '-'))
-    print ("{:<15} {:<20} {:<20} {:<20} {:<20} {:<40}".format('Scale Limit','Label','Partition Name','Time','Memory (MB)','Delay Command'))
-    print(''.center(136, '-'))
-    for scale_limit, scale in job_scales.items():
-      print ("{:<15} {:<20} {:<20} {:<20} {:<20} {:<40}".format(scale_limit, scale['label'], scale.get('partition_name', "not specified"), scale['time'], scale['memory'], scale.get('delay_command', "not specified")))
-    print(''.center(136, '-'))
-
-    subsection_title = "B. Calculation requirements"
-
-    print("")
-    print("")
-    print(subsection_title)
-    print(''.center(len(subsection_title), '='))
+      print("")
+      print("")
+      print(subsection_title)
+      print(''.center(len(subsection_title), '='))
 
-    # Use the number of states to determine the job scale
+      print("")
+      print(''.center(136, '-'))
+      print ("{:<15} {:<20} {:<20} {:<20} {:<20} {:<40}".format('Scale Limit','Label','Partition Name','Time','Memory (MB)','Delay Command'))
+      print(''.center(136, '-'))
+      for scale_limit, scale in job_scales.items():
+        print ("{:<15} {:<20} {:<20} {:<20} {:<20} {:<40}".format(scale_limit, scale['label'], scale.get('partition_name', "not specified"), scale['time'], scale['memory'], scale.get('delay_command', "not specified")))
+      print(''.center(136, '-'))
 
-    scale_index = len(system['states_list'])
+      subsection_title = "B. Calculation requirements"
 
-    print("")
-    print(''.center(50, '-'))
-    print("{:<20} {:<30}".format("Number of states: ", scale_index))
+      print("")
+      print("")
+      print(subsection_title)
+      print(''.center(len(subsection_title), '='))
 
-    # Job scale category definition
+      # Use the number of states to determine the job scale
 
-    jobscale = None
+      scale_index = len(system['states_list'])
 
-    for scale_limit in job_scales:
-      if scale_index > scale_limit:
-        continue
-      else:
-        jobscale = job_scales[scale_limit]
-        jobscale_limit = scale_limit
-        break
-
-    if not jobscale:
-      raise control_common.ControlError ("ERROR: The number of states is too big for this cluster (%s). Please change cluster." % cluster_name)
-
-    # Obtaining the information associated to our job scale
-
-    job_partition = jobscale.get('partition_name')
-    job_walltime = jobscale['time']
-    job_memory = jobscale['memory']
-    delay_command = jobscale.get("delay_command", '')
-
-    print(''.center(50, '-'))
-    print("{:<20} {:<30}".format("Cluster: ", cluster_name))
-    print("{:<20} {:<30}".format("Job scale: ", jobscale["label"]))
-    print("{:<20} {:<30}".format("Job scale limit: ", jobscale_limit))
-    print(''.center(50, '-'))
-    print("{:<20} {:<30}".format("Job partition: ", (job_partition or "not specified")))
-    print("{:<20} {:<30}".format("Job walltime: ", job_walltime))
-    print("{:<20} {:<30}".format("Memory (MB): ", job_memory))
-    print("{:<20} {:<30}".format("Delay command: ", ("not specified" if delay_command == '' else delay_command)))
-    print(''.center(50, '-'))
+      print("")
+      print(''.center(50, '-'))
+      print("{:<20} {:<30}".format("Number of states: ", scale_index))
 
-    # ========================================================= #
-    # End of logging for the data files generation              #
-    # ========================================================= #
-
-    sys.stdout = original_stdout                                  # Reset the standard output to its original value
-    print('%12s' % "[ DONE ]")
-    data_log.close()
-    if os.path.exists(os.path.join(data_dir,data_log_name)):
-      os.remove(os.path.join(data_dir,data_log_name))
-    shutil.move(os.path.join(out_dir,data_log_name), data_dir)    # Archive the log file in the data directory
+      # Job scale category definition
 
-    console_message = "End of the source file treatment"
-    print("")
-    print(''.center(len(console_message)+11, '*'))
-    print(console_message.center(len(console_message)+10))
-    print(''.center(len(console_message)+11, '*'))
+      jobscale = None
 
-  # ========================================================= #
-  # Exception handling for the data files generation          #
-  # ========================================================= #
+      for scale_limit in job_scales:
+        if scale_index > scale_limit:
+          continue
+        else:
+          jobscale = job_scales[scale_limit]
+          jobscale_limit = scale_limit
+          break
+
+      if not jobscale:
+        raise control_common.ControlError ("ERROR: The number of states is too big for this cluster (%s). Please change cluster." % cluster_name)
+
+      # Obtaining the information associated to our job scale
+
+      job_partition = jobscale.get('partition_name')
+      job_walltime = jobscale['time']
+      job_memory = jobscale['memory']
+      delay_command = jobscale.get("delay_command", '')
+
+      print(''.center(50, '-'))
+      print("{:<20} {:<30}".format("Cluster: ", cluster_name))
+      print("{:<20} {:<30}".format("Job scale: ", jobscale["label"]))
+      print("{:<20} {:<30}".format("Job scale limit: ", jobscale_limit))
+      print(''.center(50, '-'))
+      print("{:<20} {:<30}".format("Job partition: ", (job_partition or "not specified")))
+      print("{:<20} {:<30}".format("Job walltime: ", job_walltime))
+      print("{:<20} {:<30}".format("Memory (MB): ", job_memory))
+      print("{:<20} {:<30}".format("Delay command: ", ("not specified" if delay_command == '' else delay_command)))
+      print(''.center(50, '-'))
 
-  except control_common.ControlError as error:
-    sys.stdout = original_stdout                        # Reset the standard output to its original value
-    print(error)
-    os.remove(os.path.join(out_dir,data_log_name))      # Remove the log file since there was a problem
-    exit(-1)
+      # ========================================================= #
+      # End of logging for the data files generation              #
+      # ========================================================= #
 
-  # =================================================================== #
-  # =================================================================== #
-  #           RENDERING THE TEMPLATES AND SUBMITTING THE JOBS           #
-  # =================================================================== #
-  # =================================================================== #
+      job_logging.log_to(None)                                      # Send the output of the print calls back to the console
+      print('%12s' % "[ DONE ]")
+      data_log.save(os.path.join(data_dir,data_log_name))          # Write the log file directly in the data directory
 
-  problem_cf = [] # Empty list that will contain the names of the configuration files for which a problem has occurred (those configuration files will not be archived even if arch_cf was set)
+      job_logging.event("source_done", source=source, data_dir=data_dir, transitions=len(transitions_list))
 
-  # For each transition-configuration combination, render the parameters file and run the corresponding job
+      console_message = "End of the source file treatment"
+      print("")
+      print(''.center(len(console_message)+11, '*'))
+      print(console_message.center(len(console_message)+10))
+      print(''.center(len(console_message)+11, '*'))
 
-  for transition in transitions_list:
+    # ========================================================= #
+    # Exception handling for the data files generation          #
+    # ========================================================= #
 
-    console_message = "Start procedure for the transition " + transition["label"]
-    print("")
-    print(''.center(len(console_message)+11, '*'))
-    print(console_message.center(len(console_message)+10))
-    print(''.center(len(console_message)+11, '*'))
+    # In batch mode, skip the source file instead of stopping the execution
+
+    except control_common.ControlError as error:
+      job_logging.log_to(None)                            # Send the output of the print calls back to the console
+      print(error)                                        # The log file is not written since there was a problem
+      job_logging.event("source_skipped", source=source, reason=str(error))
+      if not batch_mode:
+        exit(-1)
+      print("Skipping source file '%s'" % source_filename)
+      problem_src.append(source_filename)
+      arch_cf = False                                     # Flag to notify that a problem has occurred with this source file and to not archive the configuration files
+      continue
+
+    # In batch mode, an unexpected error with one source file must not prevent the other ones from being processed (the log file is kept for investigation)
+
+    except Exception as error:
+      job_logging.log_to(None)                            # Send the output of the print calls back to the console
+      data_log.save()                                     # Write the log file in the output directory
+      job_logging.event("source_skipped", source=source, reason=repr(error))
+      if not batch_mode:
+        raise
+      traceback.print_exc(file=sys.stdout)
+      print("Skipping source file '%s'" % source_filename)
+      problem_src.append(source_filename)
+      arch_cf = False                                     # Flag to notify that a problem has occurred with this source file and to not archive the configuration files
+      continue
 
-    for config_filename in config_inp_list: 
+    # =================================================================== #
+    # =================================================================== #
+    #           RENDERING THE TEMPLATES AND SUBMITTING THE JOBS           #
+    # =================================================================== #
+    # =================================================================== #
 
-      # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
-      try:
+    # For each transition-configuration combination, render the parameters file and run the corresponding job
 
-        # Getting rid of the format extension to get the name of the configuration
+    for transition in transitions_list:
 
-        config_name = str(config_filename.split('.')[0])
-        print("{:<80}".format("\nTreating '%s' transition with '%s' configuration ..." % (transition["label"], config_name)), end="")
+      console_message = "Start procedure for the transition " + transition["label"]
+      print("")
+      print(''.center(len(console_message)+11, '*'))
+      print(console_message.center(len(console_message)+10))
+      print(''.center(len(console_message)+11, '*'))
 
-        # Create an output log file for each transition - config combination
+      for config_filename in config_inp_list: 
 
-        log_name = transition["label"] + "_" + config_name + ".log"
-        log = open(os.path.join(pro_dir,log_name), 'w', encoding='utf-8')
+        # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
+        try:
 
-        # Redirect standard output to the log file (see https://stackabuse.com/writing-to-a-file-with-pythons-print-function/ for reference)
+          # Getting rid of the format extension to get the name of the configuration
 
-        sys.stdout = log
+          config_name = str(config_filename.split('.')[0])
+          print("{:<80}".format("\nTreating '%s' transition with '%s' configuration ..." % (transition["label"], config_name)), end="")
 
-        # Define the name and path of the job directory for that specific transition-configuration combination
+          # Create an output log file for each transition - config combination
 
-        job_dirname = transition["label"] + "_" + config_name
-        job_dir = os.path.join(pro_dir,job_dirname)
+          log_name = transition["label"] + "_" + config_name + ".log"
+          log = job_logging.JobLog(os.path.join(pro_dir,log_name))
 
-        if os.path.exists(job_dir) and not overwrite:
-          raise control_common.ControlError ("ERROR: A directory for the %s transition with the '%s' configuration already exists in %s !" % (transition["label"], config_name, pro_dir))
+          # Send the output of the print calls to the log (it is kept in memory and only written on the disk once the job has been treated)
 
-        # ========================================================= #
-        # Rendering the templates                                   #
-        # ========================================================= #
+          job_logging.log_to(log)
 
-        section_title = "1. Rendering the templates"
+          # Define the name and path of the job directory for that specific transition-configuration combination
 
-        print("")
-        print(''.center(len(section_title)+10, '*'))
-        print(section_title.center(len(section_title)+10))
-        print(''.center(len(section_title)+10, '*'))
+          job_dirname = transition["label"] + "_" + config_name
+          job_dir = os.path.join(pro_dir,job_dirname)
 
-        print ("{:<50} {:<100}".format('\nRendering function:',render_fct))
+          if os.path.exists(job_dir) and not overwrite:
+            raise control_common.ControlError ("ERROR: A directory for the %s transition with the '%s' configuration already exists in %s !" % (transition["label"], config_name, pro_dir))
 
-        # Load config file
+          # ========================================================= #
+          # Rendering the templates                                   #
+          # ========================================================= #
 
-        print ("{:<51}".format('\nLoading %s file ...' % config_filename), end="")
-        with open(os.path.join(config_inp_path,config_filename), 'r', encoding='utf-8') as f_config:
-          config = yaml.load(f_config, Loader=yaml.FullLoader)
-        print("[ DONE ]")
+          section_title = "1. Rendering the templates"
 
-        subsection_title = "A. Rendering function"
+          print("")
+          print(''.center(len(section_title)+10, '*'))
+          print(section_title.center(len(section_title)+10))
+          print(''.center(len(section_title)+10, '*'))
 
-        print("")
-        print("")
-        print(subsection_title)
-        print(''.center(len(subsection_title), '='))
+          print ("{:<50} {:<100}".format('\nRendering function:',render_fct))
 
-        # Get the path to the jinja templates directory (a directory named "templates" in the same directory as this script)
-        
-        templates_dir = os.path.join(code_dir,"templates")
+          # Load config file
 
-        # Build a dictionary that will contain all information related to the data directory
+          print ("{:<51}".format('\nLoading %s file ...' % config_filename), end="")
+          config = yaml_loader.load(os.path.join(config_inp_path,config_filename))   # Each configuration file is only parsed once, but a new copy is returned each time since the rendering function might modify the config dictionary
+          print("[ DONE ]")
 
-        data = {
-          # Path of the generic data files
-          "main_path" : data_dir,
-          "energies_path" : os.path.join(data_dir,energies_file),
-          "conv_mtx_path" : os.path.join(data_dir,conv_mtx_file),
-          # Path of the data files specific to this transition          
-          "init_path" : os.path.join(data_dir,transition['init_file']),
-          "target_path" : os.path.join(data_dir,transition['target_file']),
-          "momdip_mtx_path" : os.path.join(data_dir,'momdip_mtx_' + transition['momdip_key'])
-        }
+          subsection_title = "A. Rendering function"
 
-        if 'projector' in transition.keys():
-          data.update({
-            "projector_path" : os.path.join(data_dir,'projector_' + transition["target_file"])
-          })
-
-        # Build a dictionary that will contain all information related to the job
-
-        job_specs = {
-          "profile" : profile,
-          "scale_index" : scale_index,
-          "cluster_name" : cluster_name,
-          "scale_label" : jobscale["label"],
-          "scale_limit" : jobscale_limit,
-          "partition" : job_partition,
-          "walltime" : job_walltime,
-          "memory" : job_memory
-        }
-
-        # Build a dictionary containing the additional variables that might be needed by the rendering function
-        # If your rendering function needs anything else, you can add it in this dictionary
-
-        misc = {  
-            "code_dir" : code_dir,
-            "templates_dir" : templates_dir,
-            "source_name" : source_name,
-            "source_content" : source_content,
-            "mol_dir" : mol_dir,
-            "pro_dir" : pro_dir,
-            "config_name" : config_name,
-            "job_dirname" : job_dirname,
-            "transition" : transition,
-            "transitions_list" : transitions_list
-        }
-
-        # Call the rendering function (defined in control_renderer.py, see the documentation for more information)
+          print("")
+          print("")
+          print(subsection_title)
+          print(''.center(len(subsection_title), '='))
 
-        try:
-          rendered_content, rendered_script = eval("control_renderer." + render_fct)(clusters_cfg, config, system, data, job_specs, misc)
-        except KeyError as error:
-          raise control_common.ControlError ("ERROR: The '%s' rendering function tried to access an unknown key (%s). \nCheck your clusters configuration file ('clusters.yml') and the '%s' configuration file, as well as the spelling and definition of your variables in the rendering function." % (render_fct,error,config_filename))
+          # Get the path to the jinja templates directory (a directory named "templates" in the same directory as this script)
+        
+          templates_dir = os.path.join(code_dir,"templates")
+
+          # Build a dictionary that will contain all information related to the data directory
+
+          data = {
+            # Path of the generic data files
+            "main_path" : data_dir,
+            "energies_path" : os.path.join(data_dir,energies_file),
+            "conv_mtx_path" : os.path.join(data_dir,conv_mtx_file),
+            # Path of the data files specific to this transition          
+            "init_path" : os.path.join(data_dir,transition['init_file']),
+            "target_path" : os.path.join(data_dir,transition['target_file']),
+            "momdip_mtx_path" : os.path.join(data_dir,'momdip_mtx_' + transition['momdip_key'])
+          }
+
+          if 'projector' in transition.keys():
+            data.update({
+              "projector_path" : os.path.join(data_dir,'projector_' + transition["target_file"])
+            })
+
+          # Build a dictionary that will contain all information related to the job
+
+          job_specs = {
+            "profile" : profile,
+            "scale_index" : scale_index,
+            "cluster_name" : cluster_name,
+            "scale_label" : jobscale["label"],
+            "scale_limit" : jobscale_limit,
+            "partition" : job_partition,
+            "walltime" : job_walltime,
+            "memory" : job_memory
+          }
+
+          # Build a dictionary containing the additional variables that might be needed by the rendering function
+          # If your rendering function needs anything else, you can add it in this dictionary
+
+          misc = {  
+              "code_dir" : code_dir,
+              "templates_dir" : templates_dir,
+              "source_name" : source_name,
+              "source_content" : source_content,
+              "mol_dir" : mol_dir,
+              "pro_dir" : pro_dir,
+              "config_name" : config_name,
+              "job_dirname" : job_dirname,
+              "transition" : transition,
+              "transitions_list" : transitions_list,
+              "resources" : resources,
+              "matrix_format" : matrix_format
+          }
+
+          # Call the rendering function (defined in control_renderer.py, see the documentation for more information)
+
+          try:
+            rendered_content, rendered_script = eval("control_renderer." + render_fct)(clusters_cfg, config, system, data, job_specs, misc)
+          except KeyError as error:
+            raise control_common.ControlError ("ERROR: The '%s' rendering function tried to access an unknown key (%s). \nCheck your clusters configuration file ('clusters.yml') and the '%s' configuration file, as well as the spelling and definition of your variables in the rendering function." % (render_fct,error,config_filename))
+
+          # Check the rendered_content dictionary
+
+          if not isinstance(rendered_content, dict):
+            raise control_common.ControlError ('ERROR: The "rendered_content" returned by the %s rendering function is not a dictionary.' % render_fct) 
+
+          print("\nAll the templates have been succesfully rendered.")
+
+          # ========================================================= #
+          # Creating the job directory and its content                #
+          # ========================================================= #
+
+          subsection_title = "B. Creating the files"
+
+          print("")
+          print("")
+          print(subsection_title)
+          print(''.center(len(subsection_title), '='))
+
+          print ("{:<20} {:<100}".format('\nJob directory:',job_dir))
+
+          if os.path.exists(job_dir): # Overwrite was already checked previously, no need to check it again
+            print("    /!\ Deleting the old %s directory ..." % job_dir, end="")
+            shutil.rmtree(job_dir)
+            print('%12s' % "[ DONE ]")
+
+          os.makedirs(job_dir)
+
+          # Write the content of each rendered file into its own file with the corresponding filename (the content of the binary files, such as the matrix files in a binary format, is given as bytes)
+          # Unless the object store is disabled, the identical files of the different job directories (parameters files, guess pulses, etc.) are hard links to the same read-only object
+
+          store_dir = os.path.join(pro_dir, object_store.STORE_DIRNAME)
+
+          for filename, file_content in rendered_content.items():
+            rendered_file_path = os.path.join(job_dir, filename)
+            if not no_store:
+              object_store.write(store_dir, rendered_file_path, file_content)
+            elif isinstance(file_content, bytes):
+              with open(rendered_file_path, "wb") as result_file:
+                result_file.write(file_content)
+            else:
+              with open(rendered_file_path, "w", encoding='utf-8') as result_file:
+                result_file.write(file_content)
+            print("    ├── The %s file has been created into the directory" % filename)
+        
+          # Copying the config file into the job directory
+        
+          if no_store:
+            shutil.copy(os.path.join(config_inp_path,config_filename), job_dir)
+          else:
+            object_store.copy(store_dir, os.path.join(config_inp_path,config_filename), job_dir)
 
-        # Check the rendered_content dictionary
+          print("    └── The configuration file (%s) has been successfully copied into the directory." % config_filename)
 
-        if not isinstance(rendered_content, dict):
-          raise control_common.ControlError ('ERROR: The "rendered_content" returned by the %s rendering function is not a dictionary.' % render_fct) 
+          # ========================================================= #
+          # Submitting the job                                        #
+          # ========================================================= #
 
-        print("\nAll the templates have been succesfully rendered.")
+          section_title = "2. Submitting the job"
 
-        # ========================================================= #
-        # Creating the job directory and its content                #
-        # ========================================================= #
+          print("")
+          print("")
+          print(''.center(len(section_title)+10, '*'))
+          print(section_title.center(len(section_title)+10))
+          print(''.center(len(section_title)+10, '*'))
 
-        subsection_title = "B. Creating the files"
+          # Columns of the job registry for this job (see job_submission.py)
 
-        print("")
-        print("")
-        print(subsection_title)
-        print(''.center(len(subsection_title), '='))
+          job_info = {"Cluster": cluster_name, "Launcher": "control_launcher", "Molecule": source_name, "Profile": profile, "Transition": transition["label"], "Config": config_name, "Scale": jobscale["label"], "Job directory": job_dir, "Script": rendered_script}
 
-        print ("{:<20} {:<100}".format('\nJob directory:',job_dir))
+          # Add the job to the backlog if it would exceed the submission limits of the cluster
 
-        if os.path.exists(job_dir): # Overwrite was already checked previously, no need to check it again
-          print("    /!\ Deleting the old %s directory ..." % job_dir, end="")
-          shutil.rmtree(job_dir)
-          print('%12s' % "[ DONE ]")
+          if not dry_run and governor and not governor.allows(job_partition):
 
-        os.makedirs(job_dir)
+            governor.defer({"job_dir": job_dir, "script": rendered_script, "delay_command": delay_command, "partition": job_partition, "log_file": os.path.join(job_dir,log_name), "registry": job_registry if registry else None, "job": job_info})
+            deferred_count += 1
 
-        # Write the content of each rendered file into its own file with the corresponding filename
+            print("\nThe submission limits of the %s cluster have been reached, this job has been added to the backlog and will be submitted by a later execution." % cluster_name)
+            job_logging.console('%12s' % "[ DEFERRED ]")
+            job_logging.event("job_deferred", job_dir=job_dir, backlog=governor.backlog_path)
 
-        for filename, file_content in rendered_content.items():
-          rendered_file_path = os.path.join(job_dir, filename)
-          with open(rendered_file_path, "w", encoding='utf-8') as result_file:
-            result_file.write(file_content)
-          print("    ├── The %s file has been created into the directory" % filename)
-        
-        # Copying the config file into the job directory
-        
-        shutil.copy(os.path.join(config_inp_path,config_filename), job_dir)
+          # Launch the job
 
-        print("    └── The configuration file (%s) has been successfully copied into the directory." % config_filename)
+          elif not dry_run:
 
-        # ========================================================= #
-        # Submitting the job                                        #
-        # ========================================================= #
+            print("{:<51}".format("\nLaunching the job ..."), end="")
 
-        section_title = "2. Submitting the job"
+            # Define the launch command
 
-        print("")
-        print("")
-        print(''.center(len(section_title)+10, '*'))
-        print(section_title.center(len(section_title)+10))
-        print(''.center(len(section_title)+10, '*'))
+            launch_command = submit_command + " " + delay_command + " " + rendered_script
 
-        # Launch the job
+            # Execute the command from the job directory and get the job ID given by the job scheduler
+          
+            # If something went wrong when submitting the job, do not raise an exception and just quit the execution. It is likely a problem linked to the cluster.
+
+            try:
+              job_id, submit_output = job_submission.submit(submit_command, rendered_script, job_dir, delay_command)
+            except job_submission.SubmissionError as error:
+              print("\n" + error.output.strip())
+              job_logging.log_to(None)                                 # Send the output of the print calls back to the console
+              log.save(os.path.join(job_dir,log_name))
+              job_logging.event("submit_failed", job_dir=job_dir, retcode=error.returncode)
+              job_logging.close_events()
+              print("\n%s" % error)
+              print(error.output.strip())
+              print("Job submit encountered an issue")
+              print("Aborting ...")
+              if executor:
+                for future in futures.values():
+                  future.cancel()
+              exit(5)
         
-        if not dry_run:
-
-          print("{:<51}".format("\nLaunching the job ..."), end="")
-          os.chdir(job_dir)
+            job_count += 1
 
-          # Define the launch command
+            print("[ DONE ]")
+            print("{:<50} {:<20}".format("\nJob ID: ", (job_id or "unknown (%s)" % submit_output.strip())))
 
-          launch_command = submit_command + " " + delay_command + " " + rendered_script
+            if governor:
+              governor.count(job_partition)
 
-          # Execute the command and get the command status
-
-          retcode = os.system(launch_command)
-          
-          # If something went wrong when submitting the job, do not raise an exception and just quit the execution. It is likely a problem linked to the cluster.
+            # Record the job in the job registry
 
-          if retcode != 0 :
-            sys.stdout = original_stdout                             # Reset the standard output to its original value
-            print("Job submit encountered an issue")
-            print("Aborting ...")
-            exit(5)
-        
-          job_count += 1
+            if registry and job_id:
+              job_submission.record(registry, dict(job_info, **{"Job ID": job_id}))
 
-          print("[ DONE ]")
+            job_logging.event("job_submitted", job_dir=job_dir, command=launch_command, job_id=job_id)
         
-        else:
+          else:
 
-          print("\nThe dry run option has been enabled, this job will not be submitted to the job scheduler.")
-          sys.stdout = original_stdout                            # Reset the standard output to its original value
-          print('%12s' % "[ DONE ]")
+            print("\nThe dry run option has been enabled, this job will not be submitted to the job scheduler.")
+            job_logging.console('%12s' % "[ DONE ]")
 
-        # ================================================================== #
-        # End of logging for that transition - config combination            #
-        # ================================================================== #
+          # ================================================================== #
+          # End of logging for that transition - config combination            #
+          # ================================================================== #
 
-        sys.stdout = original_stdout                            # Reset the standard output to its original value
-        log.close()                                             # End of logging
-        shutil.move(os.path.join(pro_dir,log_name), job_dir)    # Archive the log file in the job directory
-
-      # ========================================================= #
-      # Exception handling for the rendering and submitting steps #
-      # ========================================================= #
-
-      # In case of an error specific to the configuration file, skip it and do not archive the source file even if arch_src was set.
-
-      except control_common.ControlError as error:
-        sys.stdout = original_stdout                            # Reset the standard output to its original value
-        print(error)
-        print("Skipping configuration '%s'" % config_name)
-        os.remove(os.path.join(pro_dir,log_name))               # Remove the log file since there was a problem
-        problem_cf.append(config_filename)                      # Add the name of this configuration file to the list as to enforce not archiving it
-        arch_src = False                                        # Flag to notify that a problem has occurred with this configuration file and to enforce not archiving the source file
-        continue        
+          job_logging.log_to(None)                                # Send the output of the print calls back to the console
+          log.save(os.path.join(job_dir,log_name))                # Write the log file directly in the job directory
 
-    console_message = "End of procedure for the transition " + transition["label"]
-    print("")
-    print(''.center(len(console_message)+10, '*'))
-    print(console_message.center(len(console_message)+10))
-    print(''.center(len(console_message)+10, '*'))
+          job_logging.event("job_created", source=source, transition=transition["label"], config=config_filename, job_dir=job_dir)
 
-  # After all the transition-configuration combinations have been treated, archive the source file if arch_src has been set and there was no problem.
+        # ========================================================= #
+        # Exception handling for the rendering and submitting steps #
+        # ========================================================= #
 
-  if arch_src:
-    launched_dir = os.path.join(source_path,"launched")      # Directory where the source file will be put after having been treated by this script, it will be created inside the directory where it was.
-    os.makedirs(launched_dir, exist_ok=True)
-    if os.path.exists(os.path.join(launched_dir,source_filename)):
-      os.remove(os.path.join(launched_dir,source_filename))
-    shutil.move(os.path.join(source_path,source_filename), launched_dir)
-    print("\nSource file archived to %s" % launched_dir)
+        # In case of an error specific to the configuration file, skip it and do not archive the source file even if arch_src was set.
+
+        except control_common.ControlError as error:
+          job_logging.log_to(None)                                # Send the output of the print calls back to the console
+          print(error)
+          print("Skipping configuration '%s'" % config_name)     # The log file is not written since there was a problem
+          job_logging.event("config_skipped", source=source, transition=transition["label"], config=config_filename, reason=str(error))
+          problem_cf.append(config_filename)                      # Add the name of this configuration file to the list as to enforce not archiving it
+          arch_src = False                                        # Flag to notify that a problem has occurred with this configuration file and to enforce not archiving the source file
+          continue        
+
+        # In batch mode, an unexpected error must not prevent the other source files from being processed (the log file is kept for investigation)
+
+        except Exception as error:
+          job_logging.log_to(None)                                # Send the output of the print calls back to the console
+          log.save()                                              # Write the log file in the molecule directory
+          job_logging.event("config_skipped", source=source, transition=transition["label"], config=config_filename, reason=repr(error))
+          if not batch_mode:
+            raise
+          traceback.print_exc(file=sys.stdout)
+          print("Skipping configuration '%s'" % config_name)
+          problem_cf.append(config_filename)
+          arch_src = False
+          continue
+
+      console_message = "End of procedure for the transition " + transition["label"]
+      print("")
+      print(''.center(len(console_message)+10, '*'))
+      print(console_message.center(len(console_message)+10))
+      print(''.center(len(console_message)+10, '*'))
+
+    # Remove the objects of the store that are not used by any job directory anymore (e.g. those of the job directories that have been replaced)
+
+    if not no_store:
+      object_store.prune(os.path.join(pro_dir, object_store.STORE_DIRNAME))
+
+    # After all the transition-configuration combinations have been treated, archive the source file if arch_src has been set and there was no problem.
+
+    if arch_src:
+      launched_dir = os.path.join(source_path,"launched")      # Directory where the source file will be put after having been treated by this script, it will be created inside the directory where it was.
+      os.makedirs(launched_dir, exist_ok=True)
+      if os.path.exists(os.path.join(launched_dir,source_filename)):
+        os.remove(os.path.join(launched_dir,source_filename))
+      shutil.move(os.path.join(source_path,source_filename), launched_dir)
+      print("\nSource file archived to %s" % launched_dir)
 
   # After all the transition-configuration combinations have been treated, archive the configuration files if arch_cf has been set and there was no problem.
 
@@ -970,15 +1277,31 @@ def main():
         shutil.move(os.path.join(config_inp_path,config_filename), launched_dir)
         print("\nThe '%s' config file has been archived to %s" % (config_filename,launched_dir))
 
+  if executor:
+    executor.shutdown()
+
+  # In batch mode, list the source files that could not be processed
+
+  if problem_src != []:
+    print("\nWARNING: The following source files could not be processed and have been skipped: %s" % ', '.join(problem_src))
+
   if not dry_run:
     print("")
     if job_count == 1:
       print("One job has been succesfully launched.")
     elif job_count > 1:
       print("%s jobs have been succesfully launched." % job_count)
-    else:
+    elif not deferred_count:
       print("WARNING: No job could be launched.")
+    if deferred_count:
+      print("%s job(s) have been added to the backlog (%s) and will be submitted by a later execution." % (deferred_count, governor.backlog_path))
       
+  if registry:
+    registry.close()
+
+  job_logging.event("end", jobs_launched=(None if dry_run else job_count), jobs_deferred=(None if dry_run else deferred_count), skipped_sources=problem_src, skipped_configs=problem_cf)
+  job_logging.close_events()
+
   print("")
   print("".center(columns,"*"))
   print("")
@@ -9,18 +9,74 @@ import csv
 import math
 import os
 import re
+import shutil
 
 import numpy as np
-import yaml
-from jinja2 import Environment, FileSystemLoader
-from scipy.spatial import ConvexHull, distance
+from jinja2 import ChoiceLoader, Environment, FileSystemLoader, ModuleLoader
 from scipy import constants
 
 import control_common
+import matrix_io
 
 
+# Jinja environments (one for each templates directory) and compiled templates, kept for the whole execution so that each template is only loaded and compiled once
+# Each template is stored along with the modification time of its file, so that a template that has been modified since it was loaded is compiled again
+
+_jinja_envs = {}
+_templates_cache = {}
+
+# Templates directories for which precompiled templates are used, along with the directory containing the compiled templates and the time of the compilation
+
+_precompiled_dirs = {}
+
+def _get_jinja_env(templates_dir:str):
+    """Returns the Jinja environment associated with a templates directory, creating it if needed."""
+
+    env = _jinja_envs.get(templates_dir)
+
+    if env is None:
+      env = Environment(loader=FileSystemLoader(templates_dir))
+      _jinja_envs[templates_dir] = env
+
+    return env
+
+#######################################################################
+
+def precompile_templates(templates_dir:str, compiled_dir:str):
+    """Compiles all the Jinja templates of a directory into Python modules and makes the jinja_render function use those modules for that directory, which avoids having to parse and compile the templates each time the script is executed. The templates are only compiled again if one of them has been modified since the last compilation.
+
+    Parameters
+    ----------
+    templates_dir : str
+        The path towards the directory where the Jinja templates are located.
+    compiled_dir : str
+        The path towards the directory where the compiled templates will be stored. It will be created if needed and its content will be replaced each time the templates need to be compiled again.
+    """
+
+    stamp_file = os.path.join(compiled_dir, "compilation.stamp")
+
+    source_env = Environment(loader=FileSystemLoader(templates_dir))
+    last_modified = max((os.path.getmtime(os.path.join(templates_dir, template_file)) for template_file in source_env.list_templates()), default=0)
+
+    # Compile the templates if they have not been compiled yet or if one of them has been modified since then (the stamp file is written last, marking the compilation as complete)
+
+    if not os.path.isfile(stamp_file) or os.path.getmtime(stamp_file) < last_modified:
+      shutil.rmtree(compiled_dir, ignore_errors=True)
+      source_env.compile_templates(compiled_dir, zip=None)
+      open(stamp_file, 'w').close()
+
+    # Templates that could not be compiled (or that have been added since then) are still loaded from their file
+
+    _jinja_envs[templates_dir] = Environment(loader=ChoiceLoader([ModuleLoader(compiled_dir), FileSystemLoader(templates_dir)]))
+    _precompiled_dirs[templates_dir] = (compiled_dir, os.path.getmtime(stamp_file))
+
+    for cache_key in [cache_key for cache_key in _templates_cache if cache_key[0] == templates_dir]:
+      del _templates_cache[cache_key]
+
+#######################################################################
+
 def jinja_render(templates_dir:str, template_file:str, render_vars:dict):
-    """Renders a file based on its Jinja template.
+    """Renders a file based on its Jinja template. The compiled template is kept in memory and reused as long as its file is not modified.
 
     Parameters
     ----------
@@ -36,10 +92,23 @@ def jinja_render(templates_dir:str, template_file:str, render_vars:dict):
     output_text : str
         Content of the rendered file.
     """
-   
-    file_loader = FileSystemLoader(templates_dir)
-    env = Environment(loader=file_loader)
-    template = env.get_template(template_file)
+
+    last_modified = os.path.getmtime(os.path.join(templates_dir, template_file))
+
+    # A precompiled template which has been modified since its compilation means the templates need to be compiled again
+
+    if templates_dir in _precompiled_dirs and last_modified > _precompiled_dirs[templates_dir][1]:
+      precompile_templates(templates_dir, _precompiled_dirs[templates_dir][0])
+
+    cache_key = (templates_dir, template_file)
+    cached = _templates_cache.get(cache_key)
+
+    if cached is not None and cached[0] == last_modified:
+      template = cached[1]
+    else:
+      template = _get_jinja_env(templates_dir).get_template(template_file)
+      _templates_cache[cache_key] = (last_modified, template)
+
     output_text = template.render(render_vars)
     
     return output_text
@@ -157,13 +226,7 @@ def alpha_duration_param_search(clusters_cfg:dict, config:dict, system:dict, dat
     chains_path = os.path.dirname(misc['code_dir']) 
 
     if copy_files:
-      
-      chains_config_file = control_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
-
-      print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-      with open(chains_config_file, 'r') as chains:
-        chains_config = yaml.load(chains, Loader=yaml.FullLoader)
-      print('%12s' % "[ DONE ]")
+      chains_config = misc['resources'].chains_config
 
     # ========================================================= #
     #           Rendering the control parameters files          #
@@ -305,20 +368,9 @@ def alpha_duration_param_search(clusters_cfg:dict, config:dict, system:dict, dat
         for state_number in init_group:
           init_mtx[state_number][state_number] = complex(system['momdip_mtx'][momdip_key][0][state_number] / total_momdip)
 
-        # Render the files
-
-        init_content = []
-
-        for line in init_mtx:
+        # Render the files (in the same format as the other matrix files, see matrix_io.py)
 
-          line_content = []
-
-          for val in line:
-            line_content.append('( {0.real:.10e} , {0.imag:.10e} )'.format(val))
-          
-          init_content.append(" ".join(line_content))
-        
-        rendered_content[prefix_init_pcp + "_" + momdip_key + "_1"] = "\n".join(init_content)
+        rendered_content[prefix_init_pcp + "_" + momdip_key + "_1"] = matrix_io.dumps(init_mtx, misc['matrix_format'])
 
     # ========================================================= #
     #             Rendering the PCP parameters file             #
@@ -710,23 +762,7 @@ def constraints_variation(clusters_cfg:dict, config:dict, system:dict, data:dict
     # ==============================
 
     chains_path = os.path.dirname(misc['code_dir']) 
-    chains_config_file = control_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
-
-    print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-    with open(chains_config_file, 'r') as chains:
-      chains_config = yaml.load(chains, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
-
-    # Load ionization potentials CSV file
-    # ===================================
-
-    ip_file = control_common.check_abspath(chains_config['ip_file'],"Ionization potentials CSV file","file")
-
-    print ("{:<80}".format("\nLoading ionization potentials CSV file ..."), end="")
-    with open(ip_file, 'r', newline='') as csv_file:
-      ip_content = csv.DictReader(csv_file, delimiter=';')
-      ip_list = list(ip_content)
-    print('%12s' % "[ DONE ]")
+    chains_config = misc['resources'].chains_config
 
     # Load recap CSV file from aldu_param calculation
     # ===============================================
@@ -813,20 +849,7 @@ def constraints_variation(clusters_cfg:dict, config:dict, system:dict, data:dict
     # Ionization potential
     # ~~~~~~~~~~~~~~~~~~~~
 
-    ip = -1
-
-    for line in ip_list:
-      if line['Molecule'] == misc['source_name']:
-        if line['IP (adiabatic)'] != "N/A":
-          ip = float(line['IP (adiabatic)'])
-        elif line['IP (vertical)'] != "N/A":
-          ip = float(line['IP (vertical)'])
-        else:
-          ip = float(line['IP (Koopmans)'])
-        break
-
-    if ip == -1:
-      raise control_common.ControlError ("ERROR: Unable to find the ionization potential of this molecule in the %s file." % ip_file)
+    ip = misc['resources'].get_ip(misc['source_name'])
 
     # Convert the IP from Ha to Joules and divide by 100 to get the maximum pulse energy (must remain a perturbation to the electrons in the system)
 
@@ -835,74 +858,9 @@ def constraints_variation(clusters_cfg:dict, config:dict, system:dict, data:dict
     # Affected area of the molecule
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-    # Initialize some variables
-
-    coord_list = []
-    section_found = False
-
-    # Define the expression patterns for the lines containing the atomic coordinates of the molecule in the QCHEM output file
-  
-    coord_rx = {
-
-      # Pattern for finding the "Standard Nuclear Orientation (Angstroms)" line (which marks the start of the section)
-      'start': re.compile(r'^\s*Standard Nuclear Orientation \(Angstroms\)\s*$'),
-
-      # Pattern for finding lines looking like '   16      Si     -2.7647071137    -0.0043786180     2.7647071137'
-      'coordinates': re.compile(r'^\s*\d+\s+[a-zA-Z]{1,3}\s+(?P<coord_x>-?\d+\.\d+)\s+(?P<coord_y>-?\d+\.\d+)\s+(?P<coord_z>-?\d+\.\d+)\s*$'),
-
-      # Pattern for finding the "Total QAlloc Memory Limit" line (which marks the end of the section, no need to get further)
-      'end': re.compile(r'^\s*Total QAlloc Memory Limit')
-
-    }
-
-    # Parse the qchem output file to get the information
-
-    for line in misc['source_content']:
-
-      # Define when the section begins and ends (ignore beta orbitals)
-
-      if not section_found:
-        if coord_rx['start'].match(line):
-          section_found = True
-    
-      elif section_found and coord_rx['end'].match(line):
-        break
-
-      # If the line matches our coordinates pattern, extract the values and store them (after converting them from Angstroms to meters)
+    # Compute the average distance between the points of the convex hull of the molecule and their centroid ("radius"), and the area of the molecule affected by the laser
 
-      elif coord_rx['coordinates'].match(line):
-
-        x1 = float(coord_rx['coordinates'].match(line).group('coord_x'))*1e-10
-        y1 = float(coord_rx['coordinates'].match(line).group('coord_y'))*1e-10
-        z1 = float(coord_rx['coordinates'].match(line).group('coord_z'))*1e-10
-
-        coord_list.append([x1,y1,z1])
-
-    # Raise an exception if the section has not been found
-
-    if not section_found:
-      raise control_common.ControlError ("ERROR: Unable to find the 'Standard Nuclear Orientation (Angstroms)' section in the QCHEM output file")
-
-    # Raise an exception if the atomic coordinates have not been found
-
-    if coord_list == []:
-      raise control_common.ControlError ("ERROR: Unable to find the atomic coordinates of the molecule in the QCHEM output file")
-
-    # Compute the convex hull of the molecule and get the list of points constituting it
-
-    points = np.array(coord_list)
-    hull = ConvexHull(points)
-    pts_hull = points[hull.vertices,:]
-
-    # Compute the average distance between the points of the hull and their centroid ("radius")
-
-    centroid = np.array(np.mean(pts_hull,axis=0),ndmin=2)
-    dist = distance.cdist(pts_hull,centroid)
-    radius = np.mean(dist)
-
-    # Compute the area of the molecule affected by the laser (consider the shape of a sphere, and compute the surface of the hemisphere)
-
-    area = 2 * np.pi *(radius**2)
+    radius, area = misc['resources'].get_hull(misc['source_name'], misc['source_content'])
 
     # Compute the minimum value
     # ~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -1050,20 +1008,9 @@ def constraints_variation(clusters_cfg:dict, config:dict, system:dict, data:dict
         for state_number in init_group:
           init_mtx[state_number][state_number] = complex(system['momdip_mtx'][momdip_key][0][state_number] / total_momdip)
 
-        # Render the files
-
-        init_content = []
-
-        for line in init_mtx:
-
-          line_content = []
+        # Render the files (in the same format as the other matrix files, see matrix_io.py)
 
-          for val in line:
-            line_content.append('( {0.real:.10e} , {0.imag:.10e} )'.format(val))
-          
-          init_content.append(" ".join(line_content))
-        
-        rendered_content[prefix_init_pcp + "_" + momdip_key + "_1"] = "\n".join(init_content)
+        rendered_content[prefix_init_pcp + "_" + momdip_key + "_1"] = matrix_io.dumps(init_mtx, misc['matrix_format'])
 
     # ========================================================= #
     #             Rendering the PCP parameters file             #
@@ -1513,12 +1460,7 @@ def filt_freq_variation(clusters_cfg:dict, config:dict, system:dict, data:dict,
     # ==============================
 
     chains_path = os.path.dirname(misc['code_dir']) 
-    chains_config_file = control_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
-
-    print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-    with open(chains_config_file, 'r') as chains:
-      chains_config = yaml.load(chains, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
+    chains_config = misc['resources'].chains_config
 
     # Load recap CSV file from aldu_param calculation
     # ===============================================
@@ -1701,20 +1643,9 @@ def filt_freq_variation(clusters_cfg:dict, config:dict, system:dict, data:dict,
         for state_number in init_group:
           init_mtx[state_number][state_number] = complex(system['momdip_mtx'][momdip_key][0][state_number] / total_momdip)
 
-        # Render the files
-
-        init_content = []
+        # Render the files (in the same format as the other matrix files, see matrix_io.py)
 
-        for line in init_mtx:
-
-          line_content = []
-
-          for val in line:
-            line_content.append('( {0.real:.10e} , {0.imag:.10e} )'.format(val))
-          
-          init_content.append(" ".join(line_content))
-        
-        rendered_content[prefix_init_pcp + "_" + momdip_key + "_1"] = "\n".join(init_content)
+        rendered_content[prefix_init_pcp + "_" + momdip_key + "_1"] = matrix_io.dumps(init_mtx, misc['matrix_format'])
 
     # ========================================================= #
     #             Rendering the PCP parameters file             #
@@ -2133,34 +2064,12 @@ def chains_qoctra_render(clusters_cfg:dict, config:dict, system:dict, data:dict,
     # Load CHAINS configuration file
     # ==============================
 
-    chains_path = os.path.dirname(misc['code_dir']) 
-    chains_config_file = control_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
-
-    print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-    with open(chains_config_file, 'r') as chains:
-      chains_config = yaml.load(chains, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
-
-    # Load ionization potentials CSV file
-    # ===================================
-
-    ip_file = control_common.check_abspath(chains_config['ip_file'],"Ionization potentials CSV file","file")
-
-    print ("{:<80}".format("\nLoading ionization potentials CSV file ..."), end="")
-    with open(ip_file, 'r', newline='') as csv_file:
-      ip_content = csv.DictReader(csv_file, delimiter=';')
-      ip_list = list(ip_content)
-    print('%12s' % "[ DONE ]")
+    chains_config = misc['resources'].chains_config
 
     # Load the pulse shapers file
     # ===========================
 
-    shapers_file = control_common.check_abspath(os.path.join(chains_path,"shapers.yml"),"Pulse shapers YAML file","file")
-
-    print ("{:<80}".format("\nLoading the pulse shapers YAML file ..."), end="")
-    with open(shapers_file, 'r', encoding='utf-8') as shape:
-      shapers = yaml.load(shape, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
+    shapers = misc['resources'].shapers
 
     # ========================================================= #
     #           Rendering the control parameters file           #
@@ -2327,20 +2236,7 @@ def chains_qoctra_render(clusters_cfg:dict, config:dict, system:dict, data:dict,
         # Ionization potential
         # --------------------
 
-        ip = -1
-
-        for line in ip_list:
-          if line['Molecule'] == misc['source_name']:
-            if line['IP (adiabatic)'] != "N/A":
-              ip = float(line['IP (adiabatic)'])
-            elif line['IP (vertical)'] != "N/A":
-              ip = float(line['IP (vertical)'])
-            else:
-              ip = float(line['IP (Koopmans)'])
-            break
-
-        if ip == -1:
-          raise control_common.ControlError ("ERROR: Unable to find the ionization potential of this molecule in the %s file." % ip_file)
+        ip = misc['resources'].get_ip(misc['source_name'])
 
         # Convert the IP from Ha to Joules and divide by 1000 to get the maximum pulse energy (must remain a perturbation to the electrons in the system)
 
@@ -2349,74 +2245,9 @@ def chains_qoctra_render(clusters_cfg:dict, config:dict, system:dict, data:dict,
         # Affected area of the molecule
         # -----------------------------
 
-        # Initialize some variables
-
-        coord_list = []
-        section_found = False
-
-        # Define the expression patterns for the lines containing the atomic coordinates of the molecule in the QCHEM output file
-      
-        coord_rx = {
-
-          # Pattern for finding the "Standard Nuclear Orientation (Angstroms)" line (which marks the start of the section)
-          'start': re.compile(r'^\s*Standard Nuclear Orientation \(Angstroms\)\s*$'),
-
-          # Pattern for finding lines looking like '   16      Si     -2.7647071137    -0.0043786180     2.7647071137'
-          'coordinates': re.compile(r'^\s*\d+\s+[a-zA-Z]{1,3}\s+(?P<coord_x>-?\d+\.\d+)\s+(?P<coord_y>-?\d+\.\d+)\s+(?P<coord_z>-?\d+\.\d+)\s*$'),
-
-          # Pattern for finding the "Total QAlloc Memory Limit" line (which marks the end of the section, no need to get further)
-          'end': re.compile(r'^\s*Total QAlloc Memory Limit')
-
-        }
-
-        # Parse the qchem output file to get the information
-
-        for line in misc['source_content']:
-
-          # Define when the section begins and ends (ignore beta orbitals)
-
-          if not section_found:
-            if coord_rx['start'].match(line):
-              section_found = True
-        
-          elif section_found and coord_rx['end'].match(line):
-            break
-
-          # If the line matches our coordinates pattern, extract the values and store them (after converting them from Angstroms to meters)
-
-          elif coord_rx['coordinates'].match(line):
-
-            x1 = float(coord_rx['coordinates'].match(line).group('coord_x'))*1e-10
-            y1 = float(coord_rx['coordinates'].match(line).group('coord_y'))*1e-10
-            z1 = float(coord_rx['coordinates'].match(line).group('coord_z'))*1e-10
-
-            coord_list.append([x1,y1,z1])
-
-        # Raise an exception if the section has not been found
-
-        if not section_found:
-          raise control_common.ControlError ("ERROR: Unable to find the 'Standard Nuclear Orientation (Angstroms)' section in the QCHEM output file")
-
-        # Raise an exception if the atomic coordinates have not been found
-
-        if coord_list == []:
-          raise control_common.ControlError ("ERROR: Unable to find the atomic coordinates of the molecule in the QCHEM output file")
-
-        # Compute the convex hull of the molecule and get the list of points consituting it
-
-        points = np.array(coord_list)
-        hull = ConvexHull(points)
-        pts_hull = points[hull.vertices,:]
-
-        # Compute the average distance between the points of the hull and their centroid ("radius")
-
-        centroid = np.array(np.mean(pts_hull,axis=0),ndmin=2)
-        dist = distance.cdist(pts_hull,centroid)
-        radius = np.mean(dist)
-
-        # Compute the area of the molecule affected by the laser (consider the shape of a sphere, and compute the surface of the hemisphere)
+        # Compute the average distance between the points of the convex hull of the molecule and their centroid ("radius"), and the area of the molecule affected by the laser
 
-        area = 2 * np.pi *(radius**2)
+        radius, area = misc['resources'].get_hull(misc['source_name'], misc['source_content'])
 
         # Maximum fluence of the molecule
         # -------------------------------
@@ -0,0 +1,236 @@
+################################################################################################################################################
+##                                                                Job logging                                                                 ##
+##                                                                                                                                            ##
+##     This script contains the functions used to send the output of the print calls either to the console or to the log file of the job      ##
+##        being currently treated, without modifying the standard output each time, and to write a machine-readable stream of events.         ##
+##                      It is shared by ABIN LAUNCHER and CONTROL LAUNCHER (the former imports it from this directory).                       ##
+################################################################################################################################################
+
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+# Log where the output of the print calls is currently sent (its "log" attribute, missing or None meaning the console). Each thread has its own value, which allows jobs to be treated concurrently.
+
+_current = threading.local()
+
+# Whether the detailed tables (lists of values, matrices, etc.) need to be written in the log files
+
+_tables = True
+
+# Stream of events in the JSON Lines format (see https://jsonlines.org/), if one has been opened
+
+_events = None
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+class _Dispatcher:
+    """Replacement for the standard output, sending what it receives to the log of the current thread, or to the console if there is none.
+
+    Attributes
+    ----------
+    console : file object
+        The original standard output.
+    """
+
+    def __init__(self, console):
+        self.console = console
+
+    def write(self, text):
+        return (_get_log() or self.console).write(text)
+
+    def flush(self):
+        (_get_log() or self.console).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.console, name)
+
+#######################################################################
+
+def _get_log():
+    """Returns the log where the output of the print calls of the current thread is sent, or None if it is sent to the console."""
+
+    return getattr(_current, "log", None)
+
+#######################################################################
+
+class JobLog(io.StringIO):
+    """Log of a job (or of any other part of the execution), kept in memory and only written to its file when it is saved, in a single operation.
+
+    Attributes
+    ----------
+    path : str
+        Path towards the file where the log will be saved by default.
+    """
+
+    def __init__(self, path:str=None, initial_value:str=""):
+        super().__init__(initial_value)
+        self.seek(0, io.SEEK_END)
+        self.path = path
+
+    def save(self, path:str=None):
+        """Writes the content of the log in its file (or in the given file)."""
+
+        with open(path or self.path, 'w', encoding='utf-8') as log_file:
+          log_file.write(self.getvalue())
+
+#######################################################################
+
+class _TeeLog(JobLog):
+    """Log that also sends everything it receives to another stream."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+        return super().write(text)
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def install():
+    """Replaces the standard output by a dispatcher sending the output of the print calls to the log of the current thread (see the log_to function). This only needs to be done once, at the beginning of the execution."""
+
+    if not isinstance(sys.stdout, _Dispatcher):
+      sys.stdout = _Dispatcher(sys.stdout)
+
+#######################################################################
+
+def log_to(log:JobLog):
+    """Sends the output of the print calls made in the current thread to the given log, or to the console if log is None. This has no effect if the install function has not been called.
+
+    Parameters
+    ----------
+    log : JobLog or None
+        The log where the output of the print calls will be sent.
+    """
+
+    _current.log = log
+
+#######################################################################
+
+def current_stream():
+    """Returns the stream where the output of the print calls made in the current thread is sent."""
+
+    if isinstance(sys.stdout, _Dispatcher):
+      return _get_log() or sys.stdout.console
+    else:
+      return sys.stdout
+
+#######################################################################
+
+def console(*args, **kwargs):
+    """Prints something on the console, whatever the log of the current thread. The arguments are the same as for the print function."""
+
+    stream = sys.stdout.console if isinstance(sys.stdout, _Dispatcher) else sys.stdout
+    print(*args, file=stream, **kwargs)
+
+#######################################################################
+
+@contextlib.contextmanager
+def capture(tee:bool=False):
+    """Captures the output of the print calls made in the current thread into a JobLog object, for the duration of a with statement.
+
+    Parameters
+    ----------
+    tee : bool, optional
+        If True, what is captured is also sent where it would have gone otherwise.
+
+    Yields
+    ------
+    log : JobLog
+        The log containing what has been captured.
+    """
+
+    log = _TeeLog(current_stream()) if tee else JobLog()
+
+    if isinstance(sys.stdout, _Dispatcher):
+      previous = _get_log()
+      _current.log = log
+      try:
+        yield log
+      finally:
+        _current.log = previous
+
+    # Without the dispatcher, fall back on the redirection of the standard output
+
+    else:
+      with contextlib.redirect_stdout(log):
+        yield log
+
+#######################################################################
+
+def show_tables(enabled:bool):
+    """Defines whether the detailed tables (lists of values, matrices, etc.) need to be written in the log files. The functions producing those tables should check the tables_enabled function before even building them."""
+
+    global _tables
+    _tables = enabled
+
+#######################################################################
+
+def tables_enabled() -> bool:
+    """Returns True if the detailed tables need to be written in the log files (see the show_tables function)."""
+
+    return _tables
+
+#######################################################################
+
+def open_events(path:str):
+    """Opens a stream of events in the JSON Lines format, to which the events given to the event function will be appended. This stream is meant to be read by other programs.
+
+    Parameters
+    ----------
+    path : str
+        Path towards the file where the events will be written (if it already exists, the new events are appended to it).
+    """
+
+    global _events
+    _events = open(path, 'a', encoding='utf-8')
+
+#######################################################################
+
+def event(name:str, **fields):
+    """Writes an event in the stream of events, if one has been opened (see the open_events function). Each event is a JSON object written on its own line, containing the time, the process ID, the name of the event and the given fields.
+
+    Parameters
+    ----------
+    name : str
+        Name of the event.
+    **fields
+        Information associated with the event (values that cannot be converted to JSON are written as strings).
+    """
+
+    if _events is None:
+      return
+
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid(), "event": name}
+    record.update(fields)
+
+    # The stream is flushed right away so that it can be followed while the execution is going on
+
+    _events.write(json.dumps(record, default=str) + "\n")
+    _events.flush()
+
+#######################################################################
+
+def close_events():
+    """Closes the stream of events, if one has been opened."""
+
+    global _events
+
+    if _events is not None:
+      _events.close()
+      _events = None
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+
+################################################################################################################################################
+##                                                               Job submission                                                               ##
+##                                                                                                                                            ##
+##      This script contains the functions used by ABIN LAUNCHER and CONTROL LAUNCHER to submit their jobs to the job scheduler, keeping      ##
+##        the job ID given by the scheduler, to record each submitted job in a job registry (an SQLite database) that can be consulted        ##
+##            by other scripts, and to keep the number of queued jobs under the limits of the cluster by deferring the excess jobs            ##
+##                                                  to a backlog drained by later executions                                                  ##
+################################################################################################################################################
+
+import argparse
+import contextlib
+import csv
+import datetime
+import fcntl
+import getpass
+import json
+import os
+import re
+import shlex
+import sqlite3
+import subprocess
+import sys
+import time
+
+import sqlite_common
+import yaml_loader
+
+# Patterns of the job ID in the output of the submit command: the usual message of sbatch and the output of "sbatch --parsable" (job ID, possibly followed by the name of the cluster)
+
+JOB_ID_PATTERNS = [re.compile(r'Submitted\s+batch\s+job\s+(?P<job_id>\d+)'), re.compile(r'^\s*(?P<job_id>\d+)(;\S+)?\s*$', re.MULTILINE)]
+
+# The job registry contains a single table, with one line per submitted job. A job is identified by its job ID and by the cluster it has been submitted to, since the job IDs are only unique on a given cluster.
+
+TABLE = "jobs"
+KEY = ["Cluster", "Job ID"]
+COLUMNS = KEY + ["Launcher", "Molecule", "Profile", "Transition", "Config", "Scale", "Job directory", "Script", "Submitted", "Status"]
+
+# Columns used to filter the jobs, an index is created for each of them to speed up the queries
+
+INDEXED_COLUMNS = ["Molecule", "Profile", "Status"]
+
+# Name of the backlog file of the submission governor (see the Governor class), created in the output directory of the launchers
+
+BACKLOG_FILENAME = ".submit_backlog.json"
+
+# Default command used by the submission governor to take a snapshot of the queue, printing the partition(s) of each job of the user on its own line
+
+QUEUE_COMMAND = "squeue --noheader --user={user} --format=%P"
+
+# Default number of seconds during which a snapshot of the queue is reused by the successive executions sharing the same backlog file (e.g. when a crontab script calls a launcher for each file)
+
+SNAPSHOT_TTL = 60
+
+# =================================================================== #
+# =================================================================== #
+#                        EXCEPTIONS DEFINITIONS                       #
+# =================================================================== #
+# =================================================================== #
+
+class SubmissionError(Exception):
+    """Exception raised when a job could not be submitted to the job scheduler.
+
+    Attributes
+    ----------
+    message : str
+        Description of the problem.
+    returncode : int
+        Exit code of the submit command (None if it could not be executed at all).
+    output : str
+        What the submit command has printed (standard output and error).
+    """
+
+    def __init__(self, message:str, returncode:int=None, output:str=""):
+        super().__init__(message)
+        self.message = message
+        self.returncode = returncode
+        self.output = output
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def parse_job_id(output:str):
+    """Returns the job ID given by the job scheduler in the output of the submit command, or None if there is none (e.g. if the submit command is not sbatch)."""
+
+    for pattern in JOB_ID_PATTERNS:
+      match = pattern.search(output)
+      if match:
+        return match.group('job_id')
+
+    return None
+
+#######################################################################
+
+def submit(submit_command:str, script:str, job_dir:str, delay_command:str=""):
+    """Submits a job script to the job scheduler. The submit command is executed directly (without any shell) from the job directory, so that the current working directory of the launcher is left untouched.
+
+    Parameters
+    ----------
+    submit_command : str
+        Command used to submit the jobs on this cluster (e.g. "sbatch"), as defined in the YAML clusters configuration file.
+    script : str
+        Name of the job script, in the job directory.
+    job_dir : str
+        Path towards the job directory, from which the job will be submitted.
+    delay_command : str, optional
+        Additional arguments given to the submit command to delay the start of the job (e.g. "--begin=now+60").
+
+    Returns
+    -------
+    job_id : str
+        The job ID given by the job scheduler, or None if it could not be found in the output of the submit command.
+    output : str
+        What the submit command has printed (standard output and error).
+
+    Raises
+    ------
+    SubmissionError
+        If the submit command could not be executed or if it has exited with a non-zero code.
+    """
+
+    command = shlex.split(submit_command) + shlex.split(delay_command or "") + [script]
+
+    try:
+      process = subprocess.run(command, cwd=job_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    except OSError as error:
+      raise SubmissionError ("ERROR: Unable to execute the submit command '%s': %s" % (" ".join(command), error))
+
+    if process.returncode != 0:
+      raise SubmissionError ("ERROR: The submit command '%s' has exited with code %s." % (" ".join(command), process.returncode), process.returncode, process.stdout)
+
+    return parse_job_id(process.stdout), process.stdout
+
+#######################################################################
+
+def connect(db_path:str, timeout:float=120.0) -> sqlite3.Connection:
+    """Opens the job registry (and creates it if it does not exist yet).
+
+    Parameters
+    ----------
+    db_path : str
+        Path towards the SQLite database file.
+    timeout : float, optional
+        How many seconds to wait for the other processes writing in the registry to release their lock, by default 120.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        Connection to the registry, in autocommit mode (the changes are grouped with the transaction function).
+    """
+
+    connection = sqlite_common.connect(db_path, timeout)
+
+    with sqlite_common.transaction(connection):
+      connection.execute("CREATE TABLE IF NOT EXISTS %s (%s, UNIQUE (%s))" % (TABLE, ", ".join("%s TEXT" % sqlite_common.quote(column) for column in COLUMNS), ", ".join(sqlite_common.quote(column) for column in KEY)))
+      for column in INDEXED_COLUMNS:
+        connection.execute("CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (sqlite_common.quote("idx_" + column), TABLE, sqlite_common.quote(column)))
+
+    return connection
+
+#######################################################################
+
+def record(connection:sqlite3.Connection, job:dict, status:str="submitted"):
+    """Records a submitted job in the registry. A job that is already present (same cluster and job ID, e.g. when the job IDs of the scheduler have been reset) is replaced.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the registry, as returned by the connect function.
+    job : dict
+        Dictionary associating the name of some columns (see COLUMNS) with their value for this job. The "Cluster" and "Job ID" columns are mandatory.
+    status : str, optional
+        Status of the job, by default "submitted".
+    """
+
+    values = {column: (None if job.get(column) is None else str(job[column])) for column in COLUMNS}
+    values["Status"] = status
+    if values["Submitted"] is None:
+      values["Submitted"] = datetime.datetime.now().isoformat(timespec='seconds')
+
+    with sqlite_common.transaction(connection):
+      connection.execute("INSERT OR REPLACE INTO %s (%s) VALUES (%s)" % (TABLE, ", ".join(sqlite_common.quote(column) for column in COLUMNS), ", ".join("?" for column in COLUMNS)), [values[column] for column in COLUMNS])
+
+#######################################################################
+
+def set_status(connection:sqlite3.Connection, cluster:str, job_ids:list, status:str):
+    """Changes the status of some jobs of the registry (e.g. to "done" or "failed", once they have been monitored). Returns the number of updated jobs."""
+
+    job_ids = [str(job_id) for job_id in job_ids]
+    updated = 0
+
+    # Update the job IDs by chunks, since the number of parameters of an SQL statement is limited
+
+    with sqlite_common.transaction(connection):
+      for start in range(0, len(job_ids), 500):
+        chunk = job_ids[start:start+500]
+        cursor = connection.execute("UPDATE %s SET %s = ? WHERE %s = ? AND %s IN (%s)" % (TABLE, sqlite_common.quote("Status"), sqlite_common.quote("Cluster"), sqlite_common.quote("Job ID"), ", ".join("?" for job_id in chunk)), [status, cluster] + chunk)
+        updated += cursor.rowcount
+
+    return updated
+
+#######################################################################
+
+def query(connection:sqlite3.Connection, filters:dict=None) -> list:
+    """Fetches the jobs matching some criteria from the registry.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the registry, as returned by the connect function.
+    filters : dict, optional
+        Dictionary associating the name of some columns with the value they must have (e.g. {"Profile": "aldu_param", "Status": "submitted"}).
+
+    Returns
+    -------
+    jobs : list
+        The matching jobs, in the order in which they were submitted, each of them being a dictionary associating the name of the columns with their value.
+    """
+
+    clause, params = sqlite_common.where(filters)
+
+    return [dict(row) for row in connection.execute("SELECT * FROM %s%s ORDER BY rowid" % (TABLE, clause), params)]
+
+#######################################################################
+
+def count(connection:sqlite3.Connection, filters:dict=None) -> int:
+    """Returns the number of jobs matching some criteria in the registry (see the query function for the meaning of the filters)."""
+
+    clause, params = sqlite_common.where(filters)
+
+    return connection.execute("SELECT COUNT(*) FROM %s%s" % (TABLE, clause), params).fetchone()[0]
+
+# =================================================================== #
+# =================================================================== #
+#                          CLASS DEFINITION                           #
+# =================================================================== #
+# =================================================================== #
+
+class Governor:
+    """Submission governor, which keeps the number of jobs in the queue under the limits defined for the cluster in the YAML clusters configuration file. The queue is only queried once per execution (the snapshot being shared for a short time by the successive executions using the same backlog file), then the jobs submitted by the launcher are counted locally. The jobs that would exceed the limits are added to a backlog file instead of being submitted, and are submitted by a later execution, once the limits allow it (see the drain method).
+
+    The limits are given by the "submit_limits" key of the cluster, e.g.
+
+        submit_limits:
+          max_jobs: 250            # Maximum number of jobs in the queue, all partitions included
+          partitions:              # Maximum number of jobs in the queue for some partitions
+            batch: 200
+          queue_command: value     # Optional, see QUEUE_COMMAND
+          snapshot_ttl: value      # Optional, see SNAPSHOT_TTL
+
+    Attributes
+    ----------
+    backlog_path : str
+        Path towards the backlog file, which also contains the last snapshot of the queue.
+    max_jobs : int
+        Maximum number of jobs in the queue, all partitions included (None if there is no such limit).
+    partitions : dict
+        Dictionary associating some partitions with the maximum number of jobs in the queue for that partition.
+    counts : dict
+        Dictionary associating each partition with the number of jobs in the queue ("" for all partitions included), None until the snapshot of the queue has been taken.
+    """
+
+    def __init__(self, backlog_path:str, limits:dict):
+        """
+        Parameters
+        ----------
+        backlog_path : str
+            Path towards the backlog file, created if it does not exist yet.
+        limits : dict
+            Content of the "submit_limits" key of the cluster in the YAML clusters configuration file.
+        """
+
+        self.backlog_path = os.path.abspath(backlog_path)
+        self.max_jobs = limits.get("max_jobs")
+        self.partitions = limits.get("partitions") or {}
+        self.queue_command = limits.get("queue_command", QUEUE_COMMAND)
+        self.snapshot_ttl = limits.get("snapshot_ttl", SNAPSHOT_TTL)
+        self.counts = None
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Loads the content of the backlog file inside a with statement, and writes it back at the end of the statement. The backlog file is locked in the meantime, so that the executions sharing it do not overwrite the changes of each other."""
+
+        with open(self.backlog_path + ".lock", 'a') as f_lock:
+
+          fcntl.flock(f_lock, fcntl.LOCK_EX)
+
+          try:
+            with open(self.backlog_path, 'r', encoding='utf-8') as f_backlog:
+              state = json.load(f_backlog)
+          except FileNotFoundError:
+            state = {"snapshot": None, "backlog": []}
+          except ValueError as error:
+            raise SubmissionError ("ERROR: Unable to read the backlog file %s: %s" % (self.backlog_path, error))
+
+          yield state
+
+          # Write the file under a temporary name before renaming it, so that it is never left half-written
+
+          tmp_file = "%s.%s.tmp" % (self.backlog_path, os.getpid())
+
+          with open(tmp_file, 'w', encoding='utf-8') as f_backlog:
+            json.dump(state, f_backlog, indent=1)
+
+          os.replace(tmp_file, self.backlog_path)
+
+    def snapshot(self) -> dict:
+        """Returns the number of jobs in the queue for each partition. The queue is queried the first time only, unless another execution has taken a snapshot of it less than snapshot_ttl seconds ago."""
+
+        if self.counts is not None:
+          return self.counts
+
+        with self._state() as state:
+
+          snapshot = state.get("snapshot")
+
+          if snapshot and 0 <= time.time() - snapshot["time"] < self.snapshot_ttl:
+            self.counts = snapshot["counts"]
+
+          else:
+
+            command = shlex.split(self.queue_command.format(user=getpass.getuser()))
+
+            try:
+              process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            except OSError as error:
+              raise SubmissionError ("ERROR: Unable to execute the queue command '%s': %s" % (" ".join(command), error))
+
+            if process.returncode != 0:
+              raise SubmissionError ("ERROR: The queue command '%s' has exited with code %s." % (" ".join(command), process.returncode), process.returncode, process.stderr)
+
+            # A pending job can be submitted to several partitions (e.g. "batch,debug"), it then counts for each of them
+
+            self.counts = {"": 0}
+
+            for line in process.stdout.splitlines():
+              if not line.strip():
+                continue
+              self.counts[""] += 1
+              for partition in line.strip().split(","):
+                self.counts[partition] = self.counts.get(partition, 0) + 1
+
+            state["snapshot"] = {"time": time.time(), "counts": self.counts}
+
+        return self.counts
+
+    def allows(self, partition:str=None) -> bool:
+        """Returns whether one more job can be submitted to the given partition (None if the job does not specify any partition) without exceeding the limits."""
+
+        counts = self.snapshot()
+
+        if self.max_jobs is not None and counts[""] >= self.max_jobs:
+          return False
+
+        if partition in self.partitions and counts.get(partition, 0) >= self.partitions[partition]:
+          return False
+
+        return True
+
+    def count(self, partition:str=None):
+        """Counts a job that has just been submitted to the given partition, both locally and in the snapshot of the backlog file (so that the executions sharing the snapshot also count it)."""
+
+        self.snapshot()
+
+        with self._state() as state:
+
+          for counts in [self.counts, state["snapshot"]["counts"]]:
+            counts[""] += 1
+            if partition:
+              counts[partition] = counts.get(partition, 0) + 1
+
+    def defer(self, entry:dict):
+        """Adds a job to the backlog, replacing the job of the backlog with the same job directory if there is one.
+
+        Parameters
+        ----------
+        entry : dict
+            Information needed to submit the job later: the "job_dir", "script", "delay_command" and "partition" keys, as well as the optional "log_file" (log file of the job, where its submission will be noted), "registry" (path towards the job registry where the job will be recorded) and "job" (columns of the job registry for this job) keys.
+        """
+
+        entry = dict(entry, deferred=datetime.datetime.now().isoformat(timespec='seconds'))
+
+        with self._state() as state:
+          state["backlog"] = [job for job in state["backlog"] if job["job_dir"] != entry["job_dir"]] + [entry]
+
+    def backlog(self) -> list:
+        """Returns the jobs of the backlog, in the order in which they have been deferred."""
+
+        if not os.path.isfile(self.backlog_path):
+          return []
+
+        with self._state() as state:
+          return list(state["backlog"])
+
+    def drain(self, submit_command:str):
+        """Submits the jobs of the backlog, in the order in which they have been deferred, as long as the limits allow it. The jobs whose directory does not exist anymore are removed from the backlog without being submitted. The jobs that would exceed the limits (e.g. those of a full partition) are skipped and stay in the backlog, while the following ones are still considered. Draining stops at the first job whose submission fails, which stays in the backlog along with all the following ones. Only one execution can drain a backlog at a time: if another one is already draining it, nothing is done (so that the same jobs are not submitted twice).
+
+        Parameters
+        ----------
+        submit_command : str
+            Command used to submit the jobs on this cluster (e.g. "sbatch"), as defined in the YAML clusters configuration file.
+
+        Returns
+        -------
+        submitted : list
+            The jobs of the backlog that have been submitted, each of them being its backlog entry with the additional "job_id" key.
+        error : SubmissionError
+            The submission error that stopped the draining, or None if there was none.
+        """
+
+        submitted = []
+        removed = []
+        error = None
+
+        # The backlog file itself is only locked while it is read or written (see the _state method), so that the other executions can still defer their jobs while this one is submitting. A second lock is thus held during the whole draining.
+
+        with open(self.backlog_path + ".drain.lock", 'a') as f_lock:
+
+          try:
+            fcntl.flock(f_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+          except BlockingIOError:
+            return submitted, error
+
+          for entry in self.backlog():
+
+            if not os.path.isdir(entry["job_dir"]):
+              removed.append(entry["job_dir"])
+              continue
+
+            if not self.allows(entry["partition"]):
+              continue
+
+            try:
+              job_id, output = submit(submit_command, entry["script"], entry["job_dir"], entry["delay_command"])
+            except SubmissionError as submit_error:
+              error = submit_error
+              break
+
+            self.count(entry["partition"])
+            removed.append(entry["job_dir"])
+            submitted.append(dict(entry, job_id=job_id))
+
+            # Note the submission in the log file of the job and record the job in the job registry
+
+            if entry.get("log_file"):
+              with open(entry["log_file"], 'a', encoding='utf-8') as f_log:
+                f_log.write("\nJob submitted from the backlog on %s, job ID: %s\n" % (datetime.datetime.now().isoformat(timespec='seconds'), job_id or "unknown (%s)" % output.strip()))
+
+            if entry.get("registry") and job_id:
+              connection = connect(entry["registry"])
+              record(connection, dict(entry.get("job") or {}, **{"Job ID": job_id}))
+              connection.close()
+
+          if removed:
+            with self._state() as state:
+              state["backlog"] = [job for job in state["backlog"] if job["job_dir"] not in removed]
+
+        return submitted, error
+
+# =================================================================== #
+# =================================================================== #
+#                        Command line arguments                       #
+# =================================================================== #
+# =================================================================== #
+
+# Executing this script allows to consult the job registry, for example to list the jobs of a particular molecule that are still running, or to drain a backlog of the submission governor (e.g. from a crontab script, when there is no new file for the launcher)
+
+parser = argparse.ArgumentParser(add_help=False, description="Lists the jobs of the job registry filled by ABIN LAUNCHER and CONTROL LAUNCHER in the CSV format, possibly filtered by cluster, molecule, profile or status, and changes the status of some of them. Alternatively, submits the jobs of a backlog file of the submission governor, as long as the submission limits of the cluster allow it.")
+
+required = parser.add_argument_group('Required arguments')
+action_group = required.add_mutually_exclusive_group(required=True)
+action_group.add_argument("-db", "--database", type=str, help="Path towards the SQLite database file of the job registry.")
+action_group.add_argument("-dr", "--drain", type=str, help="Path towards a backlog file of the submission governor (%s, in the output directory of the launcher), whose jobs will be submitted as long as the limits of the cluster given by the --cluster argument allow it." % BACKLOG_FILENAME)
+
+optional = parser.add_argument_group('Optional arguments')
+optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument("--cluster", type=str, help="Only list the jobs submitted to this cluster. With the -dr / --drain argument, name of the cluster where this script is running, as defined in the YAML clusters configuration file.")
+optional.add_argument("--clusters_file", type=str, help="With the -dr / --drain argument, path towards the YAML clusters configuration file of the launcher that created the backlog. By default, the one of CONTROL LAUNCHER (placed next to this script) is used.")
+optional.add_argument("--molecule", type=str, help="Only list the jobs of this molecule.")
+optional.add_argument("--profile", type=str, help="Only list the jobs of this profile.")
+optional.add_argument("--status", type=str, help="Only list the jobs with this status (e.g. 'submitted').")
+optional.add_argument("--set_status", type=str, nargs='+', metavar=('STATUS', 'JOB_ID'), help="Change the status of the given job IDs (the --cluster argument is then mandatory), e.g. --set_status done 1234 1235.")
+
+# =================================================================== #
+# =================================================================== #
+#                            MAIN FUNCTION                            #
+# =================================================================== #
+# =================================================================== #
+
+def main():
+
+  args = parser.parse_args()
+
+  # Drain a backlog of the submission governor, with the submit command and the limits of the cluster given in the YAML clusters configuration file (by default, the one placed next to this script)
+
+  if args.drain:
+
+    code_dir = os.path.dirname(os.path.realpath(os.path.abspath(__file__)))
+    clusters_file = args.clusters_file or os.path.join(code_dir,"clusters.yml")
+    cluster_cfg = yaml_loader.load(clusters_file).get(args.cluster) if args.cluster else None
+
+    if not cluster_cfg or not cluster_cfg.get("submit_command"):
+      print("ERROR: The --cluster argument must be the name of a cluster with a submit_command in the clusters configuration file (%s)." % clusters_file)
+      exit(-1)
+
+    governor = Governor(args.drain, cluster_cfg.get("submit_limits") or {})
+
+    try:
+      submitted, error = governor.drain(cluster_cfg["submit_command"])
+    except SubmissionError as error:
+      print(error)
+      exit(-1)
+
+    for entry in submitted:
+      print("%s submitted from the backlog (job ID: %s)" % (entry["job_dir"], entry["job_id"] or "unknown"))
+
+    if error:
+      print(error)
+      print(error.output.strip())
+
+    print("%s job(s) submitted, %s job(s) left in the backlog" % (len(submitted), len(governor.backlog())))
+
+    if error:
+      exit(5)
+
+    return
+
+  if not os.path.isfile(args.database):
+    print("ERROR: There is no job registry at %s" % args.database)
+    exit(-1)
+
+  connection = connect(args.database)
+
+  if args.set_status:
+    if not args.cluster or len(args.set_status) < 2:
+      print("ERROR: The --set_status argument needs a status and at least one job ID, as well as the --cluster argument.")
+      exit(-1)
+    updated = set_status(connection, args.cluster, args.set_status[1:], args.set_status[0])
+    print("%s job(s) of the %s cluster set to '%s'" % (updated, args.cluster, args.set_status[0]))
+
+  else:
+    filters = {column: value for column, value in [("Cluster", args.cluster), ("Molecule", args.molecule), ("Profile", args.profile), ("Status", args.status)] if value is not None}
+    csv_writer = csv.DictWriter(sys.stdout, fieldnames=COLUMNS, delimiter=';', quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
+    csv_writer.writeheader()
+    for job in query(connection, filters):
+      csv_writer.writerow({column: ("" if value is None else value) for column, value in job.items()})
+
+  connection.close()
+
+# If this script is executed through the command line, call the main function (see https://realpython.com/python-main-function/ for details)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,139 @@
+################################################################################################################################################
+##                                                                 Matrix I/O                                                                 ##
+##                                                                                                                                            ##
+##This script contains the functions used by CONTROL LAUNCHER to write the matrices of the data files (density matrices, transition dipole moments,##
+##       conversion matrix, etc.), formatting whole matrices at once, either as text (possibly in a compact form) or in a binary format       ##
+################################################################################################################################################
+
+import io
+
+import numpy as np
+
+# Formats in which the matrices can be written:
+#   - "text": one line per row, as expected by QOCT-GRAD (this is the default)
+#   - "compact": same as "text", except that an identity matrix is only written as the line "identity <size>" and a diagonal matrix as the line "diagonal <size>" followed by one line per diagonal value
+#   - "npy": the NumPy binary format (see https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html)
+#   - "fortran": a Fortran unformatted sequential file, containing the whole matrix (in column-major order) in a single record
+# Only the "text" format can be read by the standard versions of QOCT-GRAD, the other ones are meant for the builds that support them.
+
+FORMATS = ["text", "compact", "npy", "fortran"]
+
+# Format of each value, for the complex matrices (the real and imaginary parts of each value) and for the real matrices
+
+COMPLEX_FORMAT = "( %.10e , %.10e ) "
+REAL_FORMAT = "% 18.10e"
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _text_lines(mtx:np.ndarray) -> list:
+    """Formats a 2D array into text lines (without their newline character), one per row. All the values of a row are formatted in a single operation, with a format string repeated for each column."""
+
+    if np.iscomplexobj(mtx):
+
+      # Viewing the complex values as pairs of floats gives the real and imaginary parts of each row side by side
+
+      pairs = np.ascontiguousarray(mtx, dtype=np.complex128).view(np.float64)
+      line_format = COMPLEX_FORMAT * mtx.shape[1]
+      return [line_format % tuple(row) for row in pairs.tolist()]
+
+    line_format = " ".join([REAL_FORMAT] * mtx.shape[1])
+    return [line_format % tuple(row) for row in np.asarray(mtx, dtype=np.float64).tolist()]
+
+#######################################################################
+
+def _compact_lines(mtx:np.ndarray):
+    """Returns the lines of the compact form of a matrix, or None if the matrix is neither an identity matrix nor a diagonal matrix."""
+
+    size = mtx.shape[0]
+
+    if mtx.shape != (size, size):
+      return None
+
+    diagonal = np.diagonal(mtx)
+
+    if np.count_nonzero(mtx) != np.count_nonzero(diagonal):
+      return None
+
+    if np.all(diagonal == 1):
+      return ["identity %s" % size]
+
+    return ["diagonal %s" % size] + _text_lines(diagonal.reshape(size, 1))
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def dumps(mtx, matrix_format:str="text"):
+    """Returns the content of the file of a matrix, in the given format.
+
+    Parameters
+    ----------
+    mtx : np.ndarray or list
+        The 2D matrix (real or complex).
+    matrix_format : str, optional
+        One of the FORMATS defined above, by default "text".
+
+    Returns
+    -------
+    content : str or bytes
+        The content of the file, as a string for the text formats and as bytes for the binary formats.
+
+    Raises
+    ------
+    ValueError
+        If the format is not one of the FORMATS.
+    """
+
+    mtx = np.asarray(mtx)
+
+    if np.iscomplexobj(mtx):
+      mtx = mtx.astype(np.complex128, copy=False)
+    else:
+      mtx = mtx.astype(np.float64, copy=False)
+
+    if matrix_format in ["text", "compact"]:
+      lines = (_compact_lines(mtx) if matrix_format == "compact" else None) or _text_lines(mtx)
+      return "\n".join(lines) + "\n"
+
+    elif matrix_format == "npy":
+      with io.BytesIO() as buffer:
+        np.save(buffer, mtx, allow_pickle=False)
+        return buffer.getvalue()
+
+    elif matrix_format == "fortran":
+      record = np.asfortranarray(mtx).tobytes(order='F')
+      marker = np.array([len(record)], dtype=np.int32).tobytes()
+      return marker + record + marker
+
+    raise ValueError ("The format in which the matrix should be written (%s) is not one of %s" % (matrix_format, ", ".join(FORMATS)))
+
+#######################################################################
+
+def write(path:str, mtx, matrix_format:str="text"):
+    """Writes a matrix in a file, in the given format (see the dumps function for details)."""
+
+    content = dumps(mtx, matrix_format)
+
+    if isinstance(content, bytes):
+      with open(path, "wb") as f:
+        f.write(content)
+    else:
+      with open(path, "w") as f:
+        f.write(content)
+
+#######################################################################
+
+def write_identity(path:str, size:int, matrix_format:str="text"):
+    """Writes an identity matrix in a file, in the given format (see the dumps function for details). In the compact format, the matrix itself is not even built."""
+
+    if matrix_format == "compact":
+      with open(path, "w") as f:
+        f.write("identity %s\n" % size)
+    else:
+      write(path, np.identity(size), matrix_format)
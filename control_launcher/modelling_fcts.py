@@ -12,6 +12,59 @@ import numpy as np
 from scipy import constants, linalg
 
 import control_common
+import job_logging
+
+# =================================================================== #
+# =================================================================== #
+#                        Block Matrices Reader                        #
+# =================================================================== #
+# =================================================================== #
+
+def _read_block_matrix(blocks:list, size:int):
+    """Builds a square matrix from its column-blocked printout, as found in the output files of ORCA: each block starts with a line listing the numbers of its columns (e.g. "0   1   2   3   4   5"), followed by one line per row, starting with the number of that row. All the values of a block are converted at once, then placed at their rows and columns in the matrix.
+
+    Parameters
+    ----------
+    blocks : list
+        List of the blocks of the matrix, each of them being a tuple containing its columns line and the list of its rows lines.
+    size : int
+        Number of rows and columns of the matrix.
+
+    Returns
+    -------
+    matrix : np.ndarray
+        The rebuilt matrix (the values absent from the printout are zeros).
+    nb_values : int
+        Number of values that have been read.
+
+    Raises
+    ------
+    ControlError
+        If the rows of a block do not have one value per column of the block.
+    """
+
+    matrix = np.zeros((size, size), dtype=float)
+    nb_values = 0
+
+    for columns_line, rows_lines in blocks:
+
+      if not rows_lines:
+        continue
+
+      columns = np.array(columns_line.split(), dtype=int)
+      values = np.array(" ".join(rows_lines).split(), dtype=float)
+
+      # Each row line contains the number of the row followed by one value per column
+
+      if values.size != len(rows_lines) * (len(columns) + 1):
+        raise control_common.ControlError ("ERROR: The rows of the block of columns %s-%s of a matrix do not all contain %s values" % (columns[0], columns[-1], len(columns)))
+
+      values = values.reshape(len(rows_lines), len(columns) + 1)
+
+      matrix[np.ix_(values[:,0].astype(int), columns)] = values[:,1:]
+      nb_values += values[:,1:].size
+
+    return matrix, nb_values
 
 # =================================================================== #
 # =================================================================== #
@@ -409,9 +462,7 @@ def orca_tddft(source_content:list):
     section_found = False
     real_section_found = False
     im_section_found = False
-    nb_values = 0
-    mime_real = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])), dtype=float)
-    mime_imag = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])), dtype=float)
+    blocks = {'real': [], 'imag': []} # The lines of each column block of the real and imaginary parts of the matrix, see the _read_block_matrix function
     
     # Define the expression patterns for the lines containing information about the SOC
     
@@ -440,7 +491,7 @@ def orca_tddft(source_content:list):
 
     }
 
-    # Parse the source file to get the information and build the SOC list
+    # Parse the source file to collect the lines of the column blocks of the matrix
 
     for line in source_content:
 
@@ -467,15 +518,12 @@ def orca_tddft(source_content:list):
         elif real_section_found:
           
           if matrix_rx['state_2_line'].match(line):
-            states_2 = [int(nb) for nb in line.split(" ") if nb != '']
+            blocks['real'].append((line, []))
 
           elif matrix_rx['matrix_line'].match(line):
-            line_list = [value for value in line.split(" ") if value != '']
-            state_1 = int(line_list.pop(0))
-            for idx, value in enumerate(line_list):
-              state_2 = states_2[idx]
-              mime_real[state_1][state_2] = value
-              nb_values += 1
+            if not blocks['real']:
+              raise control_common.ControlError ("ERROR: A line of the real part of the full SOC matrix has been found before the numbers of its columns")
+            blocks['real'][-1][1].append(line)
             
         # Fetch the imaginary part of the SOC matrix
   
@@ -489,21 +537,24 @@ def orca_tddft(source_content:list):
         elif im_section_found:
 
           if matrix_rx['state_2_line'].match(line):
-            states_2 = [int(nb) for nb in line.split(" ") if nb != '']
+            blocks['imag'].append((line, []))
 
           elif matrix_rx['matrix_line'].match(line):
-            line_list = [value for value in line.split(" ") if value != '']
-            state_1 = int(line_list.pop(0))
-            for idx, value in enumerate(line_list):
-              state_2 = states_2[idx]
-              mime_imag[state_1][state_2] = value
-              nb_values += 1
+            if not blocks['imag']:
+              raise control_common.ControlError ("ERROR: A line of the imaginary part of the full SOC matrix has been found before the numbers of its columns")
+            blocks['imag'][-1][1].append(line)
         
     # Raise an exception if the section has not been found
 
     if not section_found:
       raise control_common.ControlError ("ERROR: Unable to find the full SOC matrix in the source file")
 
+    # Rebuild the real and imaginary parts of the matrix from their column blocks
+
+    mime_real, nb_real_values = _read_block_matrix(blocks['real'], len(system['zero_states_list']))
+    mime_imag, nb_imag_values = _read_block_matrix(blocks['imag'], len(system['zero_states_list']))
+    nb_values = nb_real_values + nb_imag_values
+
     # Raise an exception if not all the values have been found
 
     nb_soc = ((nb_roots * 4) + 1) ** 2
@@ -524,32 +575,27 @@ def orca_tddft(source_content:list):
 
     print("{:<50}".format("\nEstablishing the spin-orbit couplings list ..."), end="")
 
-    # Initialization of the variables
+    # Get the label of each state, in the order of their numbers (i.e. of the rows and columns of the MIME)
 
-    soc_list = []
-    
-    # Iterate over the MIME to get the information and build the SOC list
+    labels = [None] * len(system['zero_states_list'])
+    for state in system['zero_states_list']:
+      labels[state['number']] = state['label']
 
-    it = np.nditer(system['mime'], flags=['multi_index'])
-  
-    for soc in it:
+    singlets = np.char.startswith(np.array(labels), 'S')
 
-      state_1 = it.multi_index[0]
-      label_1 = [state['label'] for state in system['zero_states_list'] if state_1 == state['number']][0]
-      state_2 = it.multi_index[1]
-      label_2 = [state['label'] for state in system['zero_states_list'] if state_2 == state['number']][0]
-      value = complex(soc)
+    # Skip diagonal values and singlet-singlet values
 
-      # Skip diagonal values and singlet-singlet values
-      if state_1 == state_2 or (label_1.startswith('S') and label_2.startswith('S')):
-        continue
+    kept = ~np.eye(len(labels), dtype=bool) & ~np.outer(singlets, singlets)
+
+    # Skip the values below the diagonal that are the conjugate of their equivalent above the diagonal (those couplings are already in the list)
+
+    kept &= ~(np.tril(system['mime'].T == system['mime'].conj(), k=-1))
+
+    # Build the SOC list, in the same order as the MIME values (row by row)
+
+    states_1, states_2 = np.nonzero(kept)
+    soc_list = [(state_1, labels[state_1], state_2, labels[state_2], value) for state_1, state_2, value in zip(states_1.tolist(), states_2.tolist(), system['mime'][states_1, states_2].tolist())]
 
-      # Add the information to the soc_list
-      soc_line = (state_1, label_1, state_2, label_2, value)
-      eq_soc_line = (state_2, label_2, state_1, label_1, value.conjugate())
-      if eq_soc_line not in soc_list:
-        soc_list.append(soc_line)
-  
     print("[ DONE ]")
   
     """
@@ -907,13 +953,17 @@ def orca_tddft(source_content:list):
 # =================================================================== #
 # =================================================================== #
 
-def qchem_tddft(source_content:list):
+def qchem_tddft(source_content:list, print_tables:bool=None, check_diag:bool=False):
     """Parses the content of a Q-CHEM SOC TD-DFT calculation output file, looking to build the non-relavistic MIME and the non-relavistic transition dipole moments matrices of the molecule. It then diagonalizes the MIME to build the eigenstates basis set (relativistic states) and convert the dipole moments matrices into this new basis set.
 
     Parameters
     ----------
     source_content : list
-        Content of the Q-CHEM output file. Each element of the list is a line of the file.
+        Content of the Q-CHEM output file. Each element of the list is a line of the file. Since the file is parsed in a single pass, any iterable of lines (such as a generator reading the file lazily) can also be used.
+    print_tables : bool, optional
+        Whether the tables of states, spin-orbit couplings and transition dipole moments are built and printed in the log file. Set it to False when the standard output is discarded anyway. By default, this depends on whether the detailed tables are enabled for the log files (see job_logging.show_tables).
+    check_diag : bool, optional
+        Whether the quality of the diagonalization is evaluated (by converting the MIME to the eigenstates basis set and printing the ratio between its non-diagonal and diagonal elements), by default False.
     
     Returns
     -------
@@ -961,6 +1011,11 @@ def qchem_tddft(source_content:list):
 
     """
 
+    # Only build the tables if they will end up in the log file
+
+    if print_tables is None:
+      print_tables = job_logging.tables_enabled()
+
     # Initialize the system dictionary that will be returned by the function
 
     system = {}
@@ -983,13 +1038,11 @@ def qchem_tddft(source_content:list):
     print(''.center(len(section_title)+30, '='))
 
     # ========================================================= #
-    #                      Number of roots                      #
+    #                    Regular expressions                    #
     # ========================================================= #
 
-    nb_roots = False
-    old_nb_roots = False
-
     # Define the expression patterns for the lines containing information about the number of roots, that number will be used to check if all the needed values have been collected.
+    # The end of this section is marked by the start of the excited states section.
 
     nb_roots_rx = {
 
@@ -997,277 +1050,354 @@ def qchem_tddft(source_content:list):
       'normal': re.compile(r'^\s*CIS_N_ROOTS\s*(?P<n_roots>\d+)\s*$'),
 
       # Pattern for finding lines looking like "NRoots was altered as:  4 --> 12"
-      'altered': re.compile(r'^\s*NRoots was altered as:\s*\d+\s*-->\s*(?P<new_n_roots>\d+)\s*$'),
+      'altered': re.compile(r'^\s*NRoots was altered as:\s*\d+\s*-->\s*(?P<new_n_roots>\d+)\s*$')
+
+    }
 
-      # Pattern for finding the "TDDFT/TDA Excitation Energies" line (which marks the end of the section)
-      'end': re.compile(r'TDDFT/TDA Excitation Energies')
+    # Define the expression patterns for the lines containing information about the states
+
+    states_rx = {
+
+      # Pattern for finding the "TDDFT/TDA Excitation Energies" line (which marks the start of the section)
+      'start': re.compile(r'TDDFT/TDA Excitation Energies'),
+
+      # Pattern for finding lines looking like 'Excited state   1: excitation energy (eV) =    4.6445'
+      'state_energy': re.compile(r'^\s*Excited state\s+(?P<state>\d+): excitation energy \(eV\) =\s+(?P<energy>[+]?\d*\.\d+|\d+)$'),
+
+      # Pattern for finding lines looking like '    Multiplicity: Triplet'
+      'state_mp': re.compile(r'^\s*Multiplicity: (?P<mp>\w+)$'),
+
+      # Pattern for finding the "SETman timing summary" line (which marks the end of the section)
+      'end': re.compile(r'SETman timing summary')
 
     }
-  
-    # Parse the source file to get the information
 
-    for line in source_content:
+    # Define the expression patterns for the lines containing information about the SOC
 
-      # Define when the section ends
+    soc_rx = {
 
-      if nb_roots_rx['end'].match(line): # The line matches the 'end' pattern
-        break  
+      # Pattern for finding the "SPIN-ORBIT COUPLING JOB BEGINS HERE" line (which marks the start of the section)
+      'start': re.compile(r'^\*+SPIN-ORBIT COUPLING JOB BEGINS HERE\*+$'),
 
-      # Get the normal number of roots
+      # Pattern for finding lines looking like 'SOC between the singlet ground state and excited triplet states (ms=0):'
+      'ground_to_triplets': re.compile(r'^\s*SOC between the singlet ground state and excited triplet states \(ms=-?\d\):$'),
 
-      elif nb_roots_rx['normal'].match(line):
-        nb_roots = int(nb_roots_rx['normal'].match(line).group('n_roots'))
+      # Pattern for finding lines looking like 'SOC between the S9 state and excited triplet states (ms=1):'
+      'singlet_to_triplets': re.compile(r'^\s*SOC between the (?P<state_1>[A-Z]\d+) state and excited triplet states \(ms=-?\d\):$'),
 
-      # Get the altered number of roots
+      # Pattern for finding lines looking like 'SOC between the T7 (ms=0) state and excited triplet states (ms=1):'
+      'triplet_to_triplets': re.compile(r'^\s*SOC between the (?P<state_1>[A-Z]\d+) \(ms=(?P<ms>-?\d)\) state and excited triplet states \(ms=-?\d\):$'),
 
-      elif nb_roots_rx['altered'].match(line):
-        old_nb_roots = nb_roots
-        nb_roots = int(nb_roots_rx['altered'].match(line).group('new_n_roots'))
+      # Pattern for finding lines looking like 'T5(ms=-1)     0.000000  + (0.002867i)    cm-1'
+      'soc_value': re.compile(r'^\s*(?P<state_2>[A-Z]\d+)\(ms=(?P<ms>-?\d)\)\s+(?P<real_value>-?\(?-?\d+\.?\d*\)?)\s+(?P<im_value>[\+-]\s+\(?-?\d+\.?\d*i\)?)\s+cm-1$'),
 
-    # Raise an exception if the number of roots has not been found
+      # Pattern for finding the "SOC CODE ENDS HERE" line (which marks the end of the section)
+      'end': re.compile(r'^\*+SOC CODE ENDS HERE\*+$')
 
-    if not nb_roots:
-      raise control_common.ControlError ("ERROR: Unable to find the number of roots in the source file")
+    }
 
-    print("{:<50} {:<10}".format("\nNumber of roots: ",nb_roots))
-    if old_nb_roots:
-      print("{:<50} {:<10}".format("\nInitial number of roots: ",old_nb_roots))
+    # Define the expression patterns for the lines containing information about the dipole moments
+
+    moment_rx = {
+
+      # Pattern for finding the "STATE-TO-STATE TRANSITION MOMENTS" line (which marks the start of the section)
+      'start': re.compile(r'^STATE-TO-STATE TRANSITION MOMENTS$'),
+
+      # Pattern for finding lines looking like '    1    2   0.001414  -0.001456   0.004860   1.240659E-10'
+      'moment': re.compile(r'^\s*(?P<state_1>\d+)\s+(?P<state_2>\d+)\s+(?P<mom_x>-?\d+\.\d+)\s+(?P<mom_y>-?\d+\.\d+)\s+(?P<mom_z>-?\d+\.\d+)\s+(?P<strength>\d|\d\.\d+|\d\.\d+E[-+]\d+)$'),
+
+      # Pattern for finding lines looking like '       8     0.072914   -0.448517    0.787269'
+      'elec_moment': re.compile(r'^\s*(?P<state>\d+)\s+(?P<mom_x>-?\d+\.\d+)\s+(?P<mom_y>-?\d+\.\d+)\s+(?P<mom_z>-?\d+\.\d+)$'),
+
+      # Pattern for finding the "END OF TRANSITION MOMENT CALCULATION" line (which marks the end of the section)
+      'end': re.compile(r'^END OF TRANSITION MOMENT CALCULATION$')
+
+    }
 
     # ========================================================= #
-    #                        Zero states List                   #
+    #                  Parsing the source file                  #
     # ========================================================= #
 
-    print("{:<50}".format("\nParsing the excited states ...  "), end="")
+    # The source file is parsed in a single pass: each line is only compared to the patterns of the section it belongs to, and the lines are never stored.
+    # This means that source_content can be any iterable of lines (such as an open file object), not only a list.
+
+    print("{:<50}".format("\nParsing the source file ...  "), end="")
 
     # Initialization of the variables
 
-    section_found = False
+    section = "roots"           # Section of the source file being parsed, None if the line is outside of any known section
+    sections_found = []         # Sections whose starting line has been found (each section is only parsed once)
+
+    nb_roots = False
+    old_nb_roots = False
+
     cnt_state = 0
     cnt_triplet = 0
     cnt_singlet = 0
     state_number = 0
 
+    soc_raw_list = []           # SOC values whose state labels still need to be converted to state numbers
+    momdip_raw_list = []        # Dipole moments before the degenerated states are handled (the last element of each tuple tells if it is an electronic dipole moment)
+
     # Define the ground state of our molecule (which is the first state and has a zero energy)
-    
+
     system['zero_states_list'] = [{'number': 0, 'qchem_number': 0, 'label': 'S0', 'energy' : 0.0}]
 
-    # Define the expression patterns for the lines containing information about the states
+    for line in source_content:
 
-    states_rx = {
+      # Number of roots (everything that comes before the excited states)
+      # =================================================================
 
-      # Pattern for finding the "TDDFT/TDA Excitation Energies" line (which marks the start of the section)
-      'start': re.compile(r'TDDFT/TDA Excitation Energies'),
-      
-      # Pattern for finding lines looking like 'Excited state   1: excitation energy (eV) =    4.6445'
-      'state_energy': re.compile(r'^\s*Excited state\s+(?P<state>\d+): excitation energy \(eV\) =\s+(?P<energy>[+]?\d*\.\d+|\d+)$'),
+      if section == "roots":
 
-      # Pattern for finding lines looking like '    Multiplicity: Triplet'
-      'state_mp': re.compile(r'^\s*Multiplicity: (?P<mp>\w+)$'),
+        if states_rx['start'].match(line):
+          section = "states"
+          sections_found.append(section)
+          continue
 
-      # Pattern for finding the "SETman timing summary" line (which marks the end of the section)
-      'end': re.compile(r'SETman timing summary')
+        # Get the normal number of roots
 
-    }
+        matching_line = nb_roots_rx['normal'].match(line)
+        if matching_line:
+          nb_roots = int(matching_line.group('n_roots'))
+          continue
 
-    # Parse the source file to get the information and build the states list
+        # Get the altered number of roots
 
-    for line in source_content:
+        matching_line = nb_roots_rx['altered'].match(line)
+        if matching_line:
+          old_nb_roots = nb_roots
+          nb_roots = int(matching_line.group('new_n_roots'))
 
-      # Define when the section begins and ends
+      # Excited states
+      # ==============
 
-      if not section_found:
-        if states_rx['start'].match(line):
-          section_found = True
-    
-      elif section_found and states_rx['end'].match(line):
-        break
-        
-      # Get the state number and its associated excitation energy
+      elif section == "states":
 
-      elif states_rx['state_energy'].match(line):
+        if states_rx['end'].match(line):
+          section = None
+          continue
 
-        exc_state = int(states_rx['state_energy'].match(line).group("state"))
-        exc_energy = float(states_rx['state_energy'].match(line).group("energy"))
-        cnt_state += 1
-            
-      # Get the corresponding state multiplicity and add the data to the zero_states_list
+        # Get the state number and its associated excitation energy
 
-      elif states_rx['state_mp'].match(line):
+        matching_line = states_rx['state_energy'].match(line)
+        if matching_line:
+          exc_state = int(matching_line.group("state"))
+          exc_energy = float(matching_line.group("energy"))
+          cnt_state += 1
+          continue
 
-        multiplicity = states_rx['state_mp'].match(line).group("mp")
+        # Get the corresponding state multiplicity and add the data to the zero_states_list
 
-        # Check the multiplicity and increase the counter (cnt) for that multiplicity (needed for the state label)
+        matching_line = states_rx['state_mp'].match(line)
+        if matching_line:
 
-        cnt = -1
+          multiplicity = matching_line.group("mp")
 
-        if multiplicity == "Triplet":
-          first_letter = "T"
-          cnt_triplet += 1
-          cnt = cnt_triplet
+          # Check the multiplicity and increase the counter (cnt) for that multiplicity (needed for the state label)
 
-        elif multiplicity == "Singlet":
-          first_letter = "S"
-          cnt_singlet += 1
-          cnt = cnt_singlet
+          cnt = -1
 
-        else:
-          raise control_common.ControlError ("ERROR: Multiplicity of the %s%s state is of unknown value (%s)" % (exc_state, ("th" if not exc_state in special_numbers else special_numbers[exc_state]),multiplicity))
+          if multiplicity == "Triplet":
+            first_letter = "T"
+            cnt_triplet += 1
+            cnt = cnt_triplet
 
-        # Append information about the current state to the zero_states_list key
+          elif multiplicity == "Singlet":
+            first_letter = "S"
+            cnt_singlet += 1
+            cnt = cnt_singlet
 
-        if multiplicity == "Singlet":
-          state_number += 1
-          system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt)), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
+          else:
+            raise control_common.ControlError ("ERROR: Multiplicity of the %s%s state is of unknown value (%s)" % (exc_state, ("th" if not exc_state in special_numbers else special_numbers[exc_state]),multiplicity))
 
-        elif multiplicity == "Triplet":
+          # Append information about the current state to the zero_states_list key
 
-          # Add the substate ms=0
-          state_number += 1
-          system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt) + "(ms=0)"), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
-          # Add the substate ms=1
-          state_number += 1
-          system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt) + "(ms=1)"), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
-          # Add the substate ms=-1
-          state_number += 1
-          system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt) + "(ms=-1)"), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
-          
-    # Raise an exception if the section has not been found
+          if multiplicity == "Singlet":
+            state_number += 1
+            system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt)), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
 
-    if not section_found:
-      raise control_common.ControlError ("ERROR: Unable to find the 'TDDFT/TDA Excitation Energies' section in the source file")
+          elif multiplicity == "Triplet":
 
-    # Raise an exception if not all the values have been found
+            # Add the substate ms=0
+            state_number += 1
+            system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt) + "(ms=0)"), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
+            # Add the substate ms=1
+            state_number += 1
+            system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt) + "(ms=1)"), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
+            # Add the substate ms=-1
+            state_number += 1
+            system['zero_states_list'].append({'number': state_number, 'qchem_number': exc_state, 'label': (first_letter + str(cnt) + "(ms=-1)"), 'energy': control_common.energy_unit_conversion(exc_energy,"ev","cm-1")})
 
-    if cnt_state != 2*nb_roots:
-      raise control_common.ControlError ("ERROR: The modelling function could not find the right number of excited states in the source file (%s of the %s expected states have been found)" % (cnt_state,2*nb_roots))
-    if cnt_triplet != nb_roots:
-      raise control_common.ControlError ("ERROR: The modelling function could not find the right number of excited triplet states in the source file (%s of the %s expected triplet states have been found)" % (cnt_triplet,nb_roots))
-    if cnt_singlet != nb_roots:
-      raise control_common.ControlError ("ERROR: The modelling function could not find the right number of excited singlet states in the source file (%s of the %s expected singlet states have been found)" % (cnt_singlet,nb_roots))
+      # Spin-orbit couplings
+      # ====================
 
-    # Raise an exception if the state numbers are not consecutive and starting at 0
+      elif section == "soc":
 
-    control_common.is_consecutive(list(dict.fromkeys([state['qchem_number'] for state in system['zero_states_list']])),"Excited state numbers from the source file")
+        if soc_rx['end'].match(line):
+          section = None
+          continue
+
+        # Get the label of the first state
+
+        if soc_rx['ground_to_triplets'].match(line):
+          label_1 = "S0"
+          continue
+
+        matching_line = soc_rx['singlet_to_triplets'].match(line)
+        if matching_line:
+          label_1 = matching_line.group('state_1')
+          continue
+
+        matching_line = soc_rx['triplet_to_triplets'].match(line)
+        if matching_line:
+          label_1 = matching_line.group('state_1') + "(ms=%s)" % matching_line.group('ms')
+          continue
+
+        # Get the label of the second state and the corresponding SOC value (the labels will be converted to state numbers once the whole file has been parsed)
+
+        matching_line = soc_rx['soc_value'].match(line)
+        if matching_line:
+
+          label_2 = matching_line.group('state_2') + "(ms=%s)" % matching_line.group('ms')
+
+          # Get the complex value of the SOC
+
+          real_raw = re.sub(r'[\+\s]', '', matching_line.group('real_value'))
+
+          if real_raw.startswith('-(') and real_raw.endswith(')'):
+            real_raw = (real_raw.replace('-(','')).replace(')','')
+            real_value = -float(real_raw)
+          else:
+            real_raw = (real_raw.replace('(','')).replace(')','')
+            real_value = float(real_raw)
+
+          im_raw = re.sub(r'[i\+\s]', '', matching_line.group('im_value'))
+
+          if im_raw.startswith('-(') and im_raw.endswith(')'):
+            im_raw = (im_raw.replace('-(','')).replace(')','')
+            im_value = -float(im_raw)
+          else:
+            im_raw = (im_raw.replace('(','')).replace(')','')
+            im_value = float(im_raw)
+
+          soc_raw_list.append((label_1, label_2, complex(real_value,im_value)))
+
+      # Transition dipole moments
+      # =========================
+
+      elif section == "momdip":
+
+        if moment_rx['end'].match(line):
+          section = None
+          continue
+
+        # Extract the relevant information (the degenerated states will be handled once the whole file has been parsed)
+
+        matching_line = moment_rx['moment'].match(line)
+        if matching_line:
+          momdip_raw_list.append((int(matching_line.group('state_1')), int(matching_line.group('state_2')), float(matching_line.group('mom_x')), float(matching_line.group('mom_y')), float(matching_line.group('mom_z')), False))
+          continue
+
+        matching_line = moment_rx['elec_moment'].match(line)
+        if matching_line:
+          state = int(matching_line.group('state'))
+          momdip_raw_list.append((state, state, float(matching_line.group('mom_x')), float(matching_line.group('mom_y')), float(matching_line.group('mom_z')), True))
+
+      # Outside of any section, look for the start of the sections that have not been parsed yet
+      # ========================================================================================
+
+      elif "soc" not in sections_found and soc_rx['start'].match(line):
+        section = "soc"
+        sections_found.append(section)
+
+      elif "momdip" not in sections_found and moment_rx['start'].match(line):
+        section = "momdip"
+        sections_found.append(section)
 
     print("[ DONE ]")
-  
+
     # ========================================================= #
-    #                          SOC List                         #
+    #                      Number of roots                      #
     # ========================================================= #
 
-    print("{:<50}".format("\nParsing the spin-orbit couplings ...  "), end="")
+    # Raise an exception if the number of roots has not been found
 
-    # Initialization of the variables
+    if not nb_roots:
+      raise control_common.ControlError ("ERROR: Unable to find the number of roots in the source file")
 
-    section_found = False
-    soc_list = []
-    
-    # Define the expression patterns for the lines containing information about the SOC
-    
-    soc_rx = {
+    print("{:<50} {:<10}".format("\nNumber of roots: ",nb_roots))
+    if old_nb_roots:
+      print("{:<50} {:<10}".format("\nInitial number of roots: ",old_nb_roots))
 
-      # Pattern for finding the "SPIN-ORBIT COUPLING JOB BEGINS HERE" line (which marks the start of the section)
-      'start': re.compile(r'^\*+SPIN-ORBIT COUPLING JOB BEGINS HERE\*+$'),
+    # ========================================================= #
+    #                        Zero states List                   #
+    # ========================================================= #
 
-      # Pattern for finding lines looking like 'SOC between the singlet ground state and excited triplet states (ms=0):'
-      'ground_to_triplets': re.compile(r'^\s*SOC between the singlet ground state and excited triplet states \(ms=-?\d\):$'),
+    print("{:<50}".format("\nChecking the excited states ...  "), end="")
 
-      # Pattern for finding lines looking like 'SOC between the S9 state and excited triplet states (ms=1):'
-      'singlet_to_triplets': re.compile(r'^\s*SOC between the (?P<state_1>[A-Z]\d+) state and excited triplet states \(ms=-?\d\):$'),
+    # Raise an exception if the section has not been found
 
-      # Pattern for finding lines looking like 'SOC between the T7 (ms=0) state and excited triplet states (ms=1):'
-      'triplet_to_triplets': re.compile(r'^\s*SOC between the (?P<state_1>[A-Z]\d+) \(ms=(?P<ms>-?\d)\) state and excited triplet states \(ms=-?\d\):$'),      
+    if "states" not in sections_found:
+      raise control_common.ControlError ("ERROR: Unable to find the 'TDDFT/TDA Excitation Energies' section in the source file")
 
-      # Pattern for finding lines looking like 'T5(ms=-1)     0.000000  + (0.002867i)    cm-1'
-      'soc_value': re.compile(r'^\s*(?P<state_2>[A-Z]\d+)\(ms=(?P<ms>-?\d)\)\s+(?P<real_value>-?\(?-?\d+\.?\d*\)?)\s+(?P<im_value>[\+-]\s+\(?-?\d+\.?\d*i\)?)\s+cm-1$'),
+    # Raise an exception if not all the values have been found
 
-      # Pattern for finding the "SOC CODE ENDS HERE" line (which marks the end of the section)
-      'end': re.compile(r'^\*+SOC CODE ENDS HERE\*+$')
+    if cnt_state != 2*nb_roots:
+      raise control_common.ControlError ("ERROR: The modelling function could not find the right number of excited states in the source file (%s of the %s expected states have been found)" % (cnt_state,2*nb_roots))
+    if cnt_triplet != nb_roots:
+      raise control_common.ControlError ("ERROR: The modelling function could not find the right number of excited triplet states in the source file (%s of the %s expected triplet states have been found)" % (cnt_triplet,nb_roots))
+    if cnt_singlet != nb_roots:
+      raise control_common.ControlError ("ERROR: The modelling function could not find the right number of excited singlet states in the source file (%s of the %s expected singlet states have been found)" % (cnt_singlet,nb_roots))
 
-    }
+    # Raise an exception if the state numbers are not consecutive and starting at 0
 
-    # Parse the source file to get the information and build the SOC list
+    control_common.is_consecutive(list(dict.fromkeys([state['qchem_number'] for state in system['zero_states_list']])),"Excited state numbers from the source file")
 
-    for line in source_content:
+    # Build the dictionaries that will be used to locate the states by their label or by their Q-CHEM number (for triplets, there are three states for each 'qchem_number')
 
-      # Define when the section begins and ends
+    label_to_number = {}
+    qchem_to_numbers = {}
 
-      if not section_found:
-        if soc_rx['start'].match(line):
-          section_found = True
-    
-      elif section_found and soc_rx['end'].match(line):
-        break
+    for state in system['zero_states_list']:
+      label_to_number[state['label']] = state['number']
+      qchem_to_numbers.setdefault(state['qchem_number'], []).append(state['number'])
 
-      # Get the number and label of the first state
+    print("[ DONE ]")
 
-      elif soc_rx['ground_to_triplets'].match(line):
-        state_1 = 0
-        label_1 = "S0"
+    # ========================================================= #
+    #                          SOC List                         #
+    # ========================================================= #
 
-      elif soc_rx['singlet_to_triplets'].match(line):
+    print("{:<50}".format("\nBuilding the spin-orbit couplings list ...  "), end="")
 
-        label_1 = soc_rx['singlet_to_triplets'].match(line).group('state_1')
+    # Initialization of the variables
 
-      elif soc_rx['triplet_to_triplets'].match(line):
+    soc_list = []
 
-        label_1 = soc_rx['triplet_to_triplets'].match(line).group('state_1') + "(ms=%s)" % soc_rx['triplet_to_triplets'].match(line).group('ms')
-        
-      # Get the number and label of the second state and the corresponding SOC value, before adding the data to the soc_list
+    # Raise an exception if the section has not been found
 
-      elif soc_rx['soc_value'].match(line):
+    if "soc" not in sections_found:
+      raise control_common.ControlError ("ERROR: Unable to find the 'SPIN-ORBIT COUPLING' section in the source file")
 
-        label_2 = soc_rx['soc_value'].match(line).group('state_2') + "(ms=%s)" % soc_rx['soc_value'].match(line).group('ms')
+    # Build the SOC list
 
-        # Convert the labels to the state numbers
+    for label_1, label_2, value in soc_raw_list:
 
-        state_1 = -1
-        for state in system['zero_states_list']:
-          if label_1 == state['label']:
-            state_1 = state['number']
-            break
-        if state_1 == -1:
-          raise control_common.ControlError ("ERROR: Unknown excited state (%s) has been catched during the SOC parsing." % label_1)
+      # Convert the labels to the state numbers
 
-        state_2 = -1
-        for state in system['zero_states_list']:
-          if label_2 == state['label']:
-            state_2 = state['number']
-            break
-        if state_2 == -1:
-          raise control_common.ControlError ("ERROR: Unknown excited state (%s) has been catched during the SOC parsing." % label_2)
-          
-        # Get the complex value of the SOC
-        
-        real_raw = re.sub(r'[\+\s]', '', soc_rx['soc_value'].match(line).group('real_value'))
-        
-        if real_raw.startswith('-(') and real_raw.endswith(')'):
-          real_raw = (real_raw.replace('-(','')).replace(')','')
-          real_value = -float(real_raw)
-        else:
-          real_raw = (real_raw.replace('(','')).replace(')','')
-          real_value = float(real_raw)
-        
-        im_raw = re.sub(r'[i\+\s]', '', soc_rx['soc_value'].match(line).group('im_value'))
-        
-        if im_raw.startswith('-(') and im_raw.endswith(')'):
-          im_raw = (im_raw.replace('-(','')).replace(')','')
-          im_value = -float(im_raw)
-        else:
-          im_raw = (im_raw.replace('(','')).replace(')','')
-          im_value = float(im_raw)
-  
-        value = complex(real_value,im_value)
-        
-        # Add the information to the soc_list
+      state_1 = label_to_number.get(label_1, -1)
+      if state_1 == -1:
+        raise control_common.ControlError ("ERROR: Unknown excited state (%s) has been catched during the SOC parsing." % label_1)
 
-        soc_line = (state_1, label_1, state_2, label_2, value)
-        soc_list.append(soc_line)
+      state_2 = label_to_number.get(label_2, -1)
+      if state_2 == -1:
+        raise control_common.ControlError ("ERROR: Unknown excited state (%s) has been catched during the SOC parsing." % label_2)
 
-    # Raise an exception if the section has not been found
+      # Add the information to the soc_list
 
-    if not section_found:
-      raise control_common.ControlError ("ERROR: Unable to find the 'SPIN-ORBIT COUPLING' section in the source file")
+      soc_line = (state_1, label_1, state_2, label_2, value)
+      soc_list.append(soc_line)
 
     # Raise an exception if not all the values have been found
 
@@ -1281,25 +1411,25 @@ def qchem_tddft(source_content:list):
     #                       MIME Creation                       #
     # ========================================================= #
 
-    print("{:<50}".format("\nBuilding the MIME ... "), end="")   
+    print("{:<50}".format("\nBuilding the MIME ... "), end="")
 
     # Initialize the MIME as a zero-filled matrix
 
     system['mime'] = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])), dtype=complex)
 
     # Creation of the MIME - Non-diagonal values (SOC)
+    # Each SOC is placed at (k1,k2) and its conjugate at (k2,k1). The two positions are interleaved in the index arrays so that, as with a loop, the last value given for a position is the one that is kept.
 
-    for soc in soc_list:
-      k1 = soc[0]
-      k2 = soc[2]
-      val = soc[4]
-      system['mime'][k1][k2] = val
-      system['mime'][k2][k1] = val.conjugate()
+    soc_k1 = np.array([soc[0] for soc in soc_list], dtype=int)
+    soc_k2 = np.array([soc[2] for soc in soc_list], dtype=int)
+    soc_val = np.array([soc[4] for soc in soc_list], dtype=complex)
+
+    system['mime'][np.column_stack((soc_k1,soc_k2)).ravel(), np.column_stack((soc_k2,soc_k1)).ravel()] = np.column_stack((soc_val,soc_val.conjugate())).ravel()
 
     # Creation of the MIME - Diagonal values (Excitation energies)
 
-    for state in system['zero_states_list']:
-      system['mime'][state['number']][state['number']] = complex(state['energy'])
+    numbers = np.array([state['number'] for state in system['zero_states_list']], dtype=int)
+    system['mime'][numbers, numbers] = [state['energy'] for state in system['zero_states_list']]
 
     # Convert the MIME to Hartree units
 
@@ -1311,95 +1441,43 @@ def qchem_tddft(source_content:list):
     #                    Dipole Moments List                    #
     # ========================================================= #
 
-    print("{:<50}".format("\nParsing the transition dipole moments ...  "), end="")
+    print("{:<50}".format("\nBuilding the transition dipole moments list ...  "), end="")
 
     # Initialization of the variables
 
-    section_found = False
     momdip_list = []
 
-    # Define the expression patterns for the lines containing information about the dipole moments
-
-    moment_rx = {
-
-      # Pattern for finding the "STATE-TO-STATE TRANSITION MOMENTS" line (which marks the start of the section)
-      'start': re.compile(r'^STATE-TO-STATE TRANSITION MOMENTS$'),
-
-      # Pattern for finding lines looking like '    1    2   0.001414  -0.001456   0.004860   1.240659E-10'
-      'moment': re.compile(r'^\s*(?P<state_1>\d+)\s+(?P<state_2>\d+)\s+(?P<mom_x>-?\d+\.\d+)\s+(?P<mom_y>-?\d+\.\d+)\s+(?P<mom_z>-?\d+\.\d+)\s+(?P<strength>\d|\d\.\d+|\d\.\d+E[-+]\d+)$'),
-
-      # Pattern for finding lines looking like '       8     0.072914   -0.448517    0.787269'
-      'elec_moment': re.compile(r'^\s*(?P<state>\d+)\s+(?P<mom_x>-?\d+\.\d+)\s+(?P<mom_y>-?\d+\.\d+)\s+(?P<mom_z>-?\d+\.\d+)$'),
-
-      # Pattern for finding the "END OF TRANSITION MOMENT CALCULATION" line (which marks the end of the section)
-      'end': re.compile(r'^END OF TRANSITION MOMENT CALCULATION$')
-
-    }
-
-    # Parse the source file to get the information and build the dipole moments list
-
-    for line in source_content:
+    # Raise an exception if the section has not been found
 
-      # Define when the section begins and ends
+    if "momdip" not in sections_found:
+      raise control_common.ControlError ("ERROR: Unable to find the 'STATE-TO-STATE TRANSITION MOMENTS' section in the source file")
 
-      if not section_found:
-        if moment_rx['start'].match(line):
-          section_found = True
-    
-      elif section_found and moment_rx['end'].match(line):
-        break
+    # Build the dipole moments list
 
-      # Extract the relevant information and add it to the momdip_list
-  
-      elif moment_rx['moment'].match(line):
-  
-        matching_line = moment_rx['moment'].match(line)
+    for state_1, state_2, value_x, value_y, value_z, is_elec_moment in momdip_raw_list:
 
-        state_1 = int(matching_line.group('state_1'))
-        state_2 = int(matching_line.group('state_2'))
+      if not is_elec_moment:
 
-        energy_1 = [state['energy'] for state in system['zero_states_list'] if state['qchem_number'] == state_1][0]
-        energy_2 = [state['energy'] for state in system['zero_states_list'] if state['qchem_number'] == state_2][0]
+        energy_1 = system['zero_states_list'][qchem_to_numbers[state_1][0]]['energy']
+        energy_2 = system['zero_states_list'][qchem_to_numbers[state_2][0]]['energy']
 
         if energy_1 == energy_2:
           # Transition dipole moment between degenerated states must be zero as it has no physical sense
           value_x = 0.0
           value_y = 0.0
           value_z = 0.0
-        else:
-          value_x = float(matching_line.group('mom_x'))
-          value_y = float(matching_line.group('mom_y'))
-          value_z = float(matching_line.group('mom_z'))
-      
-        momdip = (state_1, state_2, value_x, value_y, value_z)
-      
-        # Add the new line to the momdip_list
-        momdip_list.append(momdip)
-
-      elif moment_rx['elec_moment'].match(line):
-  
-        matching_line = moment_rx['elec_moment'].match(line)
 
-        state = int(matching_line.group('state'))
-        value_x = float(matching_line.group('mom_x'))
-        value_y = float(matching_line.group('mom_y'))
-        value_z = float(matching_line.group('mom_z'))
-        momdip = (state, state, value_x, value_y, value_z)
-      
-        # Add the new line to the momdip_list
-        momdip_list.append(momdip)
+      momdip = (state_1, state_2, value_x, value_y, value_z)
 
-    # Raise an exception if the section has not been found
-
-    if not section_found:
-      raise control_common.ControlError ("ERROR: Unable to find the 'STATE-TO-STATE TRANSITION MOMENTS' section in the source file")
+      # Add the new line to the momdip_list
+      momdip_list.append(momdip)
 
     # Raise an exception if not all the values have been found
 
     nb_momdip = (
                   nb_roots                  # Ground to Singlet
-                + nb_roots                  # Ground to Triplet 
-                + (nb_roots*(nb_roots-1)/2) # Singlet to Singlet 
+                + nb_roots                  # Ground to Triplet
+                + (nb_roots*(nb_roots-1)/2) # Singlet to Singlet
                 + (nb_roots*(nb_roots-1)/2) # Triplet to Triplet
                 + (2*nb_roots)+1            # Electron Dipole Moments
                 )
@@ -1415,37 +1493,31 @@ def qchem_tddft(source_content:list):
 
     print("{:<50}".format("\nBuilding transition dipole moments matrices ... "), end="")
 
-    # Intialize the momdip_o_mtx dictionary
+    # Build the matrices indexed by the Q-CHEM state numbers (one line and column per 'qchem_number', stacked along the X, Y and Z axes)
+    # As for the MIME, the two symmetric positions are interleaved so that the last value given for a position is the one that is kept.
 
-    system['momdip_o_mtx'] = {}
+    nb_qchem_states = max(qchem_to_numbers) + 1
+    momdip_q_mtx = np.zeros((3, nb_qchem_states, nb_qchem_states), dtype=float)
 
-    # Initialize the matrices as zero-filled matrices
+    momdip_q1 = np.array([momdip[0] for momdip in momdip_list], dtype=int)
+    momdip_q2 = np.array([momdip[1] for momdip in momdip_list], dtype=int)
+    momdip_val = np.array([momdip[2:5] for momdip in momdip_list], dtype=float).reshape(-1, 3)
 
-    system['momdip_o_mtx']['X'] = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])), dtype=float)
-    system['momdip_o_mtx']['Y'] = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])), dtype=float)
-    system['momdip_o_mtx']['Z'] = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])), dtype=float)
+    momdip_q_mtx[:, np.column_stack((momdip_q1,momdip_q2)).ravel(), np.column_stack((momdip_q2,momdip_q1)).ravel()] = np.repeat(momdip_val, 2, axis=0).T
 
-    # Filling the matrices
-  
-    for momdip in momdip_list:
+    # Expand those matrices to all the states, each state getting the values of its 'qchem_number' (for triplets, the three substates share the same values)
 
-      states_1 = [state['number'] for state in system['zero_states_list'] if state['qchem_number'] == momdip[0]] # For triplets, there are three states for each 'qchem_number'
-      states_2 = [state['number'] for state in system['zero_states_list'] if state['qchem_number'] == momdip[1]]
+    state_qchem = np.array([state['qchem_number'] for state in system['zero_states_list']], dtype=int)
+    momdip_o_mtx = momdip_q_mtx[:, state_qchem[:, np.newaxis], state_qchem[np.newaxis, :]]
 
-      for k1 in states_1:
-        for k2 in states_2:
+    # If the two qchem_numbers are the same but the state numbers are not (for example T1(ms=0) and T1(ms=1)), remove the value as the transition has no physical sense
 
-          if momdip[0] == momdip[1] and not k1 == k2:
-            continue # If the two qchem_numbers are the same but the state numbers are not (for example T1(ms=0) and T1(ms=1)), skip this value as the transition has no physical sense
+    same_qchem = (state_qchem[:, np.newaxis] == state_qchem[np.newaxis, :]) & ~np.eye(len(state_qchem), dtype=bool)
+    momdip_o_mtx[:, same_qchem] = 0.0
 
-          system['momdip_o_mtx']['X'][k1][k2] = momdip[2]
-          system['momdip_o_mtx']['X'][k2][k1] = momdip[2]    # For symetry purposes
-    
-          system['momdip_o_mtx']['Y'][k1][k2] = momdip[3]
-          system['momdip_o_mtx']['Y'][k2][k1] = momdip[3]    # For symetry purposes
-    
-          system['momdip_o_mtx']['Z'][k1][k2] = momdip[4]
-          system['momdip_o_mtx']['Z'][k2][k1] = momdip[4]    # For symetry purposes
+    # Store the matrices in the momdip_o_mtx dictionary
+
+    system['momdip_o_mtx'] = {'X': momdip_o_mtx[0], 'Y': momdip_o_mtx[1], 'Z': momdip_o_mtx[2]}
 
     print("[ DONE ]")
 
@@ -1458,13 +1530,13 @@ def qchem_tddft(source_content:list):
       # Define the states that need to be kept
       
       states_to_keep = []
-      qchem_states_to_keep = []
+      qchem_states_to_keep = set()
       for state in system['zero_states_list']:
         label = state['label'].partition("(")[0]
         label_number = int(re.sub(r'[a-zA-Z]','',label))
         if label_number <= old_nb_roots:
           states_to_keep.append(state['number'])
-          qchem_states_to_keep.append(state['qchem_number'])
+          qchem_states_to_keep.add(state['qchem_number'])
 
       # Remove the rest from the MIME and the transition dipole moment matrices
 
@@ -1474,12 +1546,13 @@ def qchem_tddft(source_content:list):
 
       # Remove the rest from the states list
         
-      system['zero_states_list'] = [state for state in system['zero_states_list'] if state['number'] in states_to_keep]
-      for state in system['zero_states_list']:
-        state['number'] = system['zero_states_list'].index(state)
+      system['zero_states_list'] = [system['zero_states_list'][number] for number in states_to_keep]
+      for index, state in enumerate(system['zero_states_list']):
+        state['number'] = index
 
       # Remove the rest from the SOC list
 
+      states_to_keep = set(states_to_keep)
       soc_list = [soc for soc in soc_list if soc[0] in states_to_keep and soc[2] in states_to_keep]
 
       # Remove the rest from the transition dipole moments list
@@ -1539,58 +1612,65 @@ def qchem_tddft(source_content:list):
     #              Printing values in the log file              #
     # ========================================================= #
 
-    # Print the non-relativistic states list
-    # ======================================
+    # The tables are only built if they need to be printed
 
-    table_width = 73
-    print("")
-    print(''.center(table_width, '-'))
-    print('Non-relativistic states list'.center(table_width, ' '))
-    print(''.center(table_width, '-'))
-    print("{:<10} {:<15} {:<15} {:<15} {:<15}".format('Number','Label','Energy (cm-1)','Energy (Ha)','Energy (nm)'))
-    print(''.center(table_width, '-'))
-    for state in system['zero_states_list']:
-      print("{:<10} {:<15} {:<15.2f} {:<15.5f} {:<15.2f}".format(state['number'],state['label'],state['energy'],control_common.energy_unit_conversion(state['energy'],"cm-1","ha"),control_common.energy_unit_conversion(state['energy'],"cm-1","nm")))
-    print(''.center(table_width, '-'))
+    if print_tables:
 
-    # Print the SOC list
-    # ==================
+      # Print the non-relativistic states list
+      # ======================================
 
-    table_width = 73
-    print("")
-    print(''.center(table_width, '-'))
-    print('Spin-orbit couplings'.center(table_width, ' '))
-    print(''.center(table_width, '-'))
-    print("{:<15} {:<15} {:<20} {:<20}".format('State 1','State 2','Real value (Ha)','Imag value (Ha)'))
-    print(''.center(table_width, '-'))
-    for soc in soc_list:
-      column_3 = control_common.energy_unit_conversion(soc[4].real,"cm-1","ha")
-      column_4 = control_common.energy_unit_conversion(soc[4].imag,"cm-1","ha")
-      if column_3 == 0 and column_4 == 0:
-        continue # Skip spin-orbit couplings equal to zero due to spin-orbit selection rules
-      column_1 = soc[1]
-      column_2 = soc[3]
-      print("{:<15} {:<15} {:<20.5g} {:<20.5g}".format(column_1,column_2,column_3,column_4))
-    print(''.center(table_width, '-'))  
-
-    # Print the transition dipole moments list
-    # ========================================
-
-    table_width = 73
-    print("")
-    print(''.center(table_width, '-'))
-    print('Transition dipole moments'.center(table_width, ' '))
-    print(''.center(table_width, '-'))
-    print("{:<10} {:<10} {:<12} {:<12} {:<12} {:<12}".format('State 1','State 2','X (a.u.)','Y (a.u.)','Z (a.u.)','Tot (a.u.)'))
-    print(''.center(table_width, '-'))
-    for momdip in momdip_list:
-      tot_momdip = math.sqrt(momdip[2]**2 + momdip[3]**2 + momdip[4]**2)
-      if tot_momdip == 0:
-        continue # Skip transition dipole moments equal to zero either due to selection rules or no physical sense (degenerated states)
-      column_1 = [state['label'] for state in system['zero_states_list'] if state['qchem_number'] == momdip[0]][0].partition("(")[0]
-      column_2 = [state['label'] for state in system['zero_states_list'] if state['qchem_number'] == momdip[1]][0].partition("(")[0]
-      print("{:<10} {:<10} {:<12.4g} {:<12.4g} {:<12.4g} {:<12.4g}".format(column_1,column_2,momdip[2],momdip[3],momdip[4],tot_momdip))
-    print(''.center(table_width, '-'))
+      table_width = 73
+      print("")
+      print(''.center(table_width, '-'))
+      print('Non-relativistic states list'.center(table_width, ' '))
+      print(''.center(table_width, '-'))
+      print("{:<10} {:<15} {:<15} {:<15} {:<15}".format('Number','Label','Energy (cm-1)','Energy (Ha)','Energy (nm)'))
+      print(''.center(table_width, '-'))
+      for state in system['zero_states_list']:
+        print("{:<10} {:<15} {:<15.2f} {:<15.5f} {:<15.2f}".format(state['number'],state['label'],state['energy'],control_common.energy_unit_conversion(state['energy'],"cm-1","ha"),control_common.energy_unit_conversion(state['energy'],"cm-1","nm")))
+      print(''.center(table_width, '-'))
+
+      # Print the SOC list
+      # ==================
+
+      table_width = 73
+      print("")
+      print(''.center(table_width, '-'))
+      print('Spin-orbit couplings'.center(table_width, ' '))
+      print(''.center(table_width, '-'))
+      print("{:<15} {:<15} {:<20} {:<20}".format('State 1','State 2','Real value (Ha)','Imag value (Ha)'))
+      print(''.center(table_width, '-'))
+      for soc in soc_list:
+        column_3 = control_common.energy_unit_conversion(soc[4].real,"cm-1","ha")
+        column_4 = control_common.energy_unit_conversion(soc[4].imag,"cm-1","ha")
+        if column_3 == 0 and column_4 == 0:
+          continue # Skip spin-orbit couplings equal to zero due to spin-orbit selection rules
+        column_1 = soc[1]
+        column_2 = soc[3]
+        print("{:<15} {:<15} {:<20.5g} {:<20.5g}".format(column_1,column_2,column_3,column_4))
+      print(''.center(table_width, '-'))  
+
+      # Print the transition dipole moments list
+      # ========================================
+
+      table_width = 73
+      print("")
+      print(''.center(table_width, '-'))
+      print('Transition dipole moments'.center(table_width, ' '))
+      print(''.center(table_width, '-'))
+      print("{:<10} {:<10} {:<12} {:<12} {:<12} {:<12}".format('State 1','State 2','X (a.u.)','Y (a.u.)','Z (a.u.)','Tot (a.u.)'))
+      print(''.center(table_width, '-'))
+      qchem_to_label = {}
+      for state in system['zero_states_list']:
+        qchem_to_label.setdefault(state['qchem_number'], state['label'].partition("(")[0])
+      for momdip in momdip_list:
+        tot_momdip = math.sqrt(momdip[2]**2 + momdip[3]**2 + momdip[4]**2)
+        if tot_momdip == 0:
+          continue # Skip transition dipole moments equal to zero either due to selection rules or no physical sense (degenerated states)
+        column_1 = qchem_to_label[momdip[0]]
+        column_2 = qchem_to_label[momdip[1]]
+        print("{:<10} {:<10} {:<12.4g} {:<12.4g} {:<12.4g} {:<12.4g}".format(column_1,column_2,momdip[2],momdip[3],momdip[4],tot_momdip))
+      print(''.center(table_width, '-'))
 
     # =================================================================== #
     # =================================================================== #
@@ -1642,32 +1722,36 @@ def qchem_tddft(source_content:list):
     # Transpose the eigenvectors list
     # ===============================
 
-    # Using SciPy to invert the eigenvectors matrix
-    # Note that the inverse of an orthonormal matrix is equal to its transpose, so each line of this matrix corresponds to an eigenvector. (see https://math.stackexchange.com/questions/156735/in-which-cases-is-the-inverse-of-a-matrix-equal-to-its-transpose)
+    # Since the MIME is Hermitian, the eigenvectors matrix returned by eigh is unitary: its inverse is simply its conjugate transpose, so each line of this matrix corresponds to an eigenvector. (see https://en.wikipedia.org/wiki/Unitary_matrix for reference)
+    # This is both cheaper and more precise than inverting the matrix.
 
-    system['eigenvectors_inv'] = linalg.inv(system['eigenvectors'])
+    system['eigenvectors_inv'] = system['eigenvectors'].conj().T
 
     print("[ DONE ]")
 
     # Evaluate the diagonalization
     # ============================
 
-    # Using NumPy to convert the MIME from the zero order basis set to the eigenstates basis set through a matrix product (see https://numpy.org/doc/stable/reference/generated/numpy.matmul.html#numpy.matmul for reference)
-    mime_diag = np.matmul(np.matmul(system['eigenvectors_inv'],system['mime']),system['eigenvectors'])
+    # This is only done if asked, as it costs two more matrix products
 
-    # Get the absolute value of the matrix
-    abs_mime_diag = np.abs(mime_diag)
+    if check_diag:
 
-    # Average the diagonal elements
-    diag_mean = np.mean(np.trace(abs_mime_diag))
+      # Using NumPy to convert the MIME from the zero order basis set to the eigenstates basis set through a matrix product (see https://numpy.org/doc/stable/reference/generated/numpy.matmul.html#numpy.matmul for reference)
+      mime_diag = np.matmul(np.matmul(system['eigenvectors_inv'],system['mime']),system['eigenvectors'])
 
-    # Average the non-diagonal elements (sum everything minus the trace and divide by n*(n-1), where n is the number of states)
-    nondiag_mean = (np.sum(abs_mime_diag) - np.trace(abs_mime_diag)) / (len(system['eigenvectors']) * (len(system['eigenvectors']) - 1))
+      # Get the absolute value of the matrix
+      abs_mime_diag = np.abs(mime_diag)
 
-    # Evaluate the ratio of the diagonalization
-    ratio = nondiag_mean / diag_mean
-        
-    print ("{:<50} {:<.2e}".format('\nDiagonalization ratio (non-diag/diag): ',ratio))
+      # Average the diagonal elements
+      diag_mean = np.mean(np.trace(abs_mime_diag))
+
+      # Average the non-diagonal elements (sum everything minus the trace and divide by n*(n-1), where n is the number of states)
+      nondiag_mean = (np.sum(abs_mime_diag) - np.trace(abs_mime_diag)) / (len(system['eigenvectors']) * (len(system['eigenvectors']) - 1))
+
+      # Evaluate the ratio of the diagonalization
+      ratio = nondiag_mean / diag_mean
+
+      print ("{:<50} {:<.2e}".format('\nDiagonalization ratio (non-diag/diag): ',ratio))
 
     # ========================================================= #
     #          Relativistic transition dipole moments           #
@@ -1682,10 +1766,15 @@ def qchem_tddft(source_content:list):
 
     system['momdip_mtx'] = {}
 
-    # Convert each matrix from the zero order basis set to the eigenstates basis set through a matrix product (see https://numpy.org/doc/stable/reference/generated/numpy.matmul.html#numpy.matmul for reference)
+    # Convert the matrices from the zero order basis set to the eigenstates basis set through a matrix product (see https://numpy.org/doc/stable/reference/generated/numpy.matmul.html#numpy.matmul for reference)
+    # The matrices of all the axes are stacked into a single (3,n,n) array so that they are all converted at once
 
-    for momdip_key in system["momdip_o_mtx"]:
-      system['momdip_mtx'][momdip_key] = np.absolute(np.matmul(np.matmul(system['eigenvectors_inv'],system['momdip_o_mtx'][momdip_key]),system['eigenvectors']))
+    momdip_keys = list(system["momdip_o_mtx"].keys())
+    momdip_stack = np.stack([system["momdip_o_mtx"][momdip_key] for momdip_key in momdip_keys])
+    momdip_stack = np.absolute(np.matmul(np.matmul(system['eigenvectors_inv'], momdip_stack), system['eigenvectors']))
+
+    for index, momdip_key in enumerate(momdip_keys):
+      system['momdip_mtx'][momdip_key] = momdip_stack[index]
 
     """
     # ========================================================= #
@@ -1842,35 +1931,6 @@ def qchem_tddft(source_content:list):
       state['number'] = energies.index(state['energy'])
     """
 
-    # Build the new list
-    # ==================
-
-    # Initialization of the variables
-
-    rel_momdip_list = []
-    
-    # Iterate over the MIME to get the information and build the SOC list
-
-    it = np.nditer(system['momdip_mtx']['X'], flags=['multi_index'])
-  
-    for momdip in it:
-
-      state_1 = it.multi_index[0]
-      state_2 = it.multi_index[1]
-      value_x = momdip
-      value_y = system['momdip_mtx']['Y'][state_1][state_2]
-      value_z = system['momdip_mtx']['Z'][state_1][state_2]
-
-      # Add the information to the soc_list
-      momdip_line = (state_1, state_2, value_x, value_y, value_z)
-      eq_line = False
-      for line in rel_momdip_list:
-        if line[0] == state_2 and line[1] == state_1:
-          eq_line = True
-          break
-      if not eq_line:
-        rel_momdip_list.append(momdip_line)
-
     print("[ DONE ]")
 
     # ========================================================= #
@@ -1988,34 +2048,45 @@ def qchem_tddft(source_content:list):
     #              Printing values in the log file              #
     # ========================================================= #
 
-    # Print the relativistic states list
-    # ==================================
+    # The tables are only built if they need to be printed
 
-    table_width = 97
-    print("")
-    print(''.center(table_width, '-'))
-    print('Relativistic states list'.center(table_width, ' '))
-    print(''.center(table_width, '-'))
-    print("{:<9} {:<9} {:<15} {:<15} {:<10} {:<10} {:<10} {:<10}".format('Number','Label','Energy (Ha)','Energy (cm-1)',r'% GS','% Singlet','% Triplet','Dom. State'))
-    print(''.center(table_width, '-'))
-    for state in system['states_list']:
-      print("{:<9} {:<9} {:<15.5e} {:<15.4f} {:<10.2f} {:<10.2f} {:<10.2f} {:<10}".format(state['number'],state['label'],state['energy'],control_common.energy_unit_conversion(state['energy'],"ha","cm-1"),state['gs_percent']*100,state['sing_percent']*100,state['trip_percent']*100,state['dom_state']))
-    print(''.center(table_width, '-'))
+    if print_tables:
 
-    # Print the relativistic transition dipole moments list
-    # =====================================================
+      # Print the relativistic states list
+      # ==================================
 
-    table_width = 73
-    print("")
-    print(''.center(table_width, '-'))
-    print('Relativistic transition dipole moments'.center(table_width, ' '))
-    print(''.center(table_width, '-'))
-    print("{:<10} {:<10} {:<12} {:<12} {:<12} {:<12}".format('State 1','State 2','X (a.u.)','Y (a.u.)','Z (a.u.)','Tot (a.u.)'))
-    print(''.center(table_width, '-'))
-    for momdip in rel_momdip_list:
-      column_6 = math.sqrt(momdip[2]**2 + momdip[3]**2 + momdip[4]**2)
-      print("{:<10} {:<10} {:<12.4g} {:<12.4g} {:<12.4g} {:<12.4g}".format(momdip[0],momdip[1],momdip[2],momdip[3],momdip[4],column_6))
-    print(''.center(table_width, '-'))
+      table_width = 97
+      print("")
+      print(''.center(table_width, '-'))
+      print('Relativistic states list'.center(table_width, ' '))
+      print(''.center(table_width, '-'))
+      print("{:<9} {:<9} {:<15} {:<15} {:<10} {:<10} {:<10} {:<10}".format('Number','Label','Energy (Ha)','Energy (cm-1)',r'% GS','% Singlet','% Triplet','Dom. State'))
+      print(''.center(table_width, '-'))
+      for state in system['states_list']:
+        print("{:<9} {:<9} {:<15.5e} {:<15.4f} {:<10.2f} {:<10.2f} {:<10.2f} {:<10}".format(state['number'],state['label'],state['energy'],control_common.energy_unit_conversion(state['energy'],"ha","cm-1"),state['gs_percent']*100,state['sing_percent']*100,state['trip_percent']*100,state['dom_state']))
+      print(''.center(table_width, '-'))
+
+      # Print the relativistic transition dipole moments list
+      # =====================================================
+
+      table_width = 73
+      print("")
+      print(''.center(table_width, '-'))
+      print('Relativistic transition dipole moments'.center(table_width, ' '))
+      print(''.center(table_width, '-'))
+      print("{:<10} {:<10} {:<12} {:<12} {:<12} {:<12}".format('State 1','State 2','X (a.u.)','Y (a.u.)','Z (a.u.)','Tot (a.u.)'))
+      print(''.center(table_width, '-'))
+
+      # Only the upper triangle (diagonal included) is printed since the matrices are symmetric
+
+      momdip_stack = np.stack([system['momdip_mtx'][momdip_key] for momdip_key in ['X', 'Y', 'Z']])
+      states_1, states_2 = np.triu_indices(momdip_stack.shape[1])
+      values = momdip_stack[:, states_1, states_2]
+      totals = np.sqrt(np.sum(values**2, axis=0))
+
+      for state_1, state_2, value_x, value_y, value_z, column_6 in zip(states_1, states_2, values[0], values[1], values[2], totals):
+        print("{:<10} {:<10} {:<12.4g} {:<12.4g} {:<12.4g} {:<12.4g}".format(state_1,state_2,value_x,value_y,value_z,column_6))
+      print(''.center(table_width, '-'))
 
     # ========================================================= #
     #                    End of the function                    #
@@ -0,0 +1,202 @@
+################################################################################################################################################
+##                                                                Object store                                                                ##
+##                                                                                                                                            ##
+##   This script contains the functions used by CONTROL LAUNCHER to store the files of the job directories only once per profile directory:   ##
+##           each distinct content is written once in a read-only content-addressed store and hard-linked into the job directories,           ##
+##                               and the source file is cloned into the data directory instead of being copied                                ##
+################################################################################################################################################
+
+import contextlib
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+
+# Name of the directory of the store, created inside the profile directory. Each object is named after the SHA-256 hash of its content, directly in that directory (a profile directory only contains a few thousand distinct files at most, and subdirectories would take inodes of their own)
+
+STORE_DIRNAME = ".objects"
+
+# Permissions of the objects: since they are shared by several job directories, they are read-only so that they cannot be modified in place. The job scripts copying them elsewhere must therefore not keep their permissions (e.g. with "cp --no-preserve=mode"), so that the copies can be overwritten later on, and those copying files back over them must remove them first (e.g. with "cp --remove-destination"), which leaves the other job directories untouched.
+
+OBJECT_MODE = 0o444
+
+# Suffix of the lock file of the store, placed next to its directory. The executions writing files through the store share that lock, while the pruning of the store requires it exclusively, so that an object cannot be removed between its addition to the store and its linking into a job directory (when several executions share the same profile directory)
+
+LOCK_SUFFIX = ".lock"
+
+# Linux ioctl request cloning the content of a file into another one (reflink), supported by Btrfs, XFS and some other file systems
+
+FICLONE = 0x40049409
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _write_object(path:str, content:bytes):
+    """Writes some content in a read-only object of the store, under a temporary name before renaming it, so that an object is never seen partially written."""
+
+    tmp_file = "%s.%s.tmp" % (path, os.getpid())
+
+    with open(tmp_file, 'wb') as f:
+      f.write(content)
+
+    os.chmod(tmp_file, OBJECT_MODE)
+    os.replace(tmp_file, path)
+
+#######################################################################
+
+@contextlib.contextmanager
+def _locked(store_dir:str, operation:int):
+    """Locks the store inside a with statement, either in shared (fcntl.LOCK_SH) or exclusive (fcntl.LOCK_EX) mode, see LOCK_SUFFIX."""
+
+    with open(store_dir.rstrip(os.sep) + LOCK_SUFFIX, 'a') as f_lock:
+      fcntl.flock(f_lock, operation)
+      yield
+
+#######################################################################
+
+def _reflink(src:str, dst:str) -> bool:
+    """Clones a file through a reflink (the two files share their data until one of them is modified). Returns False if the file system does not support it."""
+
+    try:
+      with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+      return True
+    except OSError:
+      if os.path.exists(dst):
+        os.remove(dst)
+      return False
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def put(store_dir:str, content) -> str:
+    """Adds some content to the store, unless it is already there, and returns the path towards the corresponding object.
+
+    Parameters
+    ----------
+    store_dir : str
+        Path towards the directory of the store (created if needed).
+    content : str or bytes
+        The content of the file (the strings are encoded in UTF-8).
+
+    Returns
+    -------
+    object_path : str
+        Path towards the object containing that content.
+    """
+
+    if isinstance(content, str):
+      content = content.encode('utf-8')
+
+    digest = hashlib.sha256(content).hexdigest()
+    object_path = os.path.join(store_dir, digest)
+
+    if not os.path.isfile(object_path):
+      os.makedirs(store_dir, exist_ok=True)
+      _write_object(object_path, content)
+
+    return object_path
+
+#######################################################################
+
+def write(store_dir:str, path:str, content):
+    """Writes a file whose content is kept in the store: the file is a hard link towards the object of that content, so that all the files with the same content share the same data and inode (and are therefore read-only, see OBJECT_MODE). If the file cannot be linked (e.g. too many links or a file system without hard links), it is written as a regular file.
+
+    Parameters
+    ----------
+    store_dir : str
+        Path towards the directory of the store, which must be on the same file system as the file.
+    path : str
+        Path towards the file to write (replaced if it already exists).
+    content : str or bytes
+        The content of the file (the strings are encoded in UTF-8).
+    """
+
+    with _locked(store_dir, fcntl.LOCK_SH):
+
+      object_path = put(store_dir, content)
+
+      if os.path.lexists(path):
+        os.remove(path)
+
+      try:
+        os.link(object_path, path)
+      except OSError:
+        shutil.copyfile(object_path, path)
+
+#######################################################################
+
+def copy(store_dir:str, src:str, dst:str):
+    """Copies a file through the store (see the write function), dst being either the path of the copy or the directory where it must be placed."""
+
+    if os.path.isdir(dst):
+      dst = os.path.join(dst, os.path.basename(src))
+
+    with open(src, 'rb') as f_src:
+      write(store_dir, dst, f_src.read())
+
+#######################################################################
+
+def clone(src:str, dst_dir:str) -> str:
+    """Puts a copy of a (large) file in a directory without duplicating its data when possible. The file is cloned through a reflink if the file system supports it, or hard-linked if it is on the same file system. Otherwise, it is copied as a regular file, so that the copy can always be used under the name of the original file.
+
+    Note that a hard-linked copy shares its data with the original file: it is only used when the file cannot be cloned, and the original file must then not be modified in place.
+
+    Parameters
+    ----------
+    src : str
+        Path towards the file.
+    dst_dir : str
+        Path towards the directory where the copy must be placed.
+
+    Returns
+    -------
+    method : str
+        How the copy has been made: "reflink", "hardlink" or "copy".
+    """
+
+    dst = os.path.join(dst_dir, os.path.basename(src))
+
+    if os.path.lexists(dst):
+      os.remove(dst)
+
+    if _reflink(src, dst):
+      shutil.copystat(src, dst)
+      return "reflink"
+
+    try:
+      os.link(src, dst)
+      return "hardlink"
+    except OSError as error:
+      if error.errno not in [errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES]:
+        raise
+
+    shutil.copy2(src, dst)
+
+    return "copy"
+
+#######################################################################
+
+def prune(store_dir:str) -> int:
+    """Removes the objects of the store that are not linked to any file anymore (e.g. after a job directory has been replaced), and returns the number of removed objects."""
+
+    removed = 0
+
+    if not os.path.isdir(store_dir):
+      return removed
+
+    with _locked(store_dir, fcntl.LOCK_EX):
+
+      for entry in os.scandir(store_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp") and entry.stat().st_nlink == 1:
+          os.remove(entry.path)
+          removed += 1
+
+    return removed
@@ -0,0 +1,214 @@
+################################################################################################################################################
+##                                                               Run resources                                                                ##
+##                                                                                                                                            ##
+##     This script contains the resources shared by the rendering functions of CONTROL LAUNCHER, which are loaded only once per execution     ##
+##                                       and then reused for each transition-configuration combination.                                       ##
+################################################################################################################################################
+
+import csv
+import os
+import re
+
+import numpy as np
+from scipy.spatial import ConvexHull, distance
+
+import control_common
+import yaml_loader
+
+
+class RunResources:
+    """Resources shared by the rendering functions during an execution of CONTROL LAUNCHER. Each resource is loaded from its file (or computed) the first time it is needed and is then kept in memory, instead of being loaded again for each transition-configuration combination.
+
+    Attributes
+    ----------
+    chains_path : str
+        Path towards the CHAINS directory (where the configs directory and the shapers.yml file are located).
+    """
+
+    def __init__(self, chains_path:str):
+        self.chains_path = chains_path
+        self._chains_config = None
+        self._ip_file = None
+        self._ip_dict = None
+        self._shapers = None
+        self._hulls = {}
+
+    # =================================================================== #
+    #                         Configuration files                         #
+    # =================================================================== #
+
+    @property
+    def chains_config(self) -> dict:
+        """Content of the CHAINS configuration file (chains_config.yml)."""
+
+        if self._chains_config is None:
+
+          chains_config_file = control_common.check_abspath(os.path.join(self.chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
+
+          print ("{:<80}".format("\nLoading CHAINS configuration YAML file ..."), end="")
+          self._chains_config = yaml_loader.load(chains_config_file)
+          print('%12s' % "[ DONE ]")
+
+        return self._chains_config
+
+    #######################################################################
+
+    @property
+    def shapers(self) -> dict:
+        """Content of the pulse shapers file (shapers.yml)."""
+
+        if self._shapers is None:
+
+          shapers_file = control_common.check_abspath(os.path.join(self.chains_path,"shapers.yml"),"Pulse shapers YAML file","file")
+
+          print ("{:<80}".format("\nLoading the pulse shapers YAML file ..."), end="")
+          self._shapers = yaml_loader.load(shapers_file)
+          print('%12s' % "[ DONE ]")
+
+        return self._shapers
+
+    # =================================================================== #
+    #                        Ionization potentials                        #
+    # =================================================================== #
+
+    def get_ip(self, mol_name:str) -> float:
+        """Returns the ionization potential of a molecule, as given in the ionization potentials CSV file. The adiabatic IP is used if it is available, otherwise the vertical one and lastly the Koopmans one. The CSV file is only read once and its content is indexed by molecule name.
+
+        Parameters
+        ----------
+        mol_name : str
+            Name of the molecule, as given in the "Molecule" column of the CSV file.
+
+        Returns
+        -------
+        ip : float
+            The ionization potential of the molecule, in Ha.
+
+        Raises
+        ------
+        ControlError
+            If the molecule is not listed in the CSV file.
+        """
+
+        if self._ip_dict is None:
+
+          self._ip_file = control_common.check_abspath(self.chains_config['ip_file'],"Ionization potentials CSV file","file")
+          self._ip_dict = {}
+
+          print ("{:<80}".format("\nLoading ionization potentials CSV file ..."), end="")
+          with open(self._ip_file, 'r', newline='') as csv_file:
+            for line in csv.DictReader(csv_file, delimiter=';'):
+              if line['Molecule'] in self._ip_dict:
+                continue  # Only the first line of each molecule is taken into account
+              if line['IP (adiabatic)'] != "N/A":
+                self._ip_dict[line['Molecule']] = float(line['IP (adiabatic)'])
+              elif line['IP (vertical)'] != "N/A":
+                self._ip_dict[line['Molecule']] = float(line['IP (vertical)'])
+              else:
+                self._ip_dict[line['Molecule']] = float(line['IP (Koopmans)'])
+          print('%12s' % "[ DONE ]")
+
+        if mol_name not in self._ip_dict:
+          raise control_common.ControlError ("ERROR: Unable to find the ionization potential of this molecule in the %s file." % self._ip_file)
+
+        return self._ip_dict[mol_name]
+
+    # =================================================================== #
+    #                        Geometry of the molecule                     #
+    # =================================================================== #
+
+    def get_hull(self, source_name:str, source_content:list):
+        """Returns the "radius" and the area of the molecule affected by the laser, based on the convex hull of its atomic coordinates (given in the "Standard Nuclear Orientation" section of the QCHEM output file). These values are only computed once for each source file.
+
+        Parameters
+        ----------
+        source_name : str
+            Name of the source file, used to identify the molecule.
+        source_content : list
+            Content of the source file. Each element of the list is a line of the file.
+
+        Returns
+        -------
+        radius : float
+            Average distance between the points of the hull and their centroid, in meters.
+        area : float
+            Area of the molecule affected by the laser (surface of the hemisphere of that radius), in square meters.
+
+        Raises
+        ------
+        ControlError
+            If the atomic coordinates cannot be found in the source file.
+        """
+
+        if source_name in self._hulls:
+          return self._hulls[source_name]
+
+        # Initialize some variables
+
+        coord_list = []
+        section_found = False
+
+        # Define the expression patterns for the lines containing the atomic coordinates of the molecule in the QCHEM output file
+      
+        coord_rx = {
+
+          # Pattern for finding the "Standard Nuclear Orientation (Angstroms)" line (which marks the start of the section)
+          'start': re.compile(r'^\s*Standard Nuclear Orientation \(Angstroms\)\s*$'),
+
+          # Pattern for finding lines looking like '   16      Si     -2.7647071137    -0.0043786180     2.7647071137'
+          'coordinates': re.compile(r'^\s*\d+\s+[a-zA-Z]{1,3}\s+(?P<coord_x>-?\d+\.\d+)\s+(?P<coord_y>-?\d+\.\d+)\s+(?P<coord_z>-?\d+\.\d+)\s*$'),
+
+          # Pattern for finding the "Total QAlloc Memory Limit" line (which marks the end of the section, no need to get further)
+          'end': re.compile(r'^\s*Total QAlloc Memory Limit')
+
+        }
+
+        # Parse the qchem output file to get the information
+
+        for line in source_content:
+
+          # Define when the section begins and ends
+
+          if not section_found:
+            if coord_rx['start'].match(line):
+              section_found = True
+        
+          elif coord_rx['end'].match(line):
+            break
+
+          # If the line matches our coordinates pattern, extract the values and store them (after converting them from Angstroms to meters)
+
+          else:
+            matching_line = coord_rx['coordinates'].match(line)
+            if matching_line:
+              coord_list.append([float(matching_line.group(axis))*1e-10 for axis in ('coord_x','coord_y','coord_z')])
+
+        # Raise an exception if the section has not been found
+
+        if not section_found:
+          raise control_common.ControlError ("ERROR: Unable to find the 'Standard Nuclear Orientation (Angstroms)' section in the QCHEM output file")
+
+        # Raise an exception if the atomic coordinates have not been found
+
+        if coord_list == []:
+          raise control_common.ControlError ("ERROR: Unable to find the atomic coordinates of the molecule in the QCHEM output file")
+
+        # Compute the convex hull of the molecule and get the list of points constituting it
+
+        points = np.array(coord_list)
+        hull = ConvexHull(points)
+        pts_hull = points[hull.vertices,:]
+
+        # Compute the average distance between the points of the hull and their centroid ("radius")
+
+        centroid = np.array(np.mean(pts_hull,axis=0),ndmin=2)
+        dist = distance.cdist(pts_hull,centroid)
+        radius = np.mean(dist)
+
+        # Compute the area of the molecule affected by the laser (consider the shape of a sphere, and compute the surface of the hemisphere)
+
+        area = 2 * np.pi *(radius**2)
+
+        self._hulls[source_name] = (radius, area)
+
+        return radius, area
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+################################################################################################################################################
+##                                                              SQLite functions                                                              ##
+##                                                                                                                                            ##
+##           This script contains the functions common to the SQLite databases of CHAINS (the benchmark store of ABIN LAUNCHER, the           ##
+##        job registry of the launchers and the results store of the results treatment scripts), which import it from this directory.         ##
+################################################################################################################################################
+
+import contextlib
+import sqlite3
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def quote(name:str) -> str:
+    """Quotes the name of a column so that it can be used in an SQL statement (the names of the columns may contain spaces, slashes, parentheses, etc.)."""
+
+    return '"' + name.replace('"', '""') + '"'
+
+#######################################################################
+
+def where(filters:dict=None):
+    """Builds the WHERE clause (and its parameters) selecting the lines whose columns have the given values.
+
+    Parameters
+    ----------
+    filters : dict, optional
+        Dictionary associating the name of some columns with the value they must have. By default, all the lines are selected.
+
+    Returns
+    -------
+    clause : str
+        The WHERE clause, starting with a space (empty if there is no filter).
+    params : list
+        The values of the columns, as strings, in the order of the clause.
+    """
+
+    conditions = ["%s = ?" % quote(column) for column in (filters or {})]
+    params = [str(value) for value in (filters or {}).values()]
+
+    clause = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    return clause, params
+
+#######################################################################
+
+def connect(db_path:str, timeout:float=120.0) -> sqlite3.Connection:
+    """Opens an SQLite database (and creates it if it does not exist yet).
+
+    Parameters
+    ----------
+    db_path : str
+        Path towards the SQLite database file.
+    timeout : float, optional
+        How many seconds to wait for the other processes writing in the database to release their lock, by default 120.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        Connection to the database, in autocommit mode (the changes are grouped with the transaction function). Its lines can be accessed both by index and by column name.
+    """
+
+    # The default rollback journal is kept (rather than the WAL mode) since it also works on the network file systems of the clusters
+
+    connection = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+
+    return connection
+
+#######################################################################
+
+@contextlib.contextmanager
+def transaction(connection:sqlite3.Connection):
+    """Groups the statements executed inside a with statement into a single transaction. The database is locked for writing from the start of the transaction, so that concurrent writers wait for each other instead of failing halfway. The transaction is rolled back if an exception occurs."""
+
+    connection.execute("BEGIN IMMEDIATE")
+
+    try:
+      yield connection
+    except BaseException:
+      connection.execute("ROLLBACK")
+      raise
+
+    connection.execute("COMMIT")
@@ -0,0 +1,310 @@
+################################################################################################################################################
+##                                                                System cache                                                                ##
+##                                                                                                                                            ##
+##               This script contains the functions used to store the "system" dictionaries returned by the modelling functions               ##
+##                   on the disk, so that the same source file does not need to be modelled again by the different scripts.                   ##
+################################################################################################################################################
+
+import hashlib
+import inspect
+import json
+import os
+import zipfile
+
+import numpy as np
+
+import job_logging
+
+# Version of the cache format, increase it if the way the entries are stored changes (older entries will then simply be ignored)
+
+CACHE_VERSION = 2
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+class SourceLines:
+    """Cleaned lines (stripped, without blank lines) of a source file, read lazily from the disk each time they are iterated over. This allows a source file to be read once for computing its cache key and once more for modelling it, without keeping its whole content in memory.
+
+    Attributes
+    ----------
+    path : str
+        Path towards the source file.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, 'r') as source_file:
+          for line in source_file:
+            line = line.strip()
+            if line:
+              yield line
+
+#######################################################################
+
+def _encode(value, arrays:dict):
+    """Converts a value from the system dictionary into something that can be written in JSON, the NumPy arrays being moved into the ``arrays`` dictionary and replaced by a reference. Raises a TypeError if the value cannot be stored."""
+
+    if isinstance(value, np.ndarray):
+      name = "array_%s" % len(arrays)
+      arrays[name] = value
+      return {"__ndarray__": name}
+    elif isinstance(value, dict):
+      if not all(isinstance(key, str) for key in value):
+        raise TypeError ("Only dictionaries with string keys can be cached")
+      return {key: _encode(val, arrays) for key, val in value.items()}
+    elif isinstance(value, (list, tuple)):
+      return [_encode(val, arrays) for val in value]
+    elif isinstance(value, (complex, np.complexfloating)):
+      return {"__complex__": [float(value.real), float(value.imag)]}
+    elif isinstance(value, np.generic):
+      return value.item()
+    elif value is None or isinstance(value, (bool, int, float, str)):
+      return value
+    else:
+      raise TypeError ("Values of type %s cannot be cached" % type(value).__name__)
+
+#######################################################################
+
+def _decode(value, arrays):
+    """Rebuilds a value encoded by the _encode function."""
+
+    if isinstance(value, dict):
+      if "__ndarray__" in value:
+        return arrays[value["__ndarray__"]]
+      elif "__complex__" in value:
+        return complex(*value["__complex__"])
+      return {key: _decode(val, arrays) for key, val in value.items()}
+    elif isinstance(value, list):
+      return [_decode(val, arrays) for val in value]
+    else:
+      return value
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def get_key(modelling_fct, source_content) -> str:
+    """Computes the key identifying the system built by a modelling function from a source file. This key is the SHA-256 hash of the cleaned content of the source file, of the name of the modelling function and of the code of the modelling functions (so that any modification of that code invalidates the cache). It does not depend on the script calling the modelling function, so that the systems modelled by CONTROL LAUNCHER are reused by the results treatment scripts, and vice versa.
+
+    Parameters
+    ----------
+    modelling_fct : function
+        The modelling function.
+    source_content : list
+        Content of the source file. Each element of the list is a line of the file.
+
+    Returns
+    -------
+    key : str
+        Hexadecimal representation of the hash.
+    """
+
+    sha = hashlib.sha256()
+
+    # Version of the cache and of the modelling function
+
+    sha.update(("%s\n%s\n" % (CACHE_VERSION, modelling_fct.__name__)).encode())
+
+    for module in (inspect.getmodule(modelling_fct), modelling_fct.__globals__.get('control_common')):
+      if module is not None:
+        sha.update(inspect.getsource(module).encode())
+
+    # Content of the source file
+
+    for line in source_content:
+      sha.update(line.encode())
+      sha.update(b"\n")
+
+    key = sha.hexdigest()
+
+    return key
+
+#######################################################################
+
+def load_system(cache_dir:str, key:str):
+    """Loads a system dictionary from the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path towards the cache directory.
+    key : str
+        Key of the entry, as given by the get_key function.
+
+    Returns
+    -------
+    system : dict or None
+        The cached system dictionary, or None if there is no valid entry for this key.
+    log : str or None
+        What the modelling function printed when the entry was created (without the detailed tables), or None if there is no valid entry for this key.
+    """
+
+    meta_file = os.path.join(cache_dir, key + ".json")
+    arrays_file = os.path.join(cache_dir, key + ".npz")
+
+    # A broken or incomplete entry (e.g. written by another process at the same time) is simply treated as a missing one
+
+    try:
+      with open(meta_file, 'r') as f_meta:
+        meta = json.load(f_meta)
+      with np.load(arrays_file, allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+      if meta.get("version") != CACHE_VERSION:
+        return None, None
+      system = _decode(meta["system"], arrays)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+      return None, None
+
+    # Mark the entry as recently used (needed for the eviction of the least recently used entries)
+
+    try:
+      os.utime(meta_file)
+    except OSError:
+      pass
+
+    return system, meta.get("log", "")
+
+#######################################################################
+
+def save_system(cache_dir:str, key:str, system:dict, log:str, max_size:float):
+    """Stores a system dictionary in the cache, as a NumPy .npz file containing all the arrays and a JSON file containing everything else. The least recently used entries are then removed until the cache fits in its maximum size.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path towards the cache directory, it will be created if needed.
+    key : str
+        Key of the entry, as given by the get_key function.
+    system : dict
+        The system dictionary returned by the modelling function.
+    log : str
+        What the modelling function printed while building the system, without the detailed tables.
+    max_size : float
+        Maximum size of the cache, in MB.
+
+    Raises
+    ------
+    TypeError
+        If the system dictionary contains values that cannot be stored.
+    """
+
+    arrays = {}
+    meta = {"version": CACHE_VERSION, "system": _encode(system, arrays), "log": log}
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write the files under temporary names before renaming them, so that other processes never see a partial entry (the JSON file is renamed last as it marks the entry as complete)
+
+    tmp_suffix = ".%s.tmp" % os.getpid()
+    arrays_file = os.path.join(cache_dir, key + ".npz")
+    meta_file = os.path.join(cache_dir, key + ".json")
+
+    with open(arrays_file + tmp_suffix, 'wb') as f_arrays:
+      np.savez(f_arrays, **arrays)
+    with open(meta_file + tmp_suffix, 'w') as f_meta:
+      json.dump(meta, f_meta)
+
+    os.replace(arrays_file + tmp_suffix, arrays_file)
+    os.replace(meta_file + tmp_suffix, meta_file)
+
+    evict(cache_dir, max_size)
+
+#######################################################################
+
+def evict(cache_dir:str, max_size:float):
+    """Removes the least recently used entries of the cache until its total size is below the given maximum size.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path towards the cache directory.
+    max_size : float
+        Maximum size of the cache, in MB.
+    """
+
+    entries = []
+    total_size = 0
+
+    for entry in os.scandir(cache_dir):
+      if not entry.name.endswith(".json"):
+        continue
+      key = entry.name[:-len(".json")]
+      try:
+        size = entry.stat().st_size + os.stat(os.path.join(cache_dir, key + ".npz")).st_size
+        entries.append((entry.stat().st_mtime, key, size))
+      except OSError:
+        continue
+      total_size += size
+
+    for last_used, key, size in sorted(entries):
+      if total_size <= max_size * 1024 * 1024:
+        break
+      for ext in (".json", ".npz"):
+        try:
+          os.remove(os.path.join(cache_dir, key + ext))
+        except OSError:
+          pass
+      total_size -= size
+
+#######################################################################
+
+def cached_modelling(modelling_fct, source_content, cache_dir:str, max_size:float, **fct_kwargs) -> dict:
+    """Calls a modelling function, unless the system it would return for this source file has already been stored in the cache. In that case, the system is loaded from the cache and what the modelling function printed at the time is printed again. Since the entries are shared by all the scripts, whatever they print, the modelling function is always called without the detailed tables (see job_logging.show_tables), which are therefore absent from the log files of the systems going through the cache.
+
+    Parameters
+    ----------
+    modelling_fct : function
+        The modelling function (defined in modelling_fcts.py).
+    source_content : list
+        Content of the source file. Each element of the list is a line of the file. It is iterated over twice if the system is not in the cache (once for the key and once for the modelling function), so a ``SourceLines`` object can also be used.
+    cache_dir : str
+        Path towards the cache directory.
+    max_size : float
+        Maximum size of the cache, in MB.
+    **fct_kwargs
+        Additional keyword arguments given to the modelling function. They are not part of the key of the entry, so they must not modify the system itself.
+
+    Returns
+    -------
+    system : dict
+        The system dictionary, as returned by the modelling function.
+    """
+
+    key = get_key(modelling_fct, source_content)
+
+    if job_logging.tables_enabled():
+      print("\n(The detailed tables are not printed for the systems going through the cache: %s)" % cache_dir)
+
+    system, log = load_system(cache_dir, key)
+
+    if system is not None:
+      print(log, end="")
+      print("\n(This system has been loaded from the cache: %s)" % os.path.join(cache_dir, key))
+      return system
+
+    # Call the modelling function without the detailed tables, while recording its output
+
+    tables = job_logging.tables_enabled()
+    job_logging.show_tables(False)
+
+    try:
+      with job_logging.capture(tee=True) as tee:
+        system = modelling_fct(source_content, **fct_kwargs)
+    finally:
+      job_logging.show_tables(tables)
+
+    # Failing to store the system must not prevent the execution from going on
+
+    try:
+      save_system(cache_dir, key, system, tee.getvalue(), max_size)
+    except (OSError, TypeError) as error:
+      print("\nWARNING: The system could not be stored in the cache (%s)" % error)
+
+    return system
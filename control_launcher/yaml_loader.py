@@ -0,0 +1,171 @@
+################################################################################################################################################
+##                                                                YAML loader                                                                 ##
+##                                                                                                                                            ##
+##   This script contains the functions used to load and write the YAML files, with the C implementation of the YAML parser when available.   ##
+##       Each file is only parsed once per execution, and large files can be cached in a binary file so that they are only parsed again       ##
+##                                                        when they have been modified                                                        ##
+##                              It is shared by all the scripts of CHAINS, which import it from this directory.                               ##
+################################################################################################################################################
+
+import os
+import pickle
+
+import yaml
+
+# Version of the cache format, increase it if the way the content is stored changes (older cache files will then simply be ignored)
+
+CACHE_VERSION = 1
+
+# Use the C implementations of the YAML loader and dumper (libyaml) when PyYAML has been built with them, they are much faster than the pure Python ones.
+# Only the standard YAML tags are supported (no Python objects), which is all that the YAML files of CHAINS contain.
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Content of the files already loaded during this execution, stored in the pickle format along with the signature of the file (see the _signature function)
+
+_loaded = {}
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _signature(path:str) -> tuple:
+    """Returns what identifies the current version of a file: the version of the cache format, the time of the last modification of the file and its size."""
+
+    file_stat = os.stat(path)
+
+    return (CACHE_VERSION, file_stat.st_mtime_ns, file_stat.st_size)
+
+#######################################################################
+
+def _cache_path(path:str) -> str:
+    """Returns the path towards the binary cache file of a YAML file (a hidden file next to it)."""
+
+    return os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".pickle")
+
+#######################################################################
+
+def _read_cache(path:str, signature:tuple):
+    """Returns the pickled content of a YAML file from its binary cache file, or None if there is no valid cache file for this version of the YAML file."""
+
+    # A missing, broken or outdated cache file is simply ignored
+
+    try:
+      with open(_cache_path(path), 'rb') as f_cache:
+        cached = pickle.load(f_cache)
+      if cached["signature"] == signature:
+        return cached["content"]
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, TypeError, AttributeError):
+      pass
+
+    return None
+
+#######################################################################
+
+def _write_cache(path:str, signature:tuple, pickled:bytes):
+    """Writes the pickled content of a YAML file in its binary cache file. Failing to do so (e.g. in a read-only directory) does not prevent the execution from going on."""
+
+    # Write the file under a temporary name before renaming it, so that other processes never read a partial file
+
+    cache_file = _cache_path(path)
+    tmp_file = "%s.%s.tmp" % (cache_file, os.getpid())
+
+    try:
+      with open(tmp_file, 'wb') as f_cache:
+        pickle.dump({"signature": signature, "content": pickled}, f_cache, protocol=pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp_file, cache_file)
+    except OSError:
+      try:
+        os.remove(tmp_file)
+      except OSError:
+        pass
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def load(path:str, binary_cache:bool=False):
+    """Loads the content of a YAML file. A file that has already been loaded during this execution is not parsed again, unless it has been modified since then. Each call returns a new copy of the content, which can thus be freely modified.
+
+    Parameters
+    ----------
+    path : str
+        Path towards the YAML file.
+    binary_cache : bool, optional
+        Whether to also keep the content of the file in a binary (pickle) cache file, named .<filename>.pickle and placed next to the YAML file, by default False. This is worth it for large files that are loaded by several executions, since loading the cache file is much faster than parsing the YAML file.
+
+    Returns
+    -------
+    content
+        The content of the YAML file (usually a dictionary or a list).
+    """
+
+    path = os.path.abspath(path)
+    signature = _signature(path)
+
+    # File already loaded during this execution
+
+    if path in _loaded and _loaded[path][0] == signature:
+      return pickle.loads(_loaded[path][1])
+
+    # File stored in its binary cache file
+
+    pickled = _read_cache(path, signature) if binary_cache else None
+
+    if pickled is not None:
+      content = pickle.loads(pickled)
+
+    # Otherwise, parse the file
+
+    else:
+      with open(path, 'r', encoding='utf-8') as f_yaml:
+        content = yaml.load(f_yaml, Loader=LOADER)
+      pickled = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
+      if binary_cache:
+        _write_cache(path, signature, pickled)
+
+    _loaded[path] = (signature, pickled)
+
+    return content
+
+#######################################################################
+
+def dump(content, path:str, binary_cache:bool=False, Dumper=DUMPER, **kwargs):
+    """Writes some content in a YAML file, which is replaced in a single operation so that it can be read at any time.
+
+    Parameters
+    ----------
+    content
+        What needs to be written (usually a dictionary or a list).
+    path : str
+        Path towards the YAML file.
+    binary_cache : bool, optional
+        Whether to also write the binary cache file of the YAML file (see the load function), by default False.
+    Dumper : optional
+        YAML dumper class, by default the C implementation of the safe dumper when available.
+    **kwargs
+        Additional keyword arguments given to yaml.dump (e.g. sort_keys).
+    """
+
+    path = os.path.abspath(path)
+    tmp_file = "%s.%s.tmp" % (path, os.getpid())
+
+    with open(tmp_file, 'w', encoding='utf-8') as f_yaml:
+      yaml.dump(content, f_yaml, Dumper=Dumper, **kwargs)
+
+    os.replace(tmp_file, path)
+
+    # The content is stored as it will be loaded back, so that the YAML file does not need to be parsed again
+
+    signature = _signature(path)
+    pickled = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if binary_cache:
+      _write_cache(path, signature, pickled)
+
+    _loaded[path] = (signature, pickled)
@@ -71,6 +71,12 @@ else
   file_list=$(ls ${END_FILEPATH} 2>/dev/null)
   mkdir -p "${treatment_logs}"
   mkdir -p "${WATCH_DIR}/treated"
+
+  # The results are compiled in a results store, where each molecule is updated on its own. If the results were previously compiled in a YAML file, import it first.
+
+  if [ ! -f "${treated_dir}/comp_results.db" ] && [ -f "${treated_dir}/comp_results.yml" ]; then
+    python "${treatment_dir}/results_store.py" -db "${treated_dir}/comp_results.db" -i "${treated_dir}/comp_results.yml" > "${treatment_logs}/$(date +"%Y%m%d_%H%M%S")_import_results.log"
+  fi
   
   for filepath in ${file_list}
   do
@@ -79,11 +85,11 @@ else
     logfile="${treatment_logs}/$(date +"%Y%m%d_%H%M%S")_${filename%.end}.log"
     mkdir -p "${treated_dir}/pulses_plots"
     python "${treatment_dir}/plot_pulses.py" -s "${results_dir}/${MOL_NAME}" -o "${treated_dir}/pulses_plots" -qt 0.1 > ${logfile}
-    python "${treatment_dir}/results_treatment.py" -s "${results_dir}/${MOL_NAME}" -o "${treated_dir}/comp_results.yml" >> ${logfile}
+    python "${treatment_dir}/results_treatment.py" -s "${results_dir}/${MOL_NAME}" -db "${treated_dir}/comp_results.db" >> ${logfile}
     mv "${filepath}" "${WATCH_DIR}/treated"
   done
 
-  #python "${treatment_dir}/plot_results.py" -i "${treated_dir}/comp_results.yml" -o "${treated_dir}" > "${treatment_logs}/$(date +"%Y%m%d_%H%M%S")_plot_results.log"
+  #python "${treatment_dir}/plot_results.py" -db "${treated_dir}/comp_results.db" -o "${treated_dir}" > "${treatment_logs}/$(date +"%Y%m%d_%H%M%S")_plot_results.log"
 
   echo -e "$(date +"%Y-%m-%d %T")\tINFO - Successfully processed:\n${file_list}"
 
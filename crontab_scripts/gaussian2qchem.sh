@@ -53,13 +53,21 @@ abin_dir="${chains_path}/abin_launcher"
 
 abin_logs="${WATCH_DIR}/abin_logs"
 
+# Define the backlog file where ABIN LAUNCHER defers the jobs that would exceed the submission limits of the cluster
+
+backlog="${out_dir}/.submit_backlog.json"
+
 ####################################
 #         Start of execution       #
 ####################################
 
-# Exit immediately if there's no file to process
+# If there's no file to process, only submit the jobs left in the backlog by the previous executions (if any) then exit. The number of jobs in the queue is checked by ABIN LAUNCHER itself, based on the limits defined in its clusters configuration file (see job_submission.py).
 
 if [ $(ls ${XYZ_FILEPATH} 2>/dev/null | wc -l) -eq 0 ]; then
+  if grep -qs '"job_dir"' "${backlog}"; then
+    mkdir -p "${abin_logs}"
+    python "${chains_path}/control_launcher/job_submission.py" -dr "${backlog}" --cluster "${cluster_name}" --clusters_file "${abin_dir}/clusters.yml" > "${abin_logs}/$(date +"%Y%m%d_%H%M%S")_backlog.log"
+  fi
   exit
 
 # Otherwise execute abin_launcher.py for each file present in the WATCH_DIR directory
@@ -52,39 +52,41 @@ control_dir="${chains_path}/control_launcher"
 
 control_logs="${WATCH_DIR}/control_logs"
 
+# Define the backlog file where CONTROL LAUNCHER defers the jobs that would exceed the submission limits of the cluster
+
+backlog="${out_dir}/.submit_backlog.json"
+
 ####################################
 #         Start of execution       #
 ####################################
 
-# Exit immediately if there's no file to process
+# If there's no file to process, only submit the jobs left in the backlog by the previous executions (if any) then exit. The number of jobs in the queue is checked by CONTROL LAUNCHER itself, based on the limits defined in its clusters configuration file (see job_submission.py).
 
 if [ $(ls ${OUT_FILEPATH} 2>/dev/null | wc -l) -eq 0 ]; then
+  if grep -qs '"job_dir"' "${backlog}"; then
+    mkdir -p "${control_logs}"
+    python "${control_dir}/job_submission.py" -dr "${backlog}" --cluster "${cluster_name}" > "${control_logs}/$(date +"%Y%m%d_%H%M%S")_backlog.log"
+  fi
   exit
 fi
 
-# Otherwise execute control_launcher.py for each file present in the WATCH_DIR directory
+# Otherwise execute control_launcher.py once for all the files present in the WATCH_DIR directory (batch mode, each file keeps its own data and job log files)
 
 file_list=$(ls ${OUT_FILEPATH} 2>/dev/null)
 mkdir -p "${control_logs}"
+mkdir -p "${out_dir}"
+
+python "${control_dir}/control_launcher.py" -p qoctra -ss "${OUT_FILEPATH}" -cf "${chains_path}/configs/qoctra/mgw.yml" -o "${out_dir}" -cl "${cluster_name}" -ow -as > "${control_logs}/$(date +"%Y%m%d_%H%M%S")_batch_OPC.log"
+
+# The files that have been successfully processed have been archived by CONTROL LAUNCHER (and are therefore no longer in WATCH_DIR)
+
 treated_files=()
 
 for filepath in ${file_list}
 do
-
-  # Check if there is not too many jobs already submitted and break the loop if this is the case
-
-  if [ $(\squeue -u niacobel | wc -l) -gt 250 ]; then
-    break
+  if [ ! -f "${filepath}" ]; then
+    treated_files+=("$(basename -- "${filepath}")")
   fi
-
-  # Execute CONTROL LAUNCHER
-
-  filename="$(basename -- "${filepath}")"
-  MOL_NAME=${filename%.*}
-  mkdir -p "${out_dir}"
-  python "${control_dir}/control_launcher.py" -p qoctra -s "${filepath}" -cf "${chains_path}/configs/qoctra/mgw.yml" -o "${out_dir}" -cl "${cluster_name}" -ow -as > "${control_logs}/$(date +"%Y%m%d_%H%M%S")_${MOL_NAME}_OPC.log"
-  treated_files+=("${filename}")
-
 done
 
 # If at least one file was treated, leave a notification in the crontab script log file
@@ -10,11 +10,12 @@
 ########################################################################################################################################################
 
 import argparse
-import csv
 import os
-import re
 import shutil
-from statistics import mean
+
+import numpy as np
+
+import pcp_scanner
 
 # =================================================================== #
 # =================================================================== #
@@ -115,6 +116,7 @@ required.add_argument('-o', '--out_dir', type=str, help="Path to the directory w
 
 optional = parser.add_argument_group('Optional arguments')
 optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument("-t","--threads", type=int, default=4, help="Number of threads used to read the result files of the jobs, by default 4.")
 
 # =================================================================== #
 # =================================================================== #
@@ -155,6 +157,10 @@ def main():
     results_dir = args.results_dir           # Path to the directory containing the results of the frequency filters variation
     out_dir = args.out_dir                   # Path to the directory where the compiled results and the best parameters combo files will be stored
 
+    # Optional arguments
+
+    threads = args.threads                   # Number of threads used to read the result files of the jobs
+
     # ========================================================= #
     # Check arguments                                           #
     # ========================================================= #
@@ -167,6 +173,11 @@ def main():
     out_dir = check_abspath(out_dir,"Command line argument -o / --out_dir","directory")
     print ("{:<40} {:<100}".format('\nOutput directory:',out_dir))
 
+    # Check the number of threads
+
+    if threads < 1:
+      raise FF_Error ("ERROR: The number of threads (-t / --threads) must be at least 1.")
+
   # ========================================================= #
   # Exception handling for the preparation step               #
   # ========================================================= #
@@ -186,104 +197,11 @@ def main():
 
     print ("{:<40}".format('\nCompiling the results ...'), end="")
 
-    # Initialize the compiled results list of dictionaries
-
-    comp_results = []
-
-    # Look for directories in the results directory (see https://stackoverflow.com/questions/800197/how-to-get-all-of-the-immediate-subdirectories-in-python for reference).
-
-    dir_list_all = [dir.name for dir in os.scandir(results_dir) if dir.is_dir()]
-
-    # Only keep the xxx_windX'-type directories
-
-    dir_list = []
-
-    for dirname in dir_list_all:
- 
-      # Define the 'xxx_windX' regex and apply it to the dirname
-
-      pattern = re.compile(r"^\d+_(?P<suffix>wind\d+)$")
-      matching_dir = pattern.match(dirname)
-
-      # If it matches the regex, collect the data
-
-      if matching_dir is not None:
-
-        dir_list.append(dirname)
-        suffix = matching_dir.group("suffix")
-
-        param_file_path = os.path.join(results_dir, dirname, "param_%s.nml" % suffix)
-
-        with open(param_file_path, 'r') as param_file:
-          param_content = param_file.read().splitlines()
-
-        alpha_pattern = re.compile(r'^\s+alpha\s+=\s+(?P<alpha>\d+\.\d+d[+-]\d+)')
-        window_pattern = re.compile(r'^\s+spectral_filter_fwhm\s+=\s+(?P<window>\d+\.\d+d[+-]\d+)')
-        cent_freq_pattern = re.compile(r"^\s*spectral_filter_center\s+=\s+(?P<cent_freq>\d+\.\d+[dD][+-]?\d+)")
-
-        for line in param_content:
+    # Gather the results of all the 'xxx_windX'-type directories into a table, with one line per directory (see pcp_scanner.py for details)
 
-          if alpha_pattern.match(line): 
-            alpha = float((alpha_pattern.match(line).group('alpha')).replace('d','e'))
+    comp_results = pcp_scanner.scan_results(results_dir, r"^\d+_(?P<suffix>wind\d+)$", nml_file="param_{suffix}.nml", nml_fields={"Alpha": "alpha", "Window (cm-1)": "spectral_filter_fwhm", "Central frequency (cm-1)": "spectral_filter_center"}, fluence=True, threads=threads)
 
-          elif window_pattern.match(line): 
-            window = float((window_pattern.match(line).group('window')).replace('d','e'))
-
-          elif cent_freq_pattern.match(line): 
-            cent_freq = float((cent_freq_pattern.match(line).group('cent_freq')).replace('d','e'))
-
-        # Prepare to store information specific to this calculation
-
-        data = {
-            "Directory" : dirname,
-            "Alpha" : alpha,
-            "Window (cm-1)" : window,
-            "Central frequency (cm-1)" : cent_freq
-        }
-
-        # Iterate over all the PCP directories
-
-        pcp_dirs = [dir.name for dir in os.scandir(os.path.join(results_dir, dirname)) if dir.is_dir() and (dir.name).startswith("PCP_")]
-        orientations = [] # List of all possible orientations
-
-        for pcp_dir in pcp_dirs:
-
-          pcp_file_path = os.path.join(results_dir, dirname, pcp_dir, "obj.res")
-          orientation = pcp_dir.partition("PCP_")[2]
-
-          with open(pcp_file_path, 'r') as pcp_f:
-            file_content = pcp_f.read()
-
-          # Define the expression patterns for the lines of the iterations file
-          # For example "      0     1  1sec |Proba_moy  0.693654D-04 |Fidelity(U)  0.912611D-01 |Chp  0.531396D-04 -0.531399D-04 |Aire -0.202724D-03 |Fluence  0.119552D-03 |Recou(i)  0.693654D-04 |Tr_dist(i) -0.384547D-15 |Tr(rho)(i)  0.100000D+01 |Tr(rho^2)(i)  0.983481D+00 |Projector  0.100000D+01"
-          rx_pcp_line = re.compile(r"^\s+\d+\s+\d+\s+\d+(?:sec|min)\s\|Proba_moy\s+\d\.\d+D[+-]\d+\s\|Fidelity\(U\)\s+(?P<fidelity>\d\.\d+D[+-]\d+)\s\|Chp\s+\d\.\d+D[+-]\d+\s+-?\d\.\d+D[+-]\d+\s\|Aire\s+-?\d\.\d+D[+-]\d+\s\|Fluence\s+(?P<fluence>\d\.\d+D[+-]\d+)\s\|Recou\(i\)\s+(?P<overlap>\d\.\d+D[+-]\d+)\s\|Tr_dist\(i\)\s+-?\d\.\d+D[+-]\d+\s\|Tr\(rho\)\(i\)\s+\d\.\d+D[+-]\d+\s\|Tr\(rho\^2\)\(i\)\s+\d\.\d+D[+-]\d+\s\|Projector\s+(?P<projector>\d\.\d+D[+-]\d+)")
-
-          # Get the values
-
-          line_data = rx_pcp_line.match(file_content)
-          if line_data is not None:
-            for key in ['projector','overlap','fidelity','fluence']:
-
-              raw_value = line_data.group(key)
-              value = float(re.compile(r'(\d*\.\d*)[dD]([-+]?\d+)').sub(r'\1E\2', raw_value)) # Replace the possible d/D from Fortran double precision float format with an "E", understandable by Python)
-              if key != 'fluence':
-                value = min (value, 1)
-              
-              data_key = orientation + "_" + key.capitalize() if key != 'fluence' else key.capitalize()
-              data.update({
-                data_key : value
-              })
-            
-            orientations.append(orientation) # Will be reused later
-
-          else:
-            raise FF_Error ("ERROR: Unable to get the values from the file %s" % pcp_file_path) 
-
-        # Store information specific to this calculation
-
-        comp_results.append(data)
-
-    if dir_list == []:
+    if comp_results.size == 0:
       raise FF_Error ("ERROR: Can't find any 'xxx_windXXX' directory in %s" % results_dir)
 
     print("[ DONE ]")
@@ -292,7 +210,7 @@ def main():
   # Exception handling for the results compilation            #
   # ========================================================= #
 
-  except FF_Error as error:
+  except (FF_Error, pcp_scanner.ScanError) as error:
     print("")
     print(error)
     exit(-1)
@@ -305,14 +223,9 @@ def main():
 
   print ("{:<40}".format('\nIdentifying most interesting combos ...'), end="")
 
-  # Identify the best orientation
+  # Identify the best orientation (the one with the highest mean projector)
 
-  highest_mean = -float('inf')
-  for orientation in orientations:
-    proj_mean = mean([data[orientation + "_Projector"] for data in comp_results])
-    if proj_mean > highest_mean:
-      highest_mean = proj_mean
-      best_ori = orientation
+  best_ori = max(pcp_scanner.get_orientations(comp_results), key=lambda orientation: np.mean(comp_results[orientation + "_Projector"]))
 
   #! Most interesting combinations: the ones just higher than 90%, 75%, 50% and 25% ?
 
@@ -328,16 +241,7 @@ def main():
 
   print ("{:<40}".format('\nCreating CSV file ...'), end="")
 
-  csv_header = [key for key in comp_results[0].keys() if key != 'Directory']
-
-  with open(os.path.join(out_dir,'filt_freq_comp_results.csv'), 'w', newline='', encoding='utf-8') as csvfile:
-
-    csv_writer = csv.DictWriter(csvfile, fieldnames=csv_header, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-    csv_writer.writeheader()
-
-    for data in comp_results:
-      del data['Directory']
-      csv_writer.writerow(data)  
+  pcp_scanner.write_csv(comp_results, os.path.join(out_dir,'filt_freq_comp_results.csv'))
 
   print("[ DONE ]")
 
@@ -0,0 +1,318 @@
+################################################################################################################################################
+##                                                            PCP results scanner                                                             ##
+##                                                                                                                                            ##
+##            This script contains the functions used by the treatment scripts of the control procedures (aldu_param_treatment.py,            ##
+##              const_var_treatment.py and filt_freq_treatment.py) to scan the results of the PCP calculations of all their jobs              ##
+##                                                   and to gather them into a single table                                                   ##
+################################################################################################################################################
+
+import concurrent.futures
+import csv
+import os
+import re
+
+import numpy as np
+
+# Pattern of the first line of the obj.res file of a PCP calculation, which contains the final values of the calculation
+# For example "      0     1  1sec |Proba_moy  0.693654D-04 |Fidelity(U)  0.912611D-01 |Chp  0.531396D-04 -0.531399D-04 |Aire -0.202724D-03 |Fluence  0.119552D-03 |Recou(i)  0.693654D-04 |Tr_dist(i) -0.384547D-15 |Tr(rho)(i)  0.100000D+01 |Tr(rho^2)(i)  0.983481D+00 |Projector  0.100000D+01"
+
+RX_PCP_LINE = re.compile(r"^\s+\d+\s+\d+\s+\d+(?:sec|min)\s\|Proba_moy\s+\d\.\d+D[+-]\d+\s\|Fidelity\(U\)\s+(?P<fidelity>\d\.\d+D[+-]\d+)\s\|Chp\s+\d\.\d+D[+-]\d+\s+-?\d\.\d+D[+-]\d+\s\|Aire\s+-?\d\.\d+D[+-]\d+\s\|Fluence\s+(?P<fluence>\d\.\d+D[+-]\d+)\s\|Recou\(i\)\s+(?P<overlap>\d\.\d+D[+-]\d+)\s\|Tr_dist\(i\)\s+-?\d\.\d+D[+-]\d+\s\|Tr\(rho\)\(i\)\s+\d\.\d+D[+-]\d+\s\|Tr\(rho\^2\)\(i\)\s+\d\.\d+D[+-]\d+\s\|Projector\s+(?P<projector>\d\.\d+D[+-]\d+)")
+
+# Values of the obj.res files stored for each orientation, and the suffix of their column in the table (the values of those columns cannot exceed 1)
+
+PCP_VALUES = [("projector", "_Projector"), ("overlap", "_Overlap"), ("fidelity", "_Fidelity")]
+
+# Pattern of the lines of the Fortran namelist files (param.nml) defining a numerical variable, e.g. "  fluence = 0.100000d+01"
+
+RX_NML_LINE = re.compile(r"^\s*(?P<name>\w+)\s*=\s*(?P<value>[-+]?\d*\.?\d+(?:[eEdD][-+]?\d+)?)")
+
+# =================================================================== #
+# =================================================================== #
+#                        EXCEPTIONS DEFINITIONS                       #
+# =================================================================== #
+# =================================================================== #
+
+class Error(Exception):
+    """Base class for exceptions in this script."""
+    pass
+
+class ScanError(Error):
+    """Exception raised when the result files of a job cannot be read.
+
+    Attributes
+    ----------
+    message : str
+        Proper error message explaining the error.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _natural_key(name:str) -> list:
+    """Sorting key putting the numbers contained in a name in numerical order (e.g. "2_wind5" before "10_wind5")."""
+
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+#######################################################################
+
+def _scan_job(job_dir:str, nml_path:str=None, nml_names:list=None):
+    """Reads the result files of a job directory: the first line of the obj.res file of each PCP_<orientation> subdirectory and, if needed, some variables of the parameters file. This is what is executed by the threads of the scan_results function.
+
+    Returns
+    -------
+    nml_values : dict
+        Dictionary associating the name of each variable of the parameters file with its raw value.
+    pcp_values : dict
+        Dictionary associating each orientation with the raw values of the obj.res file (see the read_pcp_header function).
+    """
+
+    nml_values = read_namelist(nml_path, nml_names) if nml_path else {}
+
+    pcp_values = {}
+
+    for pcp_dir in os.scandir(job_dir):
+      if pcp_dir.is_dir() and pcp_dir.name.startswith("PCP_"):
+        pcp_values[pcp_dir.name.partition("PCP_")[2]] = read_pcp_header(os.path.join(pcp_dir.path, "obj.res"))
+
+    return nml_values, pcp_values
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def fortran_to_float(raw_values) -> np.ndarray:
+    """Converts numbers written as strings, possibly in the Fortran double precision format (e.g. "0.693654D-04"), into floats. All the values are converted in a single pass, the d/D exponents being replaced by an "E" understandable by Python.
+
+    Parameters
+    ----------
+    raw_values : list or np.ndarray
+        The numbers to convert, as strings (of any shape).
+
+    Returns
+    -------
+    values : np.ndarray
+        Array of the same shape, containing the converted numbers.
+    """
+
+    raw_values = np.asarray(raw_values, dtype=str)
+
+    if raw_values.size == 0:
+      return np.zeros(raw_values.shape)
+
+    return np.char.replace(np.char.replace(raw_values, 'D', 'E'), 'd', 'E').astype(np.float64)
+
+#######################################################################
+
+def read_pcp_header(pcp_file_path:str) -> dict:
+    """Reads the final values of a PCP calculation from the first line of its obj.res file (the rest of the file is not read).
+
+    Parameters
+    ----------
+    pcp_file_path : str
+        Path towards the obj.res file.
+
+    Returns
+    -------
+    raw_values : dict
+        Dictionary associating "projector", "overlap", "fidelity" and "fluence" with their raw value (in the Fortran double precision format).
+
+    Raises
+    ------
+    ScanError
+        If the first line of the file does not contain the values.
+    """
+
+    first_line = ""
+
+    with open(pcp_file_path, 'r') as pcp_file:
+      for line in pcp_file:
+        if line.strip():
+          first_line = line
+          break
+
+    line_data = RX_PCP_LINE.match(first_line)
+
+    if line_data is None:
+      raise ScanError ("ERROR: Unable to get the values from the file %s" % pcp_file_path)
+
+    return line_data.groupdict()
+
+#######################################################################
+
+def read_namelist(nml_path:str, names:list) -> dict:
+    """Reads the values of some numerical variables from a Fortran namelist file (e.g. the param.nml file of a QOCT-GRAD calculation). The file is only read until all the variables have been found.
+
+    Parameters
+    ----------
+    nml_path : str
+        Path towards the namelist file.
+    names : list
+        Names of the variables (case insensitive, as in Fortran).
+
+    Returns
+    -------
+    raw_values : dict
+        Dictionary associating the name of each variable (as given) with its raw value (possibly in the Fortran double precision format).
+
+    Raises
+    ------
+    ScanError
+        If some of the variables cannot be found in the file.
+    """
+
+    wanted = {name.lower(): name for name in names}
+    raw_values = {}
+
+    with open(nml_path, 'r') as nml_file:
+      for line in nml_file:
+        match = RX_NML_LINE.match(line)
+        if match and match.group('name').lower() in wanted:
+          raw_values.setdefault(wanted[match.group('name').lower()], match.group('value'))
+          if len(raw_values) == len(wanted):
+            break
+
+    missing = [name for name in names if name not in raw_values]
+
+    if missing:
+      raise ScanError ("ERROR: Unable to find the value of %s in the file %s" % (", ".join(missing), nml_path))
+
+    return raw_values
+
+#######################################################################
+
+def scan_results(results_dir:str, dir_pattern:str, dir_fields:dict=None, nml_file:str=None, nml_fields:dict=None, fluence:bool=True, threads:int=1) -> np.ndarray:
+    """Scans the job directories of a control procedure and gathers the results of their PCP calculations into a single table.
+
+    Parameters
+    ----------
+    results_dir : str
+        Path towards the directory containing the job directories.
+    dir_pattern : str
+        Regular expression matching the names of the job directories (the other directories are ignored).
+    dir_fields : dict, optional
+        Dictionary associating the name of some columns of the table with a group of the regular expression, whose value is a number (e.g. {"Alpha": "alpha"}).
+    nml_file : str, optional
+        Name of the parameters file in each job directory, where the groups of the regular expression can be used (e.g. "param_{suffix}.nml").
+    nml_fields : dict, optional
+        Dictionary associating the name of some columns of the table with a variable of the parameters file (e.g. {"Window (cm-1)": "spectral_filter_fwhm"}).
+    fluence : bool, optional
+        Whether the fluence of the pulse, read from the obj.res files, needs to be added to the table (as the "Fluence" column), by default True.
+    threads : int, optional
+        Number of threads used to read the files, by default 1. Since reading the files is mostly waiting for the (shared) file system, using several threads speeds up the scan even on a single core.
+
+    Returns
+    -------
+    table : np.ndarray
+        Structured array containing one line per job directory (in the natural order of their names), with the name of the directory ("Directory"), the columns defined by dir_fields and nml_fields, and then the projector, overlap and fidelity of each orientation (e.g. "X_Projector"), with the "Fluence" column after those of the first orientation. The values missing for some orientations are NaN.
+
+    Raises
+    ------
+    ScanError
+        If the result files of a job directory cannot be read.
+    """
+
+    dir_fields = dir_fields or {}
+    nml_fields = nml_fields or {}
+    dir_regex = re.compile(dir_pattern)
+
+    # Look for the job directories (see https://stackoverflow.com/questions/800197/how-to-get-all-of-the-immediate-subdirectories-in-python for reference)
+
+    job_dirs = []
+
+    for job_dir in os.scandir(results_dir):
+      matching_dir = dir_regex.match(job_dir.name) if job_dir.is_dir() else None
+      if matching_dir is not None:
+        job_dirs.append((job_dir.name, matching_dir))
+
+    job_dirs.sort(key=lambda job: _natural_key(job[0]))
+
+    # Read the files of all the job directories, possibly in parallel (the results are kept in the same order)
+
+    scan_args = [(os.path.join(results_dir, dirname), os.path.join(results_dir, dirname, nml_file.format(**matching_dir.groupdict())) if nml_file else None, list(nml_fields.values())) for dirname, matching_dir in job_dirs]
+
+    if threads > 1 and len(scan_args) > 1:
+      with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        scanned = list(executor.map(lambda args: _scan_job(*args), scan_args))
+    else:
+      scanned = [_scan_job(*args) for args in scan_args]
+
+    # Define the columns of the table
+
+    orientations = sorted({orientation for nml_values, pcp_values in scanned for orientation in pcp_values})
+
+    columns = list(dir_fields) + list(nml_fields)
+
+    for index, orientation in enumerate(orientations):
+      columns.extend(orientation + suffix for key, suffix in PCP_VALUES)
+      if fluence and index == 0:
+        columns.append("Fluence")
+
+    # Gather all the raw values, then convert them all at once
+
+    raw_table = []
+
+    for (dirname, matching_dir), (nml_values, pcp_values) in zip(job_dirs, scanned):
+      raw_line = {column: matching_dir.group(group) for column, group in dir_fields.items()}
+      raw_line.update({column: nml_values[name] for column, name in nml_fields.items()})
+      for orientation, raw_values in pcp_values.items():
+        raw_line.update({orientation + suffix: raw_values[key] for key, suffix in PCP_VALUES})
+        raw_line["Fluence"] = raw_values["fluence"]
+      raw_table.append([raw_line.get(column, "nan") for column in columns])
+
+    values = fortran_to_float(raw_table).reshape(len(job_dirs), len(columns))
+
+    # Build the table
+
+    table = np.empty(len(job_dirs), dtype=[("Directory", "U%d" % max([len(dirname) for dirname, matching_dir in job_dirs] + [1]))] + [(column, np.float64) for column in columns])
+    table["Directory"] = [dirname for dirname, matching_dir in job_dirs]
+
+    for index, column in enumerate(columns):
+      if any(column.endswith(suffix) for key, suffix in PCP_VALUES):
+        table[column] = np.minimum(values[:, index], 1)
+      else:
+        table[column] = values[:, index]
+
+    return table
+
+#######################################################################
+
+def get_orientations(table:np.ndarray) -> list:
+    """Returns the orientations present in a table built by the scan_results function."""
+
+    return [name[:-len("_Projector")] for name in table.dtype.names if name.endswith("_Projector")]
+
+#######################################################################
+
+def write_csv(table:np.ndarray, csv_path:str, extra_columns:dict=None):
+    """Writes a table built by the scan_results function into a CSV file, without its "Directory" column. The missing values are left empty.
+
+    Parameters
+    ----------
+    table : np.ndarray
+        The table to write.
+    csv_path : str
+        Path towards the CSV file.
+    extra_columns : dict, optional
+        Dictionary associating the name of some additional columns with their values (e.g. {"Best": best_mask}), one per line of the table.
+    """
+
+    extra_columns = extra_columns or {}
+    header = [name for name in table.dtype.names if name != "Directory"] + list(extra_columns)
+
+    columns = [table[name].tolist() for name in table.dtype.names if name != "Directory"] + [np.asarray(values).tolist() for values in extra_columns.values()]
+
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+
+      csv_writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+      csv_writer.writerow(header)
+
+      for line in zip(*columns):
+        csv_writer.writerow(["" if isinstance(value, float) and value != value else value for value in line])
@@ -17,13 +17,18 @@ from inspect import getsourcefile
 
 import matplotlib.pyplot as plt
 import numpy as np
-import yaml
 from cycler import cycler
 from matplotlib.ticker import AutoMinorLocator
 from scipy import constants
 
 import results_common
 
+# YAML loader shared by all the scripts of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+yaml_loader = results_common.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
 # =================================================================== #
 # =================================================================== #
 #                        FUNCTIONS DEFINITIONS                        #
@@ -135,8 +140,7 @@ def main():
       config_file = os.path.join(code_dir, "results_config.yml")
 
     print ("{:<40} {:<99}".format('\nLoading the configuration file',config_file + " ..."), end="")
-    with open(config_file, 'r') as f_config:
-      config = yaml.load(f_config, Loader=yaml.FullLoader)
+    config = yaml_loader.load(config_file)
     print('%12s' % "[ DONE ]")
 
     res_dpi = 400
@@ -214,8 +218,7 @@ def main():
   sizes_litt_file = results_common.check_abspath(os.path.join(inp_dir,"sizes_litt.yml"),"Sizes litterature values YAML file","file")
 
   print ("{:<50} {:<89}".format('\nLoading the sizes litterature values YAML file',sizes_litt_file + " ..."), end="")
-  with open(sizes_litt_file, 'r') as f_yml:
-    sizes_litt = yaml.load(f_yml, Loader=yaml.FullLoader)
+  sizes_litt = yaml_loader.load(sizes_litt_file)
   print('%12s' % "[ DONE ]")
 
   # Plot the graph
@@ -319,8 +322,7 @@ def main():
   gaps_litt_file = results_common.check_abspath(os.path.join(inp_dir,"gaps_litt.yml"),"Gaps litterature values YAML file","file")
 
   print ("{:<50} {:<89}".format('\nLoading the gaps litterature values YAML file',gaps_litt_file + " ..."), end="")
-  with open(gaps_litt_file, 'r') as f_yml:
-    gaps_litt = yaml.load(f_yml, Loader=yaml.FullLoader)
+  gaps_litt = yaml_loader.load(gaps_litt_file)
   print('%12s' % "[ DONE ]")
 
   # Plot the graph
@@ -523,8 +525,7 @@ def main():
   ips_litt_file = results_common.check_abspath(os.path.join(inp_dir,"ips_litt.yml"),"IPs litterature values YAML file","file")
 
   print ("{:<50} {:<89}".format('\nLoading the IPs litterature values YAML file',ips_litt_file + " ..."), end="")
-  with open(ips_litt_file, 'r') as f_yml:
-    ips_litt = yaml.load(f_yml, Loader=yaml.FullLoader)
+  ips_litt = yaml_loader.load(ips_litt_file)
   print('%12s' % "[ DONE ]")
 
   # Plot the graph
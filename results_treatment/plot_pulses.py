@@ -23,7 +23,6 @@ import matplotlib.mathtext
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import yaml
 from cycler import cycler
 from matplotlib.ticker import AutoMinorLocator
 from scipy import constants
@@ -31,6 +30,12 @@ from scipy.fft import rfft, rfftfreq
 
 import results_common
 
+# YAML loader shared by all the scripts of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+yaml_loader = results_common.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
 # =================================================================== #
 # =================================================================== #
 #                        FUNCTIONS DEFINITIONS                        #
@@ -155,16 +160,29 @@ def main():
       config_file = os.path.join(code_dir, "results_config.yml")
 
     print ("{:<40} {:<99}".format('\nLoading the configuration file',config_file + " ..."), end="")
-    with open(config_file, 'r') as f_config:
-      config = yaml.load(f_config, Loader=yaml.FullLoader)
+    config = yaml_loader.load(config_file)
     print('%12s' % "[ DONE ]")
 
     res_dpi = 400
 
+    # CHAINS YAML configuration file
+    # ==============================
+
+    chains_path = os.path.dirname(code_dir)
+    chains_config_file = results_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
+
+    print ("{:<140}".format("\nLoading CHAINS configuration YAML file ..."), end="")
+    chains_config = yaml_loader.load(chains_config_file)
+    print('%12s' % "[ DONE ]")
+
+    # The systems are loaded from the cache of CONTROL LAUNCHER if it has been defined in the CHAINS configuration file
+
+    system_cache_dir = chains_config.get("system_cache_dir")
+    system_cache_size = chains_config.get("system_cache_size", 2000)
+
     # ABIN LAUNCHER's geom_scan.py file
     # =================================
 
-    chains_path = os.path.dirname(code_dir)
     geom_scan_path = os.path.join(chains_path,"abin_launcher","geom_scan.py")
 
     print ("{:<140}".format("\nImporting ABIN LAUNCHER's geom_scan.py file ..."), end="")
@@ -180,6 +198,15 @@ def main():
     modelling_fcts = import_path(modelling_fcts_path)
     print('%12s' % "[ DONE ]")
 
+    # CONTROL LAUNCHER's system_cache.py file
+    # =======================================
+
+    system_cache_path = os.path.join(chains_path,"control_launcher","system_cache.py")
+
+    print ("{:<140}".format("\nImporting CONTROL LAUNCHER's system_cache.py file ..."), end="")
+    system_cache = import_path(system_cache_path)
+    print('%12s' % "[ DONE ]")
+
     # CONTROL LAUNCHER's transition_fcts.py file
     # ==========================================
     
@@ -305,19 +332,13 @@ def main():
       mol_group = ''.join(atoms)
 
       # ========================================================= #
-      # Load the QCHEM output file                                #
+      # Check the QCHEM output file                               #
       # ========================================================= #
 
-      print ("{:<133}".format('\n\tLoading QCHEM output file ...'), end="")
+      print ("{:<133}".format('\n\tChecking QCHEM output file ...'), end="")
 
       qchem_file = results_common.check_abspath(os.path.join(data_dir, mol_name + ".out"),"QCHEM output file","file")
 
-      with open(qchem_file, 'r') as out_file:
-        qchem_content = out_file.read().splitlines()
-
-      qchem_content = list(map(str.strip, qchem_content))   # Remove leading & trailing blank/spaces
-      qchem_content = list(filter(None, qchem_content))     # Remove blank lines/no char
-
       print('%12s' % "[ DONE ]")
 
       # ========================================================= #
@@ -326,11 +347,17 @@ def main():
 
       print ("{:<133}".format('\n\tLoading transitions list ...'), end="")
 
-      # Call the modelling function from CONTROL LAUNCHER but without its standard output (https://stackoverflow.com/questions/2828953/silence-the-stdout-of-a-function-in-python-without-trashing-sys-stdout-and-resto)
+      # Call the modelling function from CONTROL LAUNCHER (or load its result from the cache) but without its standard output (https://stackoverflow.com/questions/2828953/silence-the-stdout-of-a-function-in-python-without-trashing-sys-stdout-and-resto)
+      # The file is read lazily, each time the lines are iterated over, so that its whole content is never kept in memory
+
+      qchem_content = system_cache.SourceLines(qchem_file)   # Remove leading & trailing blank/spaces and blank lines/no char
 
       with open(os.devnull, 'w') as devnull:
         with contextlib.redirect_stdout(devnull):
-          system = modelling_fcts.qchem_tddft(qchem_content)
+          if system_cache_dir:
+            system = system_cache.cached_modelling(modelling_fcts.qchem_tddft, qchem_content, system_cache_dir, system_cache_size)
+          else:
+            system = modelling_fcts.qchem_tddft(qchem_content, print_tables=False)
 
       # Call the transition function from CONTROL LAUNCHER but without its standard output (https://stackoverflow.com/questions/2828953/silence-the-stdout-of-a-function-in-python-without-trashing-sys-stdout-and-resto)
 
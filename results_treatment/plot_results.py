@@ -21,12 +21,23 @@ import matplotlib.mathtext
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import yaml
 from matplotlib.cm import ScalarMappable
 from matplotlib.ticker import AutoMinorLocator
 from scipy import constants
 
 import results_common
+import results_store
+
+# YAML loader shared by all the scripts of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+yaml_loader = results_common.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
+# Sections of the results used by this script, the other ones are not loaded from the results store
+
+RESULTS_SECTIONS = ["ID", "Structure", "QCHEM KS Orbitals", "Energy gaps (Ha)", "IPs (Ha)", "Transition dipole moments (au)", "SOC values (au)", "Zero states list", "Relativistic states list",
+                    "Average NR dipole moments (au)", "Sum NR dipole moments (au)", "Average relativistic dipole moments (au)", "Sum relativistic dipole moments (au)", "Control"]
 
 # =================================================================== #
 # =================================================================== #
@@ -36,12 +47,15 @@ import results_common
 
 # Define the arguments needed for the script (here they are defined as named arguments rather than positional arguments, check https://stackoverflow.com/questions/24180527/argparse-required-arguments-listed-under-optional-arguments for more info).
 
-parser = argparse.ArgumentParser(add_help=False, description="This script extracts the relevant information from a single YAML file and produces the various needed tables and graphs.")
+parser = argparse.ArgumentParser(add_help=False, description="This script extracts the relevant information from a single YAML file (or from the results store) and produces the various needed tables and graphs.")
 
 required = parser.add_argument_group('Required arguments')
-required.add_argument("-i","--inp_yml", type=str, help="Path to the YAML file containing the results.", required=True)
 required.add_argument("-o","--out_dir", type=str, help="Path to the directory where you want to store the graphs and tables.", required=True)
 
+results_inp = parser.add_mutually_exclusive_group(required=True)
+results_inp.add_argument("-i","--inp_yml", type=str, help="Path to the YAML file containing the results.")
+results_inp.add_argument("-db","--database", type=str, help="Path to the SQLite database file of the results store containing the results (see results_store.py).")
+
 optional = parser.add_argument_group('Optional arguments')
 optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
 optional.add_argument('-cf', '--config', type=str, help="Path to the YAML configuration file, default is this_script_directory/results_config.yml")
@@ -112,6 +126,7 @@ def main():
     # Required arguments
 
     inp_yml = args.inp_yml                   # YAML file containing the results
+    inp_db = args.database                   # Results store containing the results
     out_dir = args.out_dir                   # Directory where the graphs and tables will be stored
 
     # Optional arguments
@@ -139,22 +154,34 @@ def main():
       config_file = os.path.join(code_dir, "results_config.yml")
 
     print ("{:<40} {:<99}".format('\nLoading the configuration file',config_file + " ..."), end="")
-    with open(config_file, 'r') as f_config:
-      config = yaml.load(f_config, Loader=yaml.FullLoader)
+    config = yaml_loader.load(config_file)
     print('%12s' % "[ DONE ]")
 
     res_dpi = 400
 
     # ========================================================= #
-    # Check and load the YAML input file                        #
+    # Check and load the results                                #
     # ========================================================= #
 
-    inp_yml = results_common.check_abspath(inp_yml,"Command line argument -i / --inp_yml","file")
+    if inp_yml:
 
-    print ("{:<40} {:<99}".format('\nLoading the YAML input file',inp_yml + " ..."), end="")
-    with open(inp_yml, 'r') as f_yml:
-      yml_content = yaml.load(f_yml, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
+      inp_yml = results_common.check_abspath(inp_yml,"Command line argument -i / --inp_yml","file")
+
+      print ("{:<40} {:<99}".format('\nLoading the YAML input file',inp_yml + " ..."), end="")
+      yml_content = yaml_loader.load(inp_yml, binary_cache=True)        # This file can be large, keep it in a binary cache file
+      print('%12s' % "[ DONE ]")
+
+    else:
+
+      # Only the needed sections are loaded from the results store, the results are then used exactly as if they came from the YAML file
+
+      inp_db = results_common.check_abspath(inp_db,"Command line argument -db / --database","file")
+
+      print ("{:<40} {:<99}".format('\nLoading the results store',inp_db + " ..."), end="")
+      connection = results_store.connect(inp_db)
+      yml_content = results_store.load(connection, RESULTS_SECTIONS)
+      connection.close()
+      print('%12s' % "[ DONE ]")
 
     # ========================================================= #
     # Check other arguments                                     #
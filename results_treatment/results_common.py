@@ -8,6 +8,7 @@
 ################################################################################################################################################
 
 import os
+import sys
 from functools import partial
 
 # =================================================================== #
@@ -227,4 +228,33 @@ def format_num(precision, num_format):
     def create_formatter(num, inner_prec, inner_form):
         return "{:.{}{}}".format(num, inner_prec, inner_form)
 
-    return partial(create_formatter, inner_prec=precision, inner_form=num_format)
\ No newline at end of file
+    return partial(create_formatter, inner_prec=precision, inner_form=num_format)
+#######################################################################
+
+def import_path(fullpath:str):
+    """ 
+    Imports a file with full path specification. Allows one to import from anywhere, something __import__ does not do. Taken from https://stackoverflow.com/questions/72852/how-to-do-relative-imports-in-python
+
+    This is used by the subscripts to import the scripts shared with CONTROL LAUNCHER, which are placed in its directory.
+
+    Parameters
+    ----------
+    fullpath : str
+        Full path towards the file you want to import
+
+    Returns
+    -------
+    module
+        The loaded file
+    """
+
+    # Split the path and filename (and remove extension of the filename)
+    path, filename = os.path.split(fullpath)
+    filename = os.path.splitext(filename)[0]
+
+    # Add path to sys.path in order to be able to load the module, then remove it
+    sys.path.insert(0, path)
+    module = __import__(filename)
+    del sys.path[0]
+
+    return module
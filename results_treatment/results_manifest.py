@@ -0,0 +1,120 @@
+################################################################################################################################################
+##                                                              Results manifest                                                              ##
+##                                                                                                                                            ##
+##    This script contains the functions used to keep track of the input files from which the results of each molecule have been compiled     ##
+##         by results_treatment.py, so that the molecules whose input files have not changed since the last execution can be skipped          ##
+################################################################################################################################################
+
+import json
+import os
+
+# Version of the manifest format, increase it if the way the results are compiled changes (all the molecules will then be treated again)
+
+MANIFEST_VERSION = 1
+
+# Directories of the control results and name of the CSV file compiled by CONTROL LAUNCHER in each transition directory (see results_treatment.py)
+
+CONTROL_FILES = [("aldu_param", "aldu_comp_results.csv"), ("const_var", "convar_comp_results.csv"), ("filt_freq", "filt_freq_comp_results.csv")]
+
+# =================================================================== #
+# =================================================================== #
+#                          HELPER DEFINITIONS                         #
+# =================================================================== #
+# =================================================================== #
+
+def _stat(path:str):
+    """Returns what identifies the current version of a file (the time of its last modification and its size), "dir" for a directory or None if there is nothing at that path."""
+
+    try:
+      file_stat = os.stat(path)
+    except OSError:
+      return None
+
+    if os.path.isdir(path):
+      return "dir"
+
+    return [file_stat.st_mtime_ns, file_stat.st_size]
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def manifest_path(out_path:str) -> str:
+    """Returns the path towards the manifest of an output file (a hidden file next to it)."""
+
+    return os.path.join(os.path.dirname(out_path), "." + os.path.basename(out_path) + ".manifest.json")
+
+#######################################################################
+
+def fingerprint(mol_dir:str, mol_name:str, ip_line:dict=None) -> dict:
+    """Computes the fingerprint of the input files of a molecule, i.e. the time of the last modification and the size of each file read by results_treatment.py. The files that do not exist are also part of the fingerprint, so that it changes when they appear.
+
+    Parameters
+    ----------
+    mol_dir : str
+        Path towards the molecule directory.
+    mol_name : str
+        Name of the molecule.
+    ip_line : dict, optional
+        Line of the ionization potentials CSV file concerning this molecule, if there is one.
+
+    Returns
+    -------
+    fingerprint : dict
+        The fingerprint of the molecule, which can be written in the JSON format.
+    """
+
+    files = [os.path.join("GAUSSIAN", mol_name + ".xyz"), os.path.join("GAUSSIAN", mol_name + "_ori.xyz"), os.path.join("QCHEM", mol_name + ".out")]
+
+    for control_dir, csv_name in CONTROL_FILES:
+
+      control_path = os.path.join(mol_dir, "CONTROL", control_dir)
+      files.append(os.path.join("CONTROL", control_dir, "data"))
+
+      if os.path.isdir(control_path):
+        for dirname in sorted(entry.name for entry in os.scandir(control_path) if entry.is_dir() and entry.name != "data"):
+          files.append(os.path.join("CONTROL", control_dir, dirname, csv_name))
+
+    return {"version": MANIFEST_VERSION, "ip": ip_line, "files": {filename: _stat(os.path.join(mol_dir, filename)) for filename in files}}
+
+#######################################################################
+
+def load(out_path:str) -> dict:
+    """Loads the manifest of an output file. The manifest is ignored (and an empty dictionary is returned) if it does not exist, if it cannot be read or if the output file itself does not exist anymore.
+
+    Parameters
+    ----------
+    out_path : str
+        Path towards the output file (YAML file or results store).
+
+    Returns
+    -------
+    manifest : dict
+        Dictionary associating the name of each molecule with the fingerprint of the input files its results have been compiled from.
+    """
+
+    if not os.path.isfile(out_path):
+      return {}
+
+    try:
+      with open(manifest_path(out_path), 'r', encoding='utf-8') as f_manifest:
+        manifest = json.load(f_manifest)
+    except (OSError, ValueError):
+      return {}
+
+    return manifest if isinstance(manifest, dict) else {}
+
+#######################################################################
+
+def save(out_path:str, manifest:dict):
+    """Writes the manifest of an output file, which is replaced in a single operation. It must only be written once the output file itself has been written, so that it never refers to results that are not in the output file."""
+
+    path = manifest_path(out_path)
+    tmp_file = "%s.%s.tmp" % (path, os.getpid())
+
+    with open(tmp_file, 'w', encoding='utf-8') as f_manifest:
+      json.dump(manifest, f_manifest, indent=1, sort_keys=True)
+
+    os.replace(tmp_file, path)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+################################################################################################################################################
+##                                                               Results store                                                                ##
+##                                                                                                                                            ##
+##            This script contains the functions used to store the results compiled by results_treatment.py in an SQLite database,            ##
+##               with one line per molecule and one column per type of results, so that each molecule can be updated on its own               ##
+##                                                and that only the needed results are loaded                                                 ##
+################################################################################################################################################
+
+import argparse
+import json
+import os
+import sqlite3
+
+import results_common
+
+# Scripts shared by all the scripts of CHAINS (the YAML loader and the functions common to the SQLite databases), imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+sqlite_common = results_common.import_path(os.path.join(control_dir,"sqlite_common.py"))
+yaml_loader = results_common.import_path(os.path.join(control_dir,"yaml_loader.py"))
+
+# The store contains a single table, with one line per molecule. Each top-level key of the results of a molecule (e.g. "ID", "Energy gaps (Ha)" or "Control") is a "section" column, created on the fly, containing the results in the JSON format (which keeps the type of each value).
+# Individual values can thus also be queried directly, e.g. SELECT json_extract("Energy gaps (Ha)", '$.Optical') FROM molecules
+
+TABLE = "molecules"
+KEY = "Molecule"
+
+# Columns copied from the "ID" section, used to filter the molecules (an index is created for each of them)
+
+ID_COLUMNS = ["TAG", "Group"]
+
+# =================================================================== #
+# =================================================================== #
+#                        FUNCTIONS DEFINITIONS                        #
+# =================================================================== #
+# =================================================================== #
+
+def connect(db_path:str, timeout:float=120.0) -> sqlite3.Connection:
+    """Opens the results store (and creates it if it does not exist yet).
+
+    Parameters
+    ----------
+    db_path : str
+        Path towards the SQLite database file.
+    timeout : float, optional
+        How many seconds to wait for the other processes writing in the store to release their lock, by default 120.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        Connection to the store, in autocommit mode (the changes are grouped with the transaction function).
+    """
+
+    connection = sqlite_common.connect(db_path, timeout)
+
+    with sqlite_common.transaction(connection):
+      connection.execute("CREATE TABLE IF NOT EXISTS %s (%s TEXT NOT NULL UNIQUE, %s)" % (TABLE, sqlite_common.quote(KEY), ", ".join("%s TEXT" % sqlite_common.quote(column) for column in ID_COLUMNS)))
+      for column in ID_COLUMNS:
+        connection.execute("CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (sqlite_common.quote("idx_" + column), TABLE, sqlite_common.quote(column)))
+
+    return connection
+
+#######################################################################
+
+def get_sections(connection:sqlite3.Connection) -> list:
+    """Returns the names of the section columns of the store, in the order in which they have been created."""
+
+    return [row[1] for row in connection.execute("PRAGMA table_info(%s)" % TABLE) if row[1] not in [KEY] + ID_COLUMNS]
+
+#######################################################################
+
+def store(connection:sqlite3.Connection, mol_name:str, mol_results:dict):
+    """Stores the results of a molecule, replacing all of its previous results (the sections absent from the new results are emptied). A molecule that is already present keeps its place in the store.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the store, as returned by the connect function.
+    mol_name : str
+        Name of the molecule.
+    mol_results : dict
+        Results of the molecule, each key being a section (as built by results_treatment.py).
+    """
+
+    with sqlite_common.transaction(connection):
+
+      # Add the missing section columns
+
+      sections = get_sections(connection)
+
+      for section in mol_results:
+        if section not in sections:
+          connection.execute("ALTER TABLE %s ADD COLUMN %s TEXT" % (TABLE, sqlite_common.quote(section)))
+          sections.append(section)
+
+      values = {KEY: mol_name}
+      values.update({column: mol_results.get("ID", {}).get(column) for column in ID_COLUMNS})
+      values.update({section: (json.dumps(mol_results[section]) if section in mol_results else None) for section in sections})
+
+      columns = list(values)
+      updates = ", ".join("%s = excluded.%s" % (sqlite_common.quote(column), sqlite_common.quote(column)) for column in columns if column != KEY)
+
+      connection.execute("INSERT INTO %s (%s) VALUES (%s) ON CONFLICT(%s) DO UPDATE SET %s" % (TABLE, ", ".join(sqlite_common.quote(column) for column in columns), ", ".join("?" for column in columns), sqlite_common.quote(KEY), updates), [values[column] for column in columns])
+
+#######################################################################
+
+def load(connection:sqlite3.Connection, sections:list=None, filters:dict=None) -> dict:
+    """Loads the results of the molecules from the store, in the same form as the YAML file of results_treatment.py.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection to the store, as returned by the connect function.
+    sections : list, optional
+        Sections that need to be loaded (the others are not read at all), by default all of them.
+    filters : dict, optional
+        Dictionary associating some ID columns with the value they must have (e.g. {"Group": "Si"}).
+
+    Returns
+    -------
+    results : dict
+        Dictionary associating the name of each molecule with its results, in the order in which the molecules were first stored. The empty sections of a molecule are absent from its results.
+    """
+
+    available = get_sections(connection)
+    sections = available if sections is None else [section for section in sections if section in available]
+
+    clause, params = sqlite_common.where(filters)
+    query = "SELECT %s FROM %s%s ORDER BY rowid" % (", ".join(sqlite_common.quote(column) for column in [KEY] + sections), TABLE, clause)
+
+    results = {}
+
+    for row in connection.execute(query, params):
+      results[row[0]] = {section: json.loads(value) for section, value in zip(sections, row[1:]) if value is not None}
+
+    return results
+
+#######################################################################
+
+def get_molecules(connection:sqlite3.Connection) -> list:
+    """Returns the names of the molecules in the store, in the order in which they were first stored."""
+
+    return [row[0] for row in connection.execute("SELECT %s FROM %s ORDER BY rowid" % (sqlite_common.quote(KEY), TABLE))]
+
+#######################################################################
+
+def count(connection:sqlite3.Connection, filters:dict=None) -> int:
+    """Returns the number of molecules in the store matching some criteria (see the load function for the meaning of the filters)."""
+
+    clause, params = sqlite_common.where(filters)
+
+    return connection.execute("SELECT COUNT(*) FROM %s%s" % (TABLE, clause), params).fetchone()[0]
+
+#######################################################################
+
+def import_yaml(connection:sqlite3.Connection, yml_path:str) -> int:
+    """Stores the content of a YAML file created by results_treatment.py. Returns the number of imported molecules."""
+
+    content = yaml_loader.load(yml_path) or {}
+
+    for mol_name, mol_results in content.items():
+      store(connection, mol_name, mol_results)
+
+    return len(content)
+
+#######################################################################
+
+def export_yaml(connection:sqlite3.Connection, yml_path:str, sections:list=None, filters:dict=None) -> int:
+    """Writes the results of the molecules in a YAML file, in the same format as the one created by results_treatment.py. Returns the number of exported molecules (see the load function for the meaning of the other arguments)."""
+
+    results = load(connection, sections, filters)
+
+    yaml_loader.dump(results, yml_path, sort_keys=False)
+
+    return len(results)
+
+# =================================================================== #
+# =================================================================== #
+#                        Command line arguments                       #
+# =================================================================== #
+# =================================================================== #
+
+# Executing this script allows to convert the store from and to the YAML format, for example to look at the results of a particular group of molecules
+
+parser = argparse.ArgumentParser(add_help=False, description="Imports the YAML file created by results_treatment.py in the results store, or exports the results store in the YAML format, possibly filtered by group or tag.")
+
+required = parser.add_argument_group('Required arguments')
+required.add_argument("-db", "--database", type=str, help="Path towards the SQLite database file of the results store.", required=True)
+
+optional = parser.add_argument_group('Optional arguments')
+optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument("-i", "--import_yml", type=str, help="Path towards a YAML file created by results_treatment.py, whose molecules will be stored (replacing those with the same name).")
+optional.add_argument("-e", "--export_yml", type=str, help="Path towards the YAML file where the results will be exported.")
+optional.add_argument("--group", type=str, help="Only export the molecules of this group.")
+optional.add_argument("--tag", type=str, help="Only export the molecule with this tag.")
+optional.add_argument("--sections", type=str, nargs='+', help="Only export these sections of the results (e.g. ID 'Energy gaps (Ha)').")
+
+# =================================================================== #
+# =================================================================== #
+#                            MAIN FUNCTION                            #
+# =================================================================== #
+# =================================================================== #
+
+def main():
+
+  args = parser.parse_args()
+
+  if args.import_yml:
+    connection = connect(args.database)
+    nb_mol = import_yaml(connection, args.import_yml)
+    print("%s molecule(s) imported from %s" % (nb_mol, args.import_yml))
+
+  elif not os.path.isfile(args.database):
+    print("ERROR: There is no results store at %s" % args.database)
+    exit(-1)
+
+  else:
+    connection = connect(args.database)
+
+  if args.export_yml:
+    filters = {column: value for column, value in [("Group", args.group), ("TAG", args.tag)] if value is not None}
+    nb_mol = export_yaml(connection, args.export_yml, args.sections, filters)
+    print("%s molecule(s) exported to %s" % (nb_mol, args.export_yml))
+
+  elif not args.import_yml:
+    print("%s molecule(s) in the store, with the following sections: %s" % (count(connection), ", ".join(get_sections(connection))))
+
+  connection.close()
+
+# If this script is executed through the command line, call the main function (see https://realpython.com/python-main-function/ for details)
+
+if __name__ == "__main__":
+  main()
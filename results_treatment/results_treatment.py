@@ -4,16 +4,17 @@
 ##                                                              Results Compiler                                                              ##
 ##                                                                                                                                            ##
 ##                              This script scans one or more molecule directories containing all the information                             ##
-##                    obtained through CHAINS and the various programs and compiles the results into a single YAML file.                      ##
+##           obtained through CHAINS and the various programs and compiles the results into a single YAML file and/or a results store.          ##
 ##                                                                                                                                            ##
 ##                                 /!\ In order to run, this script requires Python 3.5+ as well as YAML /!\                                  ##
 ##                                          /!\ Ask your cluster(s) administrator(s) if needed. /!\                                           ##
 ################################################################################################################################################
 
 import argparse
+import concurrent.futures
 import contextlib
 import csv
-import math
+import io
 import os
 import re
 import shutil
@@ -26,6 +27,14 @@ import yaml
 from scipy.spatial import ConvexHull, distance
 
 import results_common
+import results_manifest
+import results_store
+
+# YAML loader shared by all the scripts of CHAINS, imported from the directory of CONTROL LAUNCHER
+
+control_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__)))),"control_launcher")
+
+yaml_loader = results_common.import_path(os.path.join(control_dir,"yaml_loader.py"))
 
 # =================================================================== #
 # =================================================================== #
@@ -59,195 +68,84 @@ def import_path(fullpath:str):
 
     return module
 
-# =================================================================== #
-# =================================================================== #
-#                       COMMAND LINE ARGUMENTS                        #
-# =================================================================== #
-# =================================================================== #
-
-# Define the arguments needed for the script (here they are defined as named arguments rather than positional arguments, check https://stackoverflow.com/questions/24180527/argparse-required-arguments-listed-under-optional-arguments for more info).
-
-parser = argparse.ArgumentParser(add_help=False, description="For one or more molecule directories, this script reads the results files and compiles the results into a single YAML file.")
-
-required = parser.add_argument_group('Required arguments')
-required.add_argument("-o","--out_yml", type=str, help="Path to the YAML file in which you want to compile the results. If the file already exists, it will be updated with the new content.", required=True)
-
-mol_inp = parser.add_mutually_exclusive_group(required=True)
-mol_inp.add_argument("-s","--single", type=str, help="Molecule directory containing the results files that need to be processed.")
-mol_inp.add_argument("-m","--multiple", type=str, help="Directory containing multiple molecule directories.")
-
-optional = parser.add_argument_group('Optional arguments')
-optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
-optional.add_argument('-cf', '--config', type=str, help="Path to the YAML configuration file, default is this_script_directory/results_config.yml")
-
-# =================================================================== #
-# =================================================================== #
-#                            MAIN FUNCTION                            #
-# =================================================================== #
-# =================================================================== #
-
-# We encapsulate all the instructions in a main function, this is done so that the documentation (or other scripts) can import this file without immediately executing it (see https://realpython.com/python-main-function/ for details)
-def main(): 
-
-  # =================================================================== #
-  # =================================================================== #
-  #                           PREPARATION STEP                          #
-  # =================================================================== #
-  # =================================================================== #
-
-  # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
-  try:
-
-    # Get the size of the terminal in order to have a prettier output, if you need something more robust, go check http://granitosaurus.rocks/getting-terminal-size.html
-
-    columns, rows = shutil.get_terminal_size()
-
-    # Output Header
-
-    print("".center(columns,"*"))
-    print("")
-    print("EXECUTION OF THE RESULTS TREATMENT BEGINS NOW".center(columns))
-    print("")
-    print("".center(columns,"*"))
-
-    # ========================================================= #
-    # Read command line arguments                               #
-    # ========================================================= #
-
-    args = parser.parse_args()
-
-    # Required arguments
-
-    out_yml = args.out_yml                   # YAML file in which the results will be compiled
-
-    single_mol = args.single                 # Molecule directory containing the results files that need to be processed.
-    multiple_mol = args.multiple             # Directory containing multiple molecule directories.
-
-    # Optional arguments
-
-    config_file = args.config                # YAML configuration file
-
-    # ========================================================= #
-    # Define codes directory                                    #
-    # ========================================================= #
-
-    # Determined by getting the path to the directory of this script
-
-    code_dir = os.path.dirname(os.path.realpath(os.path.abspath(getsourcefile(lambda:0))))
-
-    print ("{:<40} {:<100}".format('\nCodes directory:',code_dir))
-
-    # ========================================================= #
-    # Load important files                                      #
-    # ========================================================= #
-
-    # YAML configuration file
-    # =======================
-
-    if config_file: 
-      config_file = results_common.check_abspath(config_file,"Command line argument -cf / --config","file")
-    else:
-      # If no value has been provided through the command line, take the results_config.yml file in the same directory as this script 
-      config_file = os.path.join(code_dir, "results_config.yml")
-
-    print ("{:<40} {:<99}".format('\nLoading the configuration file',config_file + " ..."), end="")
-    with open(config_file, 'r') as f_config:
-      config = yaml.load(f_config, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
-
-    # CHAINS YAML configuration file
-    # ==============================
-
-    chains_path = os.path.dirname(code_dir) 
-    chains_config_file = results_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
-
-    print ("{:<140}".format("\nLoading CHAINS configuration YAML file ..."), end="")
-    with open(chains_config_file, 'r') as chains:
-      chains_config = yaml.load(chains, Loader=yaml.FullLoader)
-    print('%12s' % "[ DONE ]")
-
-    # Ionization potentials CSV file
-    # ==============================
-
-    ip_file = results_common.check_abspath(chains_config['ip_file'],"Ionization potentials CSV file","file")
-
-    print ("{:<140}".format("\nLoading ionization potentials CSV file ..."), end="")
-    with open(ip_file, 'r', newline='') as csv_file:
-      ip_content = csv.DictReader(csv_file, delimiter=';')
-      ip_list = list(ip_content)
-    print('%12s' % "[ DONE ]")
+#######################################################################
 
-    # ABIN LAUNCHER's geom_scan.py file
-    # =================================
+def dipole_norms(momdip_mtx:dict) -> np.ndarray:
+    """Computes the norm of the dipole moment vector between each pair of states.
 
-    geom_scan_path = os.path.join(chains_path,"abin_launcher","geom_scan.py")
-
-    print ("{:<140}".format("\nImporting ABIN LAUNCHER's geom_scan.py file ..."), end="")
-    geom_scan = import_path(geom_scan_path)
-    print('%12s' % "[ DONE ]")
-
-    # CONTROL LAUNCHER's modelling_fcts.py file
-    # =========================================
-
-    modelling_fcts_path = os.path.join(chains_path,"control_launcher","modelling_fcts.py")
+    Parameters
+    ----------
+    momdip_mtx : dict
+        Dictionary associating each polarisation ("X", "Y" and "Z") with the matrix of the corresponding component of the dipole moments, as given by the modelling functions of CONTROL LAUNCHER.
 
-    print ("{:<140}".format("\nImporting CONTROL LAUNCHER's modelling_fcts.py file ..."), end="")
-    modelling_fcts = import_path(modelling_fcts_path)
-    print('%12s' % "[ DONE ]")
+    Returns
+    -------
+    norms : np.ndarray
+        Matrix of the norms, computed in a single operation on the components stacked into a (3,n,n) array.
+    """
 
-    # ========================================================= #
-    # Check molecule directories                                #
-    # ========================================================= #
+    components = np.stack([momdip_mtx[momdip_key] for momdip_key in momdip_mtx])
 
-    if multiple_mol:
+    return np.sqrt(np.sum(np.square(components), axis=0))
 
-      multiple_mol = results_common.check_abspath(multiple_mol,"Command line argument -m / --multiple","directory")
-      mol_inp_path = multiple_mol
+#######################################################################
 
-      print("{:<40} {:<99}".format("\nLooking for every molecule directory in", mol_inp_path + " ..."), end="")
+def class_statistics(values:np.ndarray, masks:dict):
+    """Computes the average and the sum of the values of a matrix for different classes of pairs of states (e.g. the singlet-singlet pairs).
 
-      # We need to look for directories in the multiple_mol directory (see https://stackoverflow.com/questions/800197/how-to-get-all-of-the-immediate-subdirectories-in-python for reference).
-      mol_inp_list = [dir.name for dir in os.scandir(mol_inp_path) if dir.is_dir()]
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix of the values, one line and one column per state.
+    masks : dict
+        Dictionary associating the name of each class with a boolean array of the same shape as the matrix, selecting the values of that class.
 
-      if mol_inp_list == []:
-        raise results_common.ResultsError ("ERROR: Can't find any directory in %s" % mol_inp_path)
-      
-      print('%12s' % "[ DONE ]")
+    Returns
+    -------
+    averages : dict
+        Dictionary associating the name of each class with the average of its values (NaN if there is no such pair of states).
+    sums : dict
+        Dictionary associating the name of each class with the sum of its values.
+    """
 
-    else:
+    averages = {name: float(np.mean(values[mask])) for name, mask in masks.items()}
+    sums = {name: float(np.sum(values[mask])) for name, mask in masks.items()}
 
-      single_mol = results_common.check_abspath(single_mol,"Command line argument -s / --single","directory")
-      print ("{:<40} {:<100}".format('\nMolecule directory:',single_mol))
+    return averages, sums
 
-      mol_inp_path = os.path.dirname(single_mol)
-      mol_name = os.path.basename(single_mol)
-      mol_inp_list = [mol_name]
- 
-    # ========================================================= #
-    # Determine other important variables                       #
-    # ========================================================= #
+#######################################################################
 
-    out_yml = os.path.abspath(out_yml)
-    print ("{:<40} {:<100}".format('\nOutput YAML file:',out_yml))
+def treat_molecule(mol_name:str, mol_inp_path:str, ip_list:list, chains_path:str, system_cache_dir:str=None, system_cache_size:float=2000) -> dict:
+    """Scans the directory of a molecule and compiles its results. The molecules being independent from each other, this function can also be executed in a separate process (see the -j / --jobs command line argument).
 
-    comp_results = {} # Dictionary consisting of multiples dictionaries containing data about each molecule (1 dict per molecule)
+    Parameters
+    ----------
+    mol_name : str
+        Name of the molecule directory.
+    mol_inp_path : str
+        Path towards the directory containing the molecule directory.
+    ip_list : list
+        Content of the ionization potentials CSV file, each line being a dictionary (as given by csv.DictReader).
+    chains_path : str
+        Path towards the CHAINS directory, containing ABIN LAUNCHER and CONTROL LAUNCHER.
+    system_cache_dir : str, optional
+        Path towards the system cache directory of CONTROL LAUNCHER, if the system cache is used.
+    system_cache_size : float, optional
+        Maximum size of the system cache, in MB, by default 2000.
 
-  # ========================================================= #
-  # Exception handling for the preparation step               #
-  # ========================================================= #
+    Returns
+    -------
+    comp_results : dict
+        Dictionary associating the name of the molecule with its results. If a problem occurs while treating the molecule, it only contains the results obtained before the problem (and it is empty if the molecule could not even be identified).
+    """
 
-  except results_common.ResultsError as error:
-    print("")
-    print(error)
-    exit(-1)
+    # Scripts of ABIN LAUNCHER and CONTROL LAUNCHER (only imported once by each process, the following calls reusing the loaded modules)
 
-  # =================================================================== #
-  # =================================================================== #
-  #                   FILES MANIPULATION & GENERATION                   #
-  # =================================================================== #
-  # =================================================================== #
+    geom_scan = import_path(os.path.join(chains_path,"abin_launcher","geom_scan.py"))
+    modelling_fcts = import_path(os.path.join(chains_path,"control_launcher","modelling_fcts.py"))
+    system_cache = import_path(os.path.join(chains_path,"control_launcher","system_cache.py"))
 
-  for mol_name in mol_inp_list:
+    comp_results = {} # Dictionary containing the results of the molecule (in the same form as in the YAML file)
 
     mol_dir = os.path.join(mol_inp_path, mol_name)
 
@@ -491,7 +389,7 @@ def main():
     except results_common.ResultsError as error:
       print(error)
       print("Skipping %s molecule" % mol_name)
-      continue
+      return comp_results
 
     # ========================================================= #
     # ========================================================= #
@@ -735,14 +633,27 @@ def main():
       # Optical gap
       # ===========
 
-      # Call the modelling function from CONTROL LAUNCHER but without its standard output (https://stackoverflow.com/questions/2828953/silence-the-stdout-of-a-function-in-python-without-trashing-sys-stdout-and-resto)
+      # Call the modelling function from CONTROL LAUNCHER (or load its result from the cache) but without its standard output (https://stackoverflow.com/questions/2828953/silence-the-stdout-of-a-function-in-python-without-trashing-sys-stdout-and-resto)
 
       with open(os.devnull, 'w') as devnull:
         with contextlib.redirect_stdout(devnull):
-          system = modelling_fcts.qchem_tddft(qchem_content)
+          if system_cache_dir:
+            system = system_cache.cached_modelling(modelling_fcts.qchem_tddft, qchem_content, system_cache_dir, system_cache_size)
+          else:
+            system = modelling_fcts.qchem_tddft(qchem_content, print_tables=False)
 
       zero_states_list = system['zero_states_list']
 
+      # Labels and energies of the states, in the order of the lines and columns of the matrices (i.e. by ascending number)
+
+      zero_labels = [state['label'] for state in sorted(zero_states_list, key=lambda state: state['number'])]
+      zero_energies = np.array([state['energy'] for state in sorted(zero_states_list, key=lambda state: state['number'])])
+
+      # Norms of the non relativistic dipole moments and modules of the SOC values between each pair of states, computed once for all the results below
+
+      momdip_o_norms = dipole_norms(system['momdip_o_mtx'])
+      soc_modules = np.absolute(system['mime'])
+
       # Get the list of singlet states and sort them by ascending number
 
       singlet_states = [state for state in zero_states_list if state['label'].startswith('S') and state['label'] != 'S0']
@@ -751,18 +662,9 @@ def main():
       # Get the energy of the first bright state (with a nonzero transition dipole moment)
 
       gs_number = [state['number'] for state in zero_states_list if state['label'] == 'S0'][0]
-      opt_gap = 0.0
-
-      for singlet in singlet_states:
+      bright_states = [singlet for singlet in singlet_states if momdip_o_norms[gs_number, singlet['number']] != 0]
 
-        momdip = 0
-        for momdip_key in system['momdip_o_mtx']:
-          momdip += system['momdip_o_mtx'][momdip_key][gs_number][singlet['number']]**2
-        momdip = math.sqrt(momdip)    
-
-        if momdip != 0:
-          opt_gap = singlet['energy']
-          break
+      opt_gap = bright_states[0]['energy'] if bright_states else 0.0
 
       # Singlet-Triplet gap
       # ===================
@@ -833,18 +735,11 @@ def main():
 
       for pair in pairs:
 
-        # Compute the module of the transition dipole moment
-
-        momdip = 0
-        for momdip_key in system['momdip_o_mtx']:
-          momdip += system['momdip_o_mtx'][momdip_key][pair[0]['number']][pair[1]['number']]**2
-        momdip = math.sqrt(momdip)          
-
-        # Store the value
+        # Store the module of the transition dipole moment
 
         comp_results[mol_name]["Transition dipole moments (au)"].update({
           # Use partition to only keep the 'Tx' part of the 'Tx(ms=y)' labels
-          pair[0]['label'].partition("(")[0] + '_' + pair[1]['label'].partition("(")[0] : momdip
+          pair[0]['label'].partition("(")[0] + '_' + pair[1]['label'].partition("(")[0] : float(momdip_o_norms[pair[0]['number'], pair[1]['number']])
           })
 
       print('%12s' % "[ DONE ]")
@@ -863,18 +758,11 @@ def main():
 
       for state in zero_states_list:
 
-        # Compute the module of the permanent dipole moment
-
-        momdip = 0
-        for momdip_key in system['momdip_o_mtx']:
-          momdip += system['momdip_o_mtx'][momdip_key][state['number']][state['number']]**2
-        momdip = math.sqrt(momdip)          
-
-        # Store the value
+        # Store the module of the permanent dipole moment
 
         comp_results[mol_name]["Permanent dipole moments (au)"].update({
           # Use partition to only keep the 'Tx' part of the 'Tx(ms=y)' labels
-          state['label'].partition("(")[0] : momdip
+          state['label'].partition("(")[0] : float(momdip_o_norms[state['number'], state['number']])
           })
 
       print('%12s' % "[ DONE ]")
@@ -895,16 +783,11 @@ def main():
       pairs = [pair for pair in pairs if pair[0]['label'].startswith('T') or pair[1]['label'].startswith('T')]
 
       for pair in pairs:
-        
-        # Compute the module of the soc value
 
-        soc = float(np.absolute(system['mime'][pair[0]['number']][pair[1]['number']]))
-    
-        # Store the value
+        # Store the module of the soc value
 
         comp_results[mol_name]["SOC values (au)"].update({
-          # Use partition to only keep the 'Tx' part of the 'Tx(ms=y)' labels
-          pair[0]['label'] + '_' + pair[1]['label'] : soc
+          pair[0]['label'] + '_' + pair[1]['label'] : float(soc_modules[pair[0]['number'], pair[1]['number']])
           })
 
       print('%12s' % "[ DONE ]")
@@ -930,6 +813,11 @@ def main():
         elif state['label'].startswith('S'):
           min_zero_states_list.append(state)
 
+      # Average of the SOC values between each state and the singlet excited states
+
+      sing_numbers = [state['number'] for state in zero_states_list if state['number'] != 0 and state['label'].startswith('S')]
+      sing_soc_averages = np.mean(soc_modules[sing_numbers], axis=0)
+
       # Iterate over the states
 
       for state in min_zero_states_list:
@@ -937,10 +825,7 @@ def main():
         # Define the values
         # ~~~~~~~~~~~~~~~~~
 
-        # Define important variables
-
         zero_state = {}
-        sing_numbers = [state['number'] for state in zero_states_list if state['number'] != 0 and state['label'].startswith('S')]
 
         # Get the energies
 
@@ -963,15 +848,15 @@ def main():
           # /!\ The order of those values is the same as the order defined in the modelling function (which created the zero_states_list)
 
           zero_state["GS SOC values (au)"] = {
-              "ms=0" :  float(np.absolute(system['mime'][0][state['number']])),
-              "ms=1" :  float(np.absolute(system['mime'][0][state['number']+1])),
-              "ms=-1" : float(np.absolute(system['mime'][0][state['number']+2]))
+              "ms=0" :  float(soc_modules[0, state['number']]),
+              "ms=1" :  float(soc_modules[0, state['number']+1]),
+              "ms=-1" : float(soc_modules[0, state['number']+2])
               }
 
           zero_state["Average singlet SOC values (au)"] = {
-              "ms=0" :  float(np.mean([np.absolute(system['mime'][sing_number][state['number']]) for sing_number in sing_numbers])),
-              "ms=1" :  float(np.mean([np.absolute(system['mime'][sing_number][state['number']+1]) for sing_number in sing_numbers])),
-              "ms=-1" : float(np.mean([np.absolute(system['mime'][sing_number][state['number']+2]) for sing_number in sing_numbers]))
+              "ms=0" :  float(sing_soc_averages[state['number']]),
+              "ms=1" :  float(sing_soc_averages[state['number']+1]),
+              "ms=-1" : float(sing_soc_averages[state['number']+2])
               }
 
         # Store the values
@@ -1018,76 +903,35 @@ def main():
 
       print ("{:<133}".format('\n\tComputing average and sum of non relavistic dipole moments ...'), end="")
 
-      # Initialization of the variables
+      # Define the type of each state
 
-      momdip_gs_s_list = []
-      momdip_s_s_list = []
-      momdip_t_t_list = []
-      momdip_p_list = []
-      
-      # Iterate over the matrix to get the information
+      nb_states = len(zero_labels)
 
-      it = np.nditer(system['momdip_o_mtx']['X'], flags=['multi_index'])
-    
-      for momdip in it:
-
-        # Define the pair of states
-
-        state_1 = it.multi_index[0]
-        label_1 = [state['label'] for state in system['zero_states_list'] if state_1 == state['number']][0]
-        energy_1 = [state['energy'] for state in system['zero_states_list'] if state_1 == state['number']][0]
-        state_2 = it.multi_index[1]
-        label_2 = [state['label'] for state in system['zero_states_list'] if state_2 == state['number']][0]
-        energy_2 = [state['energy'] for state in system['zero_states_list'] if state_2 == state['number']][0]
-
-        if state_1 > state_2:
-          continue # No need to treat both triangles of the matrix
-
-        # Compute the total length of the vector
-
-        value = 0
-        for momdip_key in system['momdip_o_mtx']:
-          value += system['momdip_o_mtx'][momdip_key][state_1][state_2]**2
-        value = math.sqrt(value)
-
-        # Add the value to the corresponding list
-
-        if state_1 == state_2:
-          momdip_p_list.append(value)
-        elif label_1.startswith('S0') and label_2.startswith('S'):
-          momdip_gs_s_list.append(value)
-        elif label_1.startswith('S') and label_2.startswith('S'):
-          if energy_1 != energy_2:
-            momdip_s_s_list.append(value)
-        elif label_1.startswith('T') and label_2.startswith('T'):
-          if energy_1 != energy_2:
-            momdip_t_t_list.append(value)
-  
-      # Compute the total matrix
+      is_gs = np.array([label.startswith('S0') for label in zero_labels])
+      is_singlet = np.array([label.startswith('S') for label in zero_labels])
+      is_triplet = np.array([label.startswith('T') for label in zero_labels])
 
-      total_mtx = np.zeros((len(system['zero_states_list']), len(system['zero_states_list'])))
-      for momdip_key in system['momdip_o_mtx']:
-        total_mtx = np.add(total_mtx,np.square(system['momdip_o_mtx'][momdip_key]))
-      total_mtx = np.sqrt(total_mtx)
+      # Define the classes of pairs of states, as boolean masks of the matrix (only the upper triangle is considered for the transitions, since the matrix is symmetric, and the transitions between degenerate states are ignored)
 
-      # Store the values
+      upper = np.triu(np.ones((nb_states, nb_states), dtype=bool), k=1)
+      nondegenerate = zero_energies[:, np.newaxis] != zero_energies[np.newaxis, :]
 
-      comp_results[mol_name]["Average NR dipole moments (au)"] = {
-        "Permanent" : float(np.mean(momdip_p_list)),
-        "GS-S" : float(np.mean(momdip_gs_s_list)),
-        "S-S" : float(np.mean(momdip_s_s_list)),
-        "T-T" : float(np.mean(momdip_t_t_list)),
-        "Total" : float(total_mtx.mean())
-        }
+      gs_s_mask = upper & np.outer(is_gs, is_singlet)
 
-      comp_results[mol_name]["Sum NR dipole moments (au)"] = {
-        "Permanent" : float(sum(momdip_p_list)),
-        "GS-S" : float(sum(momdip_gs_s_list)),
-        "S-S" : float(sum(momdip_s_s_list)),
-        "T-T" : float(sum(momdip_t_t_list)),
-        "Total" : float(total_mtx.sum())
+      nr_masks = {
+        "Permanent" : np.eye(nb_states, dtype=bool),
+        "GS-S" : gs_s_mask,
+        "S-S" : upper & np.outer(is_singlet, is_singlet) & ~gs_s_mask & nondegenerate,
+        "T-T" : upper & np.outer(is_triplet, is_triplet) & nondegenerate
         }
 
+      # Compute and store the values
+
+      averages, sums = class_statistics(momdip_o_norms, nr_masks)
+
+      comp_results[mol_name]["Average NR dipole moments (au)"] = dict(averages, **{"Total" : float(momdip_o_norms.mean())})
+      comp_results[mol_name]["Sum NR dipole moments (au)"] = dict(sums, **{"Total" : float(momdip_o_norms.sum())})
+
       print('%12s' % "[ DONE ]")
 
       # ========================================================= #
@@ -1096,93 +940,35 @@ def main():
 
       print ("{:<133}".format('\n\tComputing average and sum of relavistic dipole moments ...'), end="")
 
-      # Initialization of the variables
+      # Define the dominant multiplicity of each state
 
-      momdip_gs_s_list = []
-      momdip_gs_t_list = []
-      momdip_s_s_list = []
-      momdip_s_t_list = []
-      momdip_t_t_list = []
-      momdip_p_list = []
-      
-      # Iterate over the matrix to get the information
+      nb_states = len(system['states_list'])
 
-      it = np.nditer(system['momdip_mtx']['X'], flags=['multi_index'])
-    
-      for momdip in it:
+      is_gs = np.arange(nb_states) == 0
+      is_singlet = ~is_gs & np.array([state['trip_percent'] < 0.5 for state in system['states_list']])
+      is_triplet = ~is_gs & ~is_singlet
 
-        # Define the pair of states and their dominant multiplicity
+      # Define the classes of pairs of states, as boolean masks of the matrix (only the upper triangle is considered for the transitions, since the matrix is symmetric)
 
-        state_1 = it.multi_index[0]
-        if state_1 == 0:
-          multi_1 = 'GS'
-        elif system['states_list'][state_1]['trip_percent'] < 0.5:
-          multi_1 = 'S'
-        else:
-          multi_1 = 'T'
-        
-        state_2 = it.multi_index[1]
-        if state_2 == 0:
-          multi_2 = 'GS'
-        elif system['states_list'][state_2]['trip_percent'] < 0.5:
-          multi_2 = 'S'
-        else:
-          multi_2 = 'T'
-
-        if state_1 > state_2:
-          continue # No need to treat both triangles of the matrix
-
-        # Compute the total length of the vector
-
-        value = 0
-        for momdip_key in system['momdip_mtx']:
-          value += system['momdip_mtx'][momdip_key][state_1][state_2]**2
-        value = math.sqrt(value) 
-
-        # Add the value to the corresponding list
-
-        if state_1 == state_2:
-          momdip_p_list.append(value)
-        elif multi_1 == 'GS' and multi_2 == 'S':
-          momdip_gs_s_list.append(value)
-        elif multi_1 == 'GS' and multi_2 == 'T':
-          momdip_gs_t_list.append(value)
-        elif multi_1 == 'S' and multi_2 == 'S':
-          momdip_s_s_list.append(value)
-        elif multi_1 == 'T' and multi_2 == 'T':
-          momdip_t_t_list.append(value)
-        elif (multi_1 == 'S' and multi_2 == 'T') or (multi_1 == 'T' and multi_2 == 'S'):
-          momdip_s_t_list.append(value)
-
-      # Compute the total matrix
-
-      total_mtx = np.zeros((len(system['states_list']), len(system['states_list'])))
-      for momdip_key in system['momdip_mtx']:
-        total_mtx = np.add(total_mtx,np.square(system['momdip_mtx'][momdip_key]))
-      total_mtx = np.sqrt(total_mtx)
-
-      # Store the values
-
-      comp_results[mol_name]["Average relativistic dipole moments (au)"] = {
-        "Permanent" : float(np.mean(momdip_p_list)),
-        "GS-S" : float(np.mean(momdip_gs_s_list)),
-        "GS-T" : float(np.mean(momdip_gs_t_list)),
-        "S-S" : float(np.mean(momdip_s_s_list)),
-        "S-T" : float(np.mean(momdip_s_t_list)),
-        "T-T" : float(np.mean(momdip_t_t_list)),
-        "Total" : float(total_mtx.mean())
-        }
+      upper = np.triu(np.ones((nb_states, nb_states), dtype=bool), k=1)
 
-      comp_results[mol_name]["Sum relativistic dipole moments (au)"] = {
-        "Permanent" : float(sum(momdip_p_list)),
-        "GS-S" : float(sum(momdip_gs_s_list)),
-        "GS-T" : float(sum(momdip_gs_t_list)),
-        "S-S" : float(sum(momdip_s_s_list)),
-        "S-T" : float(sum(momdip_s_t_list)),
-        "T-T" : float(sum(momdip_t_t_list)),
-        "Total" : float(total_mtx.sum())
+      rel_masks = {
+        "Permanent" : np.eye(nb_states, dtype=bool),
+        "GS-S" : upper & np.outer(is_gs, is_singlet),
+        "GS-T" : upper & np.outer(is_gs, is_triplet),
+        "S-S" : upper & np.outer(is_singlet, is_singlet),
+        "S-T" : upper & (np.outer(is_singlet, is_triplet) | np.outer(is_triplet, is_singlet)),
+        "T-T" : upper & np.outer(is_triplet, is_triplet)
         }
 
+      # Compute and store the values
+
+      momdip_norms = dipole_norms(system['momdip_mtx'])
+      averages, sums = class_statistics(momdip_norms, rel_masks)
+
+      comp_results[mol_name]["Average relativistic dipole moments (au)"] = dict(averages, **{"Total" : float(momdip_norms.mean())})
+      comp_results[mol_name]["Sum relativistic dipole moments (au)"] = dict(sums, **{"Total" : float(momdip_norms.sum())})
+
       # Add the total average in each direction
 
       for momdip_key in system['momdip_mtx']:
@@ -1201,7 +987,7 @@ def main():
     except results_common.ResultsError as error:
       print(error)
       print("Skipping %s molecule" % mol_name)
-      continue
+      return comp_results
 
     # ========================================================= #
     # ========================================================= #
@@ -1474,7 +1260,7 @@ def main():
     except results_common.ResultsError as error:
       print(error)
       print("Skipping %s molecule" % mol_name)
-      continue
+      return comp_results
 
     console_message = "End of procedure for the molecule " + mol_name
     print("")
@@ -1482,13 +1268,331 @@ def main():
     print(console_message.center(len(console_message)+10))
     print(''.center(len(console_message)+10, '*'))
 
+    return comp_results
+
+#######################################################################
+
+def treat_molecule_quietly(*args):
+    """Calls the treat_molecule function while capturing everything that is printed, so that the output of the molecules treated in parallel does not get mixed up. The arguments are the same as for the treat_molecule function.
+
+    Returns
+    -------
+    comp_results : dict
+        The results of the molecule, as returned by the treat_molecule function.
+    log : str
+        Everything that has been printed while treating the molecule.
+
+    Raises
+    ------
+    Exception
+        Any unexpected exception raised while treating the molecule, with what has been printed before it attached as its "log" attribute.
+    """
+
+    log = io.StringIO()
+
+    try:
+      with contextlib.redirect_stdout(log):
+        comp_results = treat_molecule(*args)
+    except Exception as error:
+      error.log = log.getvalue()
+      raise
+
+    return comp_results, log.getvalue()
+
+# =================================================================== #
+# =================================================================== #
+#                       COMMAND LINE ARGUMENTS                        #
+# =================================================================== #
+# =================================================================== #
+
+# Define the arguments needed for the script (here they are defined as named arguments rather than positional arguments, check https://stackoverflow.com/questions/24180527/argparse-required-arguments-listed-under-optional-arguments for more info).
+
+parser = argparse.ArgumentParser(add_help=False, description="For one or more molecule directories, this script reads the results files and compiles the results into a single YAML file and/or a results store (SQLite database).")
+
+output = parser.add_argument_group('Output arguments (at least one of them is required)')
+output.add_argument("-o","--out_yml", type=str, help="Path to the YAML file in which you want to compile the results. If the file already exists, it will be updated with the new content.")
+output.add_argument("-db","--database", type=str, help="Path to the SQLite database file of the results store in which you want to compile the results (see results_store.py). It will be created if needed, and each molecule will be stored as soon as it has been treated, replacing its previous results. Unlike the YAML file, the store does not need to be entirely rewritten each time.")
+
+mol_inp = parser.add_mutually_exclusive_group(required=True)
+mol_inp.add_argument("-s","--single", type=str, help="Molecule directory containing the results files that need to be processed.")
+mol_inp.add_argument("-m","--multiple", type=str, help="Directory containing multiple molecule directories.")
+
+optional = parser.add_argument_group('Optional arguments')
+optional.add_argument('-h','--help',action='help',default=argparse.SUPPRESS,help='Show this help message and exit')
+optional.add_argument('-cf', '--config', type=str, help="Path to the YAML configuration file, default is this_script_directory/results_config.yml")
+optional.add_argument("-j","--jobs", type=int, default=1, help="Number of processes used to treat the molecules in parallel (only useful with -m / --multiple). The results are still compiled in the same order and the output of each molecule is shown as a whole, once it has been treated.")
+optional.add_argument("-f","--force", action="store_true", help="Treat all the molecules, even those whose input files have not changed since their results were compiled in the output file(s). By default, those molecules are skipped and their previous results are kept.")
+
+# =================================================================== #
+# =================================================================== #
+#                            MAIN FUNCTION                            #
+# =================================================================== #
+# =================================================================== #
+
+# We encapsulate all the instructions in a main function, this is done so that the documentation (or other scripts) can import this file without immediately executing it (see https://realpython.com/python-main-function/ for details)
+def main(): 
+
+  # =================================================================== #
+  # =================================================================== #
+  #                           PREPARATION STEP                          #
+  # =================================================================== #
+  # =================================================================== #
+
+  # For more information on try/except structures, see https://www.tutorialsteacher.com/python/exception-handling-in-python
+  try:
+
+    # Get the size of the terminal in order to have a prettier output, if you need something more robust, go check http://granitosaurus.rocks/getting-terminal-size.html
+
+    columns, rows = shutil.get_terminal_size()
+
+    # Output Header
+
+    print("".center(columns,"*"))
+    print("")
+    print("EXECUTION OF THE RESULTS TREATMENT BEGINS NOW".center(columns))
+    print("")
+    print("".center(columns,"*"))
+
+    # ========================================================= #
+    # Read command line arguments                               #
+    # ========================================================= #
+
+    args = parser.parse_args()
+
+    # Required arguments
+
+    out_yml = args.out_yml                   # YAML file in which the results will be compiled
+    out_db = args.database                   # Results store in which the results will be compiled
+
+    single_mol = args.single                 # Molecule directory containing the results files that need to be processed.
+    multiple_mol = args.multiple             # Directory containing multiple molecule directories.
+
+    # Optional arguments
+
+    config_file = args.config                # YAML configuration file
+    jobs = args.jobs                         # Number of processes used for treating the molecules
+    force = args.force                       # Flag to treat the molecules whose input files have not changed
+
+    # ========================================================= #
+    # Define codes directory                                    #
+    # ========================================================= #
+
+    # Determined by getting the path to the directory of this script
+
+    code_dir = os.path.dirname(os.path.realpath(os.path.abspath(getsourcefile(lambda:0))))
+
+    print ("{:<40} {:<100}".format('\nCodes directory:',code_dir))
+
+    # ========================================================= #
+    # Load important files                                      #
+    # ========================================================= #
+
+    # YAML configuration file
+    # =======================
+
+    if config_file: 
+      config_file = results_common.check_abspath(config_file,"Command line argument -cf / --config","file")
+    else:
+      # If no value has been provided through the command line, take the results_config.yml file in the same directory as this script 
+      config_file = os.path.join(code_dir, "results_config.yml")
+
+    print ("{:<40} {:<99}".format('\nLoading the configuration file',config_file + " ..."), end="")
+    config = yaml_loader.load(config_file)
+    print('%12s' % "[ DONE ]")
+
+    # CHAINS YAML configuration file
+    # ==============================
+
+    chains_path = os.path.dirname(code_dir) 
+    chains_config_file = results_common.check_abspath(os.path.join(chains_path,"configs","chains_config.yml"),"CHAINS configuration YAML file","file")
+
+    print ("{:<140}".format("\nLoading CHAINS configuration YAML file ..."), end="")
+    chains_config = yaml_loader.load(chains_config_file)
+    print('%12s' % "[ DONE ]")
+
+    # Ionization potentials CSV file
+    # ==============================
+
+    ip_file = results_common.check_abspath(chains_config['ip_file'],"Ionization potentials CSV file","file")
+
+    print ("{:<140}".format("\nLoading ionization potentials CSV file ..."), end="")
+    with open(ip_file, 'r', newline='') as csv_file:
+      ip_content = csv.DictReader(csv_file, delimiter=';')
+      ip_list = list(ip_content)
+    print('%12s' % "[ DONE ]")
+
+    # Scripts of ABIN LAUNCHER and CONTROL LAUNCHER
+    # =============================================
+
+    # They are imported by the treat_molecule function, only check here that they are present so that a missing script is noticed before treating any molecule
+
+    for launcher, script in [("abin_launcher","geom_scan.py"),("control_launcher","modelling_fcts.py"),("control_launcher","system_cache.py")]:
+      results_common.check_abspath(os.path.join(chains_path,launcher,script),"%s file of %s" % (script, launcher.replace("_"," ").upper()),"file")
+
+    # The systems are loaded from the cache of CONTROL LAUNCHER if it has been defined in the CHAINS configuration file
+
+    system_cache_dir = chains_config.get("system_cache_dir")
+    system_cache_size = chains_config.get("system_cache_size", 2000)
+
+    # ========================================================= #
+    # Check molecule directories                                #
+    # ========================================================= #
+
+    if multiple_mol:
+
+      multiple_mol = results_common.check_abspath(multiple_mol,"Command line argument -m / --multiple","directory")
+      mol_inp_path = multiple_mol
+
+      print("{:<40} {:<99}".format("\nLooking for every molecule directory in", mol_inp_path + " ..."), end="")
+
+      # We need to look for directories in the multiple_mol directory (see https://stackoverflow.com/questions/800197/how-to-get-all-of-the-immediate-subdirectories-in-python for reference).
+      mol_inp_list = [dir.name for dir in os.scandir(mol_inp_path) if dir.is_dir()]
+
+      if mol_inp_list == []:
+        raise results_common.ResultsError ("ERROR: Can't find any directory in %s" % mol_inp_path)
+      
+      print('%12s' % "[ DONE ]")
+
+    else:
+
+      single_mol = results_common.check_abspath(single_mol,"Command line argument -s / --single","directory")
+      print ("{:<40} {:<100}".format('\nMolecule directory:',single_mol))
+
+      mol_inp_path = os.path.dirname(single_mol)
+      mol_name = os.path.basename(single_mol)
+      mol_inp_list = [mol_name]
+ 
+    # ========================================================= #
+    # Determine other important variables                       #
+    # ========================================================= #
+
+    if jobs < 1:
+      raise results_common.ResultsError ("ERROR: The number of processes given by the -j / --jobs command line argument must be at least 1.")
+
+    if not out_yml and not out_db:
+      raise results_common.ResultsError ("ERROR: No output has been specified, please use the -o / --out_yml and/or -db / --database command line arguments.")
+
+    if out_yml:
+      out_yml = os.path.abspath(out_yml)
+      print ("{:<40} {:<100}".format('\nOutput YAML file:',out_yml))
+
+    # The results store is opened for the whole execution, each molecule being stored in it as soon as it has been treated (see results_store.py for details)
+
+    connection = None
+
+    if out_db:
+      out_db = os.path.abspath(out_db)
+      connection = results_store.connect(out_db)
+      print ("{:<40} {:<100}".format('\nOutput results store:',out_db))
+
+    # ========================================================= #
+    # Skip the molecules whose input files have not changed     #
+    # ========================================================= #
+
+    # Each output file has a manifest, associating each molecule with the fingerprint of the input files its results have been compiled from (see results_manifest.py). Only the molecules that are still present in the output file are considered.
+
+    manifests = {}
+
+    if out_yml:
+      manifests[out_yml] = results_manifest.load(out_yml)
+      if manifests[out_yml]:
+        old_molecules = yaml_loader.load(out_yml, binary_cache=True) or {}
+        manifests[out_yml] = {mol_name: fingerprint for mol_name, fingerprint in manifests[out_yml].items() if mol_name in old_molecules}
+
+    if out_db:
+      stored_molecules = set(results_store.get_molecules(connection))
+      manifests[out_db] = {mol_name: fingerprint for mol_name, fingerprint in results_manifest.load(out_db).items() if mol_name in stored_molecules}
+
+    # Compute the fingerprint of each molecule, and skip it if its results have been compiled from the same input files in all the output files
+
+    fingerprints = {}
+    unchanged_list = []
+
+    for mol_name in mol_inp_list:
+
+      ip_line = next((line for line in ip_list if line['Molecule'] == mol_name), None)
+      fingerprints[mol_name] = results_manifest.fingerprint(os.path.join(mol_inp_path, mol_name), mol_name, ip_line)
+
+      if not force and all(manifest.get(mol_name) == fingerprints[mol_name] for manifest in manifests.values()):
+        unchanged_list.append(mol_name)
+
+    if unchanged_list:
+      mol_inp_list = [mol_name for mol_name in mol_inp_list if mol_name not in unchanged_list]
+      print("\n%s molecule(s) skipped since their input files have not changed (use -f / --force to treat them anyway): %s" % (len(unchanged_list), ", ".join(sorted(unchanged_list))))
+
+    comp_results = {} # Dictionary consisting of multiples dictionaries containing data about each molecule (1 dict per molecule)
+
+  # ========================================================= #
+  # Exception handling for the preparation step               #
+  # ========================================================= #
+
+  except results_common.ResultsError as error:
+    print("")
+    print(error)
+    exit(-1)
+
+  # =================================================================== #
+  # =================================================================== #
+  #                   FILES MANIPULATION & GENERATION                   #
+  # =================================================================== #
+  # =================================================================== #
+
+  # If multiple processes have been requested, start treating all the molecules in parallel (the results are then collected in order, so that the output and the compiled results are the same as with a single process)
+
+  executor = None
+
+  if jobs > 1 and len(mol_inp_list) > 1:
+    sys.stdout.flush()      # Otherwise the worker processes might print again what has not been written yet
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    futures = {mol_name: executor.submit(treat_molecule_quietly, mol_name, mol_inp_path, ip_list, chains_path, system_cache_dir, system_cache_size) for mol_name in mol_inp_list}
+
+  for mol_name in mol_inp_list:
+
+    # Get the results of the molecule from the worker processes if they have been started, otherwise treat the molecule right away
+
+    if executor:
+      try:
+        mol_results, mol_log = futures.pop(mol_name).result()
+      except Exception as error:
+        print(getattr(error, 'log', ''), end="")          # Show what has been printed before the error
+        for future in futures.values():
+          future.cancel()
+        executor.shutdown()
+        raise
+      print(mol_log, end="")
+    else:
+      mol_results = treat_molecule(mol_name, mol_inp_path, ip_list, chains_path, system_cache_dir, system_cache_size)
+
+    comp_results.update(mol_results)
+
+    # Store the results of the molecule in the results store (as for the YAML file, the molecules that have been skipped after their identification are stored with the results that could be obtained)
+
+    if connection and mol_name in mol_results:
+      results_store.store(connection, mol_name, mol_results[mol_name])
+
+    # Update the manifests (the molecules that could not even be identified will be treated again next time)
+
+    for manifest in manifests.values():
+      if mol_name in mol_results:
+        manifest[mol_name] = fingerprints[mol_name]
+      else:
+        manifest.pop(mol_name, None)
+
+  if executor:
+    executor.shutdown()
+
+  # The manifest of the results store is only written once all the molecules have been stored
+
+  if out_db:
+    results_manifest.save(out_db, manifests[out_db])
+
   # =================================================================== #
   # =================================================================== #
   #                      YAML FILE CREATION/UPDATE                      #
   # =================================================================== #
   # =================================================================== #
 
-  # Create a custom class for dumping our data into the YAML format
+  # Create a custom class for dumping our data into the YAML format (based on the pure Python dumper, since the C one does not allow to customize the line breaks)
 
   class CustomDumper(yaml.SafeDumper):
 
@@ -1503,27 +1607,33 @@ def main():
     def ignore_aliases(self, data):
       return True
 
-  # If the file already exists and is not empty, update the data
+  # The YAML file is only written if it has been requested (and if there is something new to write in it)
+
+  if out_yml and (mol_inp_list or not os.path.exists(out_yml)):
+
+    # If the file already exists and is not empty, update the data
 
-  if os.path.exists(out_yml) and os.stat(out_yml).st_size > 0:
+    if os.path.exists(out_yml) and os.stat(out_yml).st_size > 0:
 
-    print ("{:<140}".format('\nUpdating the output YAML file ...'), end="")
-    with open(out_yml, 'r') as old_file:
-      old_comp_results = yaml.load(old_file, Loader=yaml.FullLoader)
+      print ("{:<140}".format('\nUpdating the output YAML file ...'), end="")
+      old_comp_results = yaml_loader.load(out_yml, binary_cache=True)
 
-    old_comp_results.update(comp_results)
-    comp_results = old_comp_results
+      old_comp_results.update(comp_results)
+      comp_results = old_comp_results
   
-  else:
+    else:
+
+      print ("{:<140}".format('\nCreating the output YAML file ...'), end="")
 
-    print ("{:<140}".format('\nCreating the output YAML file ...'), end="")
+    # Write the file (overwriting the old file if it already existed), along with its binary cache file so that the scripts reading it (e.g. plot_results.py) do not need to parse it
 
-  # Write the file (overwriting the old file if it already existed)
+    yaml_loader.dump(comp_results, out_yml, binary_cache=True, Dumper=CustomDumper, sort_keys=False)
+    results_manifest.save(out_yml, manifests[out_yml])
 
-  with open(out_yml, 'w') as file:
-    yaml.dump(comp_results, file, Dumper=CustomDumper, sort_keys=False)
+    print('%12s' % "[ DONE ]")
 
-  print('%12s' % "[ DONE ]")
+  if connection:
+    connection.close()
 
   print("")
   print("".center(columns,"*"))